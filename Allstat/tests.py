@@ -1,3 +1,11 @@
 from django.test import TestCase
 
-# Create your tests here.
+from tests.query_budget import EndpointQueryBudgetMixin
+
+
+class StatsEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """School statistics cost the same number of queries for a bigger school."""
+
+    ENDPOINTS = [
+        ("school-stats", None, "admin"),
+    ]
@@ -1,5 +1,7 @@
 from django.shortcuts import render
-from user_registration.models import (Student,Teacher)
+from user_registration.models import (Student,Teacher,StudentTermSummary)
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import Round
 
 
 from rest_framework.views import APIView
@@ -39,6 +41,7 @@ class StandardResultsSetPagination(PageNumberPagination):
 class SchoolStatsView(APIView):
     """
     API View to get statistics for teachers and students, including total, male, and female counts.
+    With ?term_id=, also the term's result statistics, aggregated from StudentTermSummary.
     """
     permission_classes = [IsAuthenticated]  # Restrict access to authenticated users
 
@@ -67,5 +70,17 @@ class SchoolStatsView(APIView):
                 "female": female_students
             }
         }
+
+        term_id = request.query_params.get('term_id')
+        if term_id:
+            data["results"] = StudentTermSummary.objects.filter(school=school, term_id=term_id).aggregate(
+                students=Count('pk'),
+                average_score=Round(Avg('average_score'), 2),
+                highest_average=Round(Max('average_score'), 2),
+                lowest_average=Round(Min('average_score'), 2),
+                subjects_passed=Sum('subjects_passed'),
+                subjects_failed=Sum('subjects_failed'),
+                students_failing_none=Count('pk', filter=Q(subjects_failed=0)),
+            )
         
         return Response(data)
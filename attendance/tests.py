@@ -0,0 +1,12 @@
+from django.test import TestCase
+
+from tests.query_budget import EndpointQueryBudgetMixin
+
+
+class AttendanceEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """Attendance sessions and records run no queries per row."""
+
+    ENDPOINTS = [
+        ("attendance-session-list", None, "teacher"),
+        ("attendance-session-records-list", lambda s: {"session_pk": s.session.pk}, "teacher"),
+    ]
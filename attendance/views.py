@@ -8,12 +8,14 @@ from django.shortcuts import get_object_or_404
 from user_registration.models import AttendanceSession, AttendanceRecord
 from .serializers import AttendanceSessionSerializer, AttendanceRecordSerializer, AttendanceSessionListSerializer
 from .permissions import IsSchoolAdminOrTeacher
-from user_registration.models import Class, Student, StudentClass, UserRole
+from user_registration.models import Class, Student, StudentClass
+from user_registration.auth_context import get_auth_context
+from user_registration.pagination import KeysetPaginationMixin
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 
-class DefaultPagination(PageNumberPagination):
+class DefaultPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 200
@@ -112,8 +114,7 @@ class AttendanceSessionViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def _get_user_role(self, user):
-        roles = list(UserRole.objects.filter(user=user).values_list("role__name", flat=True))
-        if "School Admin" in roles:
+        if get_auth_context(self.request).has_role("School Admin"):
             return "school_admin"
         return "teacher"
 
@@ -128,6 +129,14 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
     permission_classes = [IsSchoolAdminOrTeacher]
     pagination_class = DefaultPagination
 
+    @property
+    def keyset_ordering(self):
+        # attendance_record_keyset_idx leads with the session, so cursor pages
+        # are only offered for one session's records.
+        if self.kwargs.get('session_pk'):
+            return ("student_name", "id")
+        return None
+
     def get_queryset(self):
         qs = super().get_queryset()
         session_pk = self.kwargs.get('session_pk')
@@ -1,3 +1,14 @@
 from django.test import TestCase
 
-# Create your tests here.
+from tests.query_budget import EndpointQueryBudgetMixin
+
+
+class NotificationEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """Notification feeds run no queries per row."""
+
+    ENDPOINTS = [
+        ("notification-list-create", None, "admin"),
+        ("recent-notifications", None, "admin"),
+        ("teacher-and-everyone-notifications", None, "teacher"),
+        ("student-and-everyone-notifications", None, "student"),
+    ]
@@ -12,6 +12,8 @@ from user_registration.permissions import (IsSchoolAdminOrIsTeacher, IsSchoolAdm
                           ISstudent,IsSuperAdminOrSchoolAdmin,
                           HasValidPinAndSchoolId, SchoolAdminOrIsClassTeacherOrISstudent)
 from rest_framework.exceptions import PermissionDenied
+from user_registration.auth_context import get_auth_context, load_auth_context
+from user_registration.pagination import KeysetPagination
 
 class NotificationListCreateView(generics.ListCreateAPIView):
     """
@@ -19,6 +21,8 @@ class NotificationListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsschoolAdmin]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', 'notification_id')
 
     def get_queryset(self):
         # Only show notifications for the authenticated user's school
@@ -112,10 +116,8 @@ class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "notification_id"  # match your URL kwarg
 
     def _current_school(self, user):
-        for rel in ("school_admin", "teacher", "student"):
-            if hasattr(user, rel) and getattr(user, rel):
-                return getattr(user, rel).school
-        return None
+        context = get_auth_context(self.request) if user == self.request.user else load_auth_context(user)
+        return context.school
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -0,0 +1,97 @@
+"""
+Subject performance statistics for a term.
+
+One values query reads the subject, total score and grade of every Result in
+scope (a class arm, a class year or the whole school); mean, median,
+standard deviation, pass rate and the grade histogram of each subject are
+then computed with NumPy group-by arithmetic (bincount over the subject
+codes, medians from one lexsort), with no per-subject Python loop over
+scores. Payloads are cached by results version like broadsheets.
+"""
+import numpy as np
+
+from user_registration.models import Result, ResultConfiguration
+from .grading import get_grade_index
+
+
+def subject_performance(school, term, class_year=None, class_arm=None):
+    """
+    Per-subject statistics of a term's results. `class_arm` is a
+    ClassDepartment as for broadsheets; with neither class_year nor class_arm
+    the whole school is covered. Standard deviations are population ones.
+    """
+    result_config = ResultConfiguration.objects.filter(school=school).first()
+    pass_mark = result_config.pass_mark if result_config else 50
+    grade_index = get_grade_index(school)
+
+    filters = {"registration__school": school, "registration__term": term, "total_score__isnull": False}
+    if class_year:
+        filters["registration__student_class__class_year"] = class_year
+    if class_arm:
+        filters["registration__student_class__class_arm"] = class_arm.classes_id
+
+    analytics = {
+        "year": term.year.name,
+        "term": term.name,
+        "class_year": class_year.class_name if class_year else None,
+        "class_arm": class_arm.classes.arm_name if class_arm else None,
+        "pass_mark": pass_mark,
+        "grades": list(dict.fromkeys(
+            band.grade for band in sorted(grade_index.bands, key=lambda band: -band.max_score)
+        )),
+        "subjects": [],
+    }
+
+    rows = list(Result.objects.filter(**filters).values_list(
+        "registration__subject_class__subject__name", "total_score", "grade"
+    ))
+    if not rows:
+        return analytics
+
+    names, scores, grades = zip(*rows)
+    scores = np.asarray(scores, dtype=float)
+    grades = np.asarray(grades, dtype=object)
+    missing_grade = np.array([not grade for grade in grades], dtype=bool)
+    if missing_grade.any():
+        grades[missing_grade] = [grade for grade, _ in grade_index.grade_many(scores[missing_grade], ("F", None))]
+
+    subjects, subject_codes = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+    n_subjects = len(subjects)
+    counts = np.bincount(subject_codes, minlength=n_subjects)
+    means = np.bincount(subject_codes, weights=scores, minlength=n_subjects) / counts
+    std_devs = np.sqrt(
+        np.bincount(subject_codes, weights=(scores - means[subject_codes]) ** 2, minlength=n_subjects) / counts
+    )
+    passed = np.bincount(subject_codes, weights=scores >= pass_mark, minlength=n_subjects)
+
+    # Scores sorted by subject, then score: each subject is a contiguous run.
+    sorted_scores = scores[np.lexsort((scores, subject_codes))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = (sorted_scores[starts + (counts - 1) // 2] + sorted_scores[starts + counts // 2]) / 2
+    lowest = sorted_scores[starts]
+    highest = sorted_scores[starts + counts - 1]
+
+    grade_labels, grade_codes = np.unique(grades, return_inverse=True)
+    histogram = np.bincount(
+        subject_codes * len(grade_labels) + grade_codes, minlength=n_subjects * len(grade_labels)
+    ).reshape(n_subjects, len(grade_labels))
+    analytics["grades"] += sorted(set(grade_labels) - set(analytics["grades"]))
+    columns = {label: i for i, label in enumerate(grade_labels)}
+
+    for i, subject in enumerate(subjects):
+        analytics["subjects"].append({
+            "subject": subject,
+            "students": int(counts[i]),
+            "mean": round(float(means[i]), 2),
+            "median": round(float(medians[i]), 2),
+            "std_dev": round(float(std_devs[i]), 2),
+            "lowest": float(lowest[i]),
+            "highest": float(highest[i]),
+            "passed": int(passed[i]),
+            "pass_rate": round(float(passed[i] / counts[i] * 100), 2),
+            "grade_distribution": {
+                label: int(histogram[i, columns[label]]) if label in columns else 0
+                for label in analytics["grades"]
+            },
+        })
+    return analytics
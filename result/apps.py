@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ResultConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'result'
+
+    def ready(self):
+        import result.signals  # Register result cache/aggregate signals
+        import result.checks  # Register the shared cache check
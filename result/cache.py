@@ -0,0 +1,201 @@
+"""
+Versioned cache for broadsheet, report card and analytics payloads.
+
+Each school has a results version token in the Django cache. Payload keys
+embed the token, so bumping it (on any write to results, grading, result
+configuration or the other inputs of a payload, see result/signals.py)
+retires every cached payload of the school at once without scanning keys.
+Bumps happen after the writing transaction commits, so a concurrent reader
+can never store pre-commit data under the new token.
+
+SchoolTableCache keeps small per-school lookup tables (grade bands and the
+like) in a process-local LRU behind a version token in the same cache.
+
+Hit/miss counters are kept per process, so a cache hit costs no write.
+
+All of this relies on the cache backend being shared by every worker
+process (see CACHES in settings), or invalidation never reaches them.
+"""
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+RESULT_CACHE_PREFIX = 'result:payload'
+RESULT_VERSION_PREFIX = 'result:version'
+RESULT_CACHE_KINDS = ('broadsheet', 'term_report', 'annual_report', 'subject_analytics')
+
+
+def _school_id(school):
+    return getattr(school, 'pk', school)
+
+
+def _version_key(school_id):
+    return f'{RESULT_VERSION_PREFIX}:{school_id}'
+
+
+def results_version(school):
+    """Current results version token for a school (instance or id)."""
+    key = _version_key(_school_id(school))
+    version = cache.get(key)
+    if version is None:
+        # A fresh random token, so payloads cached under an evicted token are never reused.
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_results_version(*schools):
+    """Retire every cached payload of the given schools once the current transaction commits."""
+    school_ids = {_school_id(school) for school in schools if school is not None}
+
+    def bump():
+        cache.set_many({_version_key(school_id): uuid.uuid4().hex for school_id in school_ids}, None)
+
+    if school_ids:
+        transaction.on_commit(bump)
+
+
+def _payload_key(kind, school_id, version, scope):
+    parts = ':'.join('-' if part is None else str(part) for part in scope)
+    return f'{RESULT_CACHE_PREFIX}:{kind}:{school_id}:{version}:{parts}'
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(kind, outcome):
+    with _stats_lock:
+        _stats[kind, outcome] += 1
+
+
+def get_or_build(kind, school, scope, builder):
+    """
+    Return the cached payload for (kind, school, scope, results version), or
+    build it with `builder()` and cache it for RESULT_CACHE_TIMEOUT seconds.
+    `scope` is a tuple of ids (class year/arm, year, term, student...).
+    """
+    school_id = _school_id(school)
+    key = _payload_key(kind, school_id, results_version(school_id), scope)
+    payload = cache.get(key)
+    if payload is not None:
+        _count(kind, 'hits')
+        return payload
+    _count(kind, 'misses')
+    payload = builder()
+    cache.set(key, payload, getattr(settings, 'RESULT_CACHE_TIMEOUT', 60 * 60))
+    return payload
+
+
+class SchoolTableCache:
+    """
+    A per-school table, loaded with `load(school_id)` and turned into the
+    object callers use with `build(rows)`.
+
+    The loaded rows are stored in the shared cache under the school's version
+    token and the built table in a process-local LRU, checked against the
+    token on every get. invalidate() inside a transaction makes this thread
+    read the table straight from the database until the transaction ends and
+    rotates the token once it commits, so no process caches uncommitted rows
+    under the new token and a rollback leaves the old one valid.
+    """
+
+    def __init__(self, prefix, load, build=None, size=256):
+        self.prefix = prefix
+        self.load = load
+        self.build = build or (lambda rows: rows)
+        self.size = size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _version_key(self, school_id):
+        return f'{self.prefix}:{school_id}:version'
+
+    def _rows_key(self, school_id, version):
+        return f'{self.prefix}:{school_id}:{version}'
+
+    def _changed_in_transaction(self, school_id):
+        changed = getattr(self._local, 'changed', None)
+        if not changed or school_id not in changed:
+            return False
+        if transaction.get_connection().in_atomic_block:
+            return True
+        # The transaction rolled back, so the on-commit rotation never ran.
+        changed.discard(school_id)
+        return False
+
+    def get(self, school):
+        """Return the table for a school (instance or id)."""
+        school_id = _school_id(school)
+        if self._changed_in_transaction(school_id):
+            return self.build(self.load(school_id))
+
+        key = self._version_key(school_id)
+        version = cache.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.add(key, version, None)
+            version = cache.get(key, version)
+
+        with self._lock:
+            entry = self._lru.get(school_id)
+            if entry and entry[0] == version:
+                self._lru.move_to_end(school_id)
+                return entry[1]
+
+        rows = cache.get(self._rows_key(school_id, version))
+        if rows is None:
+            rows = self.load(school_id)
+            cache.set(self._rows_key(school_id, version), rows, None)
+        table = self.build(rows)
+
+        with self._lock:
+            self._lru[school_id] = (version, table)
+            self._lru.move_to_end(school_id)
+            while len(self._lru) > self.size:
+                self._lru.popitem(last=False)
+        return table
+
+    def invalidate(self, school):
+        """Reload a school's table here at once and in every process once the transaction commits."""
+        school_id = _school_id(school)
+        with self._lock:
+            self._lru.pop(school_id, None)
+        if not transaction.get_connection().in_atomic_block:
+            self._rotate(school_id)
+            return
+        if getattr(self._local, 'changed', None) is None:
+            self._local.changed = set()
+        self._local.changed.add(school_id)
+        transaction.on_commit(lambda: self._rotate(school_id))
+
+    def _rotate(self, school_id):
+        key = self._version_key(school_id)
+        old_version = cache.get(key)
+        cache.set(key, uuid.uuid4().hex, None)
+        if old_version is not None:
+            cache.delete(self._rows_key(school_id, old_version))
+        with self._lock:
+            self._lru.pop(school_id, None)
+        getattr(self._local, 'changed', set()).discard(school_id)
+
+
+def result_cache_stats():
+    """Hit/miss counters per payload kind since this worker process started."""
+    with _stats_lock:
+        counters = dict(_stats)
+    stats = {}
+    for kind in RESULT_CACHE_KINDS:
+        hits = counters.get((kind, 'hits'), 0)
+        misses = counters.get((kind, 'misses'), 0)
+        stats[kind] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return stats
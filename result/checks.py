@@ -0,0 +1,28 @@
+"""
+System checks for the result app.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cached payloads, grade bands and the other per-school tables are retired
+    by version tokens in the default cache, which only reach every worker
+    process when that cache is shared.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The default cache is local to each process, so result cache invalidation "
+        "will not reach other worker processes.",
+        hint="Set REDIS_URL, or configure another shared cache backend in CACHES.",
+        id='result.W001',
+    )]
@@ -0,0 +1,167 @@
+"""
+Exam score import from a spreadsheet keyed by admission number and subject.
+
+The upload is streamed row by row (openpyxl read-only mode for xlsx,
+the csv module for CSV), so memory stays flat whatever the sheet size.
+Registrations of the active term are preloaded into one
+(admission number, subject name) map, every row is validated against it
+and ResultConfiguration.total_exam_score, and ExamScore rows are upserted
+in chunks on the registration unique constraint. Any invalid row rolls the
+whole import back with per-row errors. The imported registrations are then
+queued for one batched result recompute.
+"""
+import csv
+import io
+
+import openpyxl
+from django.db import transaction
+from django.utils import timezone
+
+from user_registration.models import (ExamScore, ResultConfiguration, StudentSubjectRegistration,
+                                      TeacherAssignment, Term)
+from .materialize import mark_registrations_dirty
+
+EXAM_IMPORT_COLUMNS = ('admission_number', 'subject', 'score')
+EXAM_IMPORT_CHUNK_SIZE = 500
+
+
+class ExamImportError(Exception):
+    """The upload cannot be processed at all (bad file, missing columns, no active term)."""
+
+
+def _header(cells):
+    columns = [str(cell).strip().lower().replace(' ', '_') if cell is not None else '' for cell in cells]
+    missing = set(EXAM_IMPORT_COLUMNS) - set(columns)
+    if missing:
+        raise ExamImportError(f"Missing columns: {', '.join(sorted(missing))}")
+    return [columns.index(column) for column in EXAM_IMPORT_COLUMNS]
+
+
+def _xlsx_rows(file_obj):
+    try:
+        wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    except Exception as e:
+        raise ExamImportError(f"Error reading file: {e}")
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        positions = _header(next(rows, ()))
+        for line, cells in enumerate(rows, 2):
+            if not any(cell not in (None, '') for cell in cells):
+                continue
+            yield line, [cells[i] if i < len(cells) else None for i in positions]
+    finally:
+        wb.close()
+
+
+def _csv_rows(file_obj):
+    reader = csv.reader(io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline=''))
+    try:
+        positions = _header(next(reader, ()))
+        for line, cells in enumerate(reader, 2):
+            if not any(cell.strip() for cell in cells):
+                continue
+            yield line, [cells[i] if i < len(cells) else None for i in positions]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ExamImportError(f"Error reading file: {e}")
+
+
+def read_exam_rows(file_obj):
+    """Yield (line number, [admission_number, subject, score]) from an uploaded xlsx or CSV."""
+    if file_obj.name.lower().endswith(('.xlsx', '.xlsm')):
+        return _xlsx_rows(file_obj)
+    return _csv_rows(file_obj)
+
+
+def _admission_number(value):
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def registration_map(school, term, teacher=None):
+    """
+    {(admission_number, subject name lower-cased): registration_id} for the
+    term, limited to a teacher's assigned subjects and class arms.
+    """
+    assigned = None
+    if teacher is not None:
+        assigned = set(TeacherAssignment.objects.filter(teacher=teacher).values_list(
+            'subject_class_id', 'class_department_assigned__classes_id'
+        ))
+
+    mapping = {}
+    for registration_id, admission_number, subject, subject_class_id, class_arm_id in (
+        StudentSubjectRegistration.objects.filter(school=school, term=term).order_by('pk').values_list(
+            'registration_id', 'student_class__student__admission_number', 'subject_class__subject__name',
+            'subject_class_id', 'student_class__class_arm_id',
+        )
+    ):
+        if assigned is not None and (subject_class_id, class_arm_id) not in assigned:
+            continue
+        mapping.setdefault((admission_number, subject.strip().lower()), registration_id)
+    return mapping
+
+
+def _upsert(chunk, now):
+    ExamScore.objects.bulk_create(
+        [ExamScore(registration_id=registration_id, score=score, updated_at=now) for registration_id, score in chunk],
+        update_conflicts=True,
+        unique_fields=['registration'],
+        update_fields=['score', 'updated_at'],
+    )
+
+
+def import_exam_scores(school, rows, teacher=None):
+    """
+    Import (line, [admission_number, subject, score]) rows into the active
+    term. Returns (summary, errors); nothing is kept when errors is not empty.
+    Teachers can only import their assigned subjects and class arms.
+    """
+    term = Term.objects.filter(school=school, status=True).first()
+    if not term:
+        raise ExamImportError("The school has no active term.")
+    result_config = ResultConfiguration.objects.filter(school=school).first()
+    max_score = result_config.total_exam_score if result_config else 70
+    registrations = registration_map(school, term, teacher)
+
+    errors, seen, chunk = [], set(), []
+    now = timezone.now()
+    with transaction.atomic():
+        for line, (admission_number, subject, score) in rows:
+            key = (_admission_number(admission_number), str(subject or '').strip().lower())
+            registration_id = registrations.get(key)
+            try:
+                score = float(score)
+            except (TypeError, ValueError):
+                score = None
+
+            if registration_id is None:
+                error = f"No {term.name} registration for admission number {admission_number} in {subject}."
+            elif registration_id in seen:
+                error = "Duplicate row for this student and subject."
+            elif score is None or not 0 <= score <= max_score:
+                error = f"score must be between 0 and {max_score}."
+            else:
+                error = None
+            if error:
+                errors.append({"row": line, "error": error})
+                continue
+
+            seen.add(registration_id)
+            if not errors:
+                chunk.append((registration_id, score))
+                if len(chunk) >= EXAM_IMPORT_CHUNK_SIZE:
+                    _upsert(chunk, now)
+                    chunk = []
+
+        if errors:
+            transaction.set_rollback(True)
+            return None, errors
+        if chunk:
+            _upsert(chunk, now)
+        # bulk_create skips the ExamScore signals; queue everything in one go.
+        mark_registrations_dirty(list(seen))
+
+    return {"term": term.name, "imported": len(seen)}, []
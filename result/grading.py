@@ -0,0 +1,104 @@
+"""
+Per-school grade band index.
+
+GradingSystem rows are loaded once per school, sorted by min_score and
+looked up with bisect, so grading a whole broadsheet costs no queries.
+Indexes are kept by a SchoolTableCache (result/cache.py): a process-local
+LRU checked against a version token in the shared cache, which the
+GradingSystem save/delete signals in result/signals.py rotate.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from result.cache import SchoolTableCache
+from user_registration.models import GradingSystem
+
+GRADE_INDEX_CACHE_PREFIX = 'result:grade-index'
+GRADE_INDEX_LRU_SIZE = 256
+NOT_GRADED = ('N/A', 'Not Graded')
+
+GradeBand = namedtuple('GradeBand', ['min_score', 'max_score', 'grade', 'remarks'])
+
+
+class GradeIndex:
+    """
+    Sorted grade bands for one school.
+
+    Returns the same band as
+    GradingSystem.objects.filter(min_score__lte=s, max_score__gte=s).first(),
+    i.e. the matching band with the highest max_score.
+    """
+
+    def __init__(self, bands):
+        self.bands = sorted(bands, key=lambda b: (b.min_score, b.max_score))
+        self._mins = np.array([b.min_score for b in self.bands], dtype=float)
+        self._maxs = np.array([b.max_score for b in self.bands], dtype=float)
+        # Bisect picks the band with the highest min_score <= score, which is
+        # only the highest-max band when bands do not overlap (touching is fine).
+        self._overlapping = any(
+            prev.max_score > cur.min_score for prev, cur in zip(self.bands, self.bands[1:])
+        )
+        self._by_max = sorted(self.bands, key=lambda b: -b.max_score)
+
+    def __len__(self):
+        return len(self.bands)
+
+    def lookup(self, score, default=None):
+        """Return (grade, remarks) for a score, or `default` when no band matches."""
+        if score is None:
+            return default
+        if self._overlapping:
+            for band in self._by_max:
+                if band.min_score <= score <= band.max_score:
+                    return band.grade, band.remarks
+            return default
+        i = bisect_right(self._mins, score) - 1
+        if i >= 0 and score <= self._maxs[i]:
+            band = self.bands[i]
+            return band.grade, band.remarks
+        return default
+
+    def grade_many(self, scores, default=NOT_GRADED):
+        """Vectorised lookup: a list of (grade, remarks) aligned with `scores`."""
+        scores = np.asarray(scores, dtype=float)
+        if self._overlapping or not self.bands:
+            return [self.lookup(None if np.isnan(s) else s, default) for s in scores]
+        idx = np.searchsorted(self._mins, scores, side='right') - 1
+        safe_idx = np.clip(idx, 0, None)
+        matched = (idx >= 0) & (scores <= self._maxs[safe_idx])
+        return [
+            (self.bands[i].grade, self.bands[i].remarks) if ok else default
+            for i, ok in zip(safe_idx.tolist(), matched.tolist())
+        ]
+
+
+def _load_bands(school_id):
+    return list(
+        GradingSystem.objects.filter(school_id=school_id)
+        .values_list('min_score', 'max_score', 'grade', 'remarks')
+    )
+
+
+_indexes = SchoolTableCache(
+    GRADE_INDEX_CACHE_PREFIX,
+    _load_bands,
+    lambda bands: GradeIndex([GradeBand(*b) for b in bands]),
+    GRADE_INDEX_LRU_SIZE,
+)
+
+
+def get_grade_index(school):
+    """Return the cached GradeIndex for a school (instance or id)."""
+    return _indexes.get(school)
+
+
+def invalidate_grade_index(school):
+    """Drop a school's index here and, once the transaction commits, everywhere else."""
+    _indexes.invalidate(school)
+
+
+def grade_many(school, scores, default=NOT_GRADED):
+    """Grade a batch of scores for one school without touching the database."""
+    return get_grade_index(school).grade_many(scores, default)
@@ -0,0 +1,194 @@
+"""
+Database-backed queue for heavy result operations.
+
+Admins enqueue ResultJob rows through the API; the run_result_worker
+management command claims them one at a time and runs them outside the
+request cycle. A claim locks the row with SELECT ... FOR UPDATE SKIP LOCKED
+where the database supports it, and is confirmed by a conditional status
+UPDATE so two workers can never run the same job (SQLite ignores row
+locks). Running jobs record progress and a heartbeat after every chunk; a
+job whose heartbeat is older than RESULT_JOB_STALE_AFTER seconds (its
+worker died) can be claimed again. Progress and outcome writes only apply
+while the row still belongs to the same claim (worker and attempt), so a
+worker whose job was reclaimed cannot overwrite the new run.
+
+Result writes queue jobs too: large dirty sets go to a flush_dirty job and
+re-ranking to rebuild_rankings jobs scoped to one class year (see
+result.materialize).
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from user_registration.models import ClassYear, ResultJob, ResultVisibilityControl, StudentSubjectRegistration
+from .rankings import rank_class_year, rank_scopes
+from .summaries import refresh_term_summaries, summary_pairs
+from .utils import compute_annual_results_for_registrations, compute_results_for_registrations
+
+RESULT_JOB_CHUNK_SIZE = 1000
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def enqueue_result_job(school, kind, year=None, term=None, class_year=None, options=None, user=None,
+                       reuse_running=True):
+    """
+    Queue a job (school, year, term and class_year as instances or ids). An
+    identical job that is still queued, or running when reuse_running is set,
+    is returned instead of queueing a duplicate. Jobs queued for writes that
+    a running job may already have read pass reuse_running=False.
+    Returns (job, created).
+    """
+    scope = {'school_id': _pk(school), 'kind': kind, 'year_id': _pk(year), 'term_id': _pk(term),
+             'class_year_id': _pk(class_year), 'options': options or {}}
+    existing = ResultJob.objects.filter(
+        status__in=ACTIVE_JOB_STATUSES if reuse_running else ['queued'], **scope
+    ).first()
+    if existing:
+        return existing, False
+    return ResultJob.objects.create(created_by=user, **scope), True
+
+
+def enqueue_ranking_jobs(school, term_scopes, annual_class_years):
+    """
+    Queue a rebuild_rankings job per (class_year_id, term_id) scope and per
+    class year whose annual ranking is affected. Returns the number queued.
+    """
+    class_year_ids = {class_year_id for class_year_id, _ in term_scopes} | set(annual_class_years)
+    years = dict(ClassYear.objects.filter(pk__in=class_year_ids).values_list('pk', 'year_id'))
+    scopes = set(term_scopes) | {(class_year_id, None) for class_year_id in annual_class_years}
+    queued = 0
+    for class_year_id, term_id in scopes:
+        if years.get(class_year_id) is None:
+            continue
+        _, created = enqueue_result_job(school, 'rebuild_rankings', year=years[class_year_id], term=term_id,
+                                        class_year=class_year_id, reuse_running=False)
+        queued += created
+    return queued
+
+
+def claim_next_job(worker):
+    """Mark the oldest claimable job as running for `worker` and return it, or None."""
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'RESULT_JOB_STALE_AFTER', 30 * 60))
+    claimable = Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before)
+    with transaction.atomic():
+        job = ResultJob.objects.select_for_update(skip_locked=True).filter(claimable).order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = ResultJob.objects.filter(
+            claimable, pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now,
+            attempts=F('attempts') + 1, progress_done=0, error='',
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def _own_claim(job):
+    """The job's row, as long as it is still running under this claim."""
+    return ResultJob.objects.filter(pk=job.pk, status='running', worker=job.worker, attempts=job.attempts)
+
+
+def _progress(job, done, total=None):
+    fields = {'progress_done': done, 'heartbeat_at': timezone.now()}
+    if total is not None:
+        fields['progress_total'] = total
+    _own_claim(job).update(**fields)
+
+
+def _chunks(registrations, job):
+    """Registration querysets of RESULT_JOB_CHUNK_SIZE, reporting progress as they are consumed."""
+    ids = list(registrations.order_by('pk').values_list('pk', flat=True))
+    _progress(job, 0, len(ids))
+    for start in range(0, len(ids), RESULT_JOB_CHUNK_SIZE):
+        chunk_ids = ids[start:start + RESULT_JOB_CHUNK_SIZE]
+        yield StudentSubjectRegistration.objects.filter(pk__in=chunk_ids)
+        _progress(job, start + len(chunk_ids))
+
+
+def _recompute_term(job):
+    registrations = StudentSubjectRegistration.objects.filter(school_id=job.school_id, term_id=job.term_id)
+    written = 0
+    for chunk in _chunks(registrations, job):
+        with transaction.atomic():
+            written += compute_results_for_registrations(chunk)
+            refresh_term_summaries(summary_pairs(chunk))
+    scopes = set(registrations.filter(student_class__class_year__isnull=False).values_list(
+        'student_class__class_year', 'term'
+    ).distinct())
+    return {'results': written, 'rankings': rank_scopes(scopes, set())}
+
+
+def _recompute_annual(job):
+    registrations = StudentSubjectRegistration.objects.filter(school_id=job.school_id, term__year_id=job.year_id)
+    written = 0
+    for chunk in _chunks(registrations, job):
+        written += compute_annual_results_for_registrations(chunk)
+    class_years = set(registrations.filter(student_class__class_year__isnull=False).values_list(
+        'student_class__class_year', flat=True
+    ).distinct())
+    return {'annual_results': written, 'rankings': rank_scopes(set(), class_years)}
+
+
+def _rebuild_rankings(job):
+    class_years = ClassYear.objects.filter(school_id=job.school_id, year_id=job.year_id)
+    if job.class_year_id:
+        class_years = class_years.filter(pk=job.class_year_id)
+    class_years = list(class_years.order_by('class_name'))
+    _progress(job, 0, len(class_years))
+    ranked = 0
+    for done, class_year in enumerate(class_years, 1):
+        ranked += rank_class_year(class_year, job.term_id)
+        _progress(job, done)
+    return {'rankings': ranked}
+
+
+def _flush_dirty(job):
+    from .materialize import flush_dirty_results  # Import here to avoid circular imports
+    return flush_dirty_results(school_id=job.school_id)
+
+
+def _publish(job):
+    """Publish the period's snapshots, then open the matching result visibility."""
+    from .snapshots import publish_results  # Import here to avoid circular imports
+    summary = publish_results(job.school, job.year, job.term, full=job.options.get('full', False))
+    visibility, _ = ResultVisibilityControl.objects.get_or_create(school_id=job.school_id)
+    setattr(visibility, 'term_result_open' if job.term_id else 'annual_result_open', True)
+    visibility.save()
+    return summary
+
+
+JOB_RUNNERS = {
+    'recompute_term': _recompute_term,
+    'recompute_annual': _recompute_annual,
+    'rebuild_rankings': _rebuild_rankings,
+    'flush_dirty': _flush_dirty,
+    'publish': _publish,
+}
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome. Returns True on success; False
+    when it failed, or when it was reclaimed meanwhile and the outcome was
+    left to the new claim.
+    """
+    try:
+        summary = JOB_RUNNERS[job.kind](job)
+    except Exception:
+        _own_claim(job).update(status='failed', error=traceback.format_exc(), finished_at=timezone.now())
+        return False
+    return bool(_own_claim(job).update(
+        status='succeeded', summary=summary, progress_done=F('progress_total'), finished_at=timezone.now()
+    ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from result.summaries import rebuild_term_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild StudentTermSummary rows from stored Results (e.g. for historical terms)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', help="Only this school (UUID).")
+        parser.add_argument('--term', help="Only this term (UUID).")
+
+    def handle(self, *args, **options):
+        written = rebuild_term_summaries(school_id=options['school'], term_id=options['term'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} student term summaries."))
@@ -0,0 +1,176 @@
+import random
+import statistics
+import time
+import uuid
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from user_registration.models import (School, Year, Term, ClassYear, Class, ClassDepartment, Department, Subject,
+                                      SubjectClass, Student, StudentClass, StudentSubjectRegistration,
+                                      AssessmentCategory, ResultConfiguration, GradingSystem,
+                                      ScoreObtainedPerAssessment, ContinuousAssessment, ExamScore,
+                                      Result, AnnualResult)
+from result.materialize import flush_dirty_results, mark_registrations_dirty
+from result.serializers import ResultSerializer, AnnualResultSerializer
+from result.analytics import subject_performance
+from result.utils import (compute_continuous_assessment, compute_result_for_registration, compute_annual_result,
+                          get_broadsheet_data)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare result list latency with recompute-on-read against materialised reads "
+        "for a synthetic class. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=40)
+        parser.add_argument('--subjects', type=int, default=12)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                registrations = self._seed(options['students'], options['subjects'])
+                flush_dirty_results()
+                self._report(registrations, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _report(self, registrations, repeat):
+        term = registrations[0].term
+        term_registrations = StudentSubjectRegistration.objects.filter(term=term)
+        all_registrations = StudentSubjectRegistration.objects.filter(pk__in=[r.pk for r in registrations])
+
+        def term_read():
+            results = Result.objects.filter(registration__in=term_registrations).select_related(
+                'registration__term', 'registration__subject_class__subject', 'registration__student_class__student'
+            )
+            return ResultSerializer(results, many=True).data
+
+        def term_recompute_on_read():
+            for registration in term_registrations:
+                ca = ContinuousAssessment.objects.get(registration=registration)
+                ca.ca_total = compute_continuous_assessment(registration)
+                ca.save()
+                compute_result_for_registration(registration)
+            return ResultSerializer(Result.objects.filter(registration__in=term_registrations), many=True).data
+
+        def annual_read():
+            annuals = AnnualResult.objects.filter(registration__in=all_registrations).select_related(
+                'registration__subject_class__subject', 'registration__student_class__student'
+            )
+            return AnnualResultSerializer(annuals, many=True).data
+
+        def annual_recompute_on_read():
+            for registration in all_registrations:
+                compute_annual_result(registration)
+            return AnnualResultSerializer(AnnualResult.objects.filter(registration__in=all_registrations), many=True).data
+
+        class_arm = ClassDepartment.objects.get(classes=registrations[0].student_class.class_arm)
+
+        def term_broadsheet():
+            return get_broadsheet_data(class_arm=class_arm, year=term.year, term=term)
+
+        def annual_broadsheet():
+            return get_broadsheet_data(class_arm=class_arm, year=term.year)
+
+        def analytics():
+            return subject_performance(term.school, term)
+
+        self.stdout.write(f"{term_registrations.count()} term registrations, {len(registrations)} across the year")
+        self.stdout.write(f"{'list':<34}{'median ms':>12}{'queries':>10}")
+        for label, func in [
+            ("term results, recompute on read", term_recompute_on_read),
+            ("term results, materialised", term_read),
+            ("annual results, recompute on read", annual_recompute_on_read),
+            ("annual results, materialised", annual_read),
+            ("term broadsheet", term_broadsheet),
+            ("annual broadsheet", annual_broadsheet),
+            ("term subject analytics", analytics),
+        ]:
+            timings = []
+            for _ in range(repeat):
+                counter = _QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    func()
+                    timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(f"{label:<34}{statistics.median(timings):>12.1f}{counter.count:>10}")
+
+    def _seed(self, n_students, n_subjects):
+        rng = random.Random(42)
+        tag = uuid.uuid4().hex[:8]
+        today = date.today()
+        school = School.objects.create(
+            school_name=f"Benchmark {tag}", school_address=tag, city="-", state="-", region="-",
+            country="-", email=f"{tag}@benchmark.invalid", phone_number="0", short_name="BM",
+            school_type="-", education_level="-",
+        )
+        year = Year.objects.create(name="Benchmark", start_date=today, end_date=today, school=school, status=True)
+        terms = [
+            Term.objects.create(name=name, start_date=today, end_date=today, year=year, school=school, status=(name == "First Term"))
+            for name in ["First Term", "Second Term", "Third Term"]
+        ]
+        department = Department.objects.create(name="Junior", school=school)
+        class_year = ClassYear.objects.create(school=school, year=year, class_name="JSS1")
+        class_arm = Class.objects.create(arm_name="A", class_year=class_year, school=school)
+        ClassDepartment.objects.create(school=school, classes=class_arm, department=department)
+        ResultConfiguration.objects.create(school=school)
+        categories = [
+            AssessmentCategory.objects.create(school=school, assessment_name=name, number_of_times=2, max_score_per_one=10)
+            for name in ["Quiz", "Assignment"]
+        ]
+        for low, high, grade in [(70, 100, "A"), (60, 69.99, "B"), (50, 59.99, "C"), (45, 49.99, "D"), (0, 44.99, "F")]:
+            GradingSystem.objects.create(school=school, min_score=low, max_score=high, grade=grade, remarks=grade)
+        subject_classes = [
+            SubjectClass.objects.create(subject=Subject.objects.create(name=f"Subject {i + 1}", school=school), school=school, department=department)
+            for i in range(n_subjects)
+        ]
+
+        registrations = []
+        for i in range(n_students):
+            user = User.objects.create(username=f"benchmark-{tag}-{i}")
+            student = Student.objects.create(
+                user=user, school=school, admission_number=i + 1, first_name=f"Student{i}", last_name=tag,
+                date_of_birth=today, gender="-", address="-", city="-", state="-", country="-", admission_date=today,
+            )
+            student_class = StudentClass.objects.create(student=student, class_arm=class_arm, class_year=class_year)
+            for term in terms:
+                for subject_class in subject_classes:
+                    registrations.append(StudentSubjectRegistration.objects.create(
+                        student_class=student_class, subject_class=subject_class, term=term, school=school
+                    ))
+
+        totals, exams = [], []
+        for registration in registrations:
+            raw = 0
+            for category in categories:
+                score = rng.randint(0, 20)
+                raw += score
+                totals.append(ScoreObtainedPerAssessment(registration=registration, category=category, total_score=score))
+            ContinuousAssessment.objects.filter(registration=registration).update(
+                raw_total=raw, ca_total=compute_continuous_assessment(registration, raw_total=raw)
+            )
+            exams.append(ExamScore(registration=registration, score=rng.randint(20, 70)))
+        ScoreObtainedPerAssessment.objects.bulk_create(totals)
+        ExamScore.objects.bulk_create(exams)
+        mark_registrations_dirty(StudentSubjectRegistration.objects.filter(school=school))
+        return registrations
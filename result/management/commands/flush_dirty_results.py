@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from result.materialize import flush_dirty_results
+
+
+class Command(BaseCommand):
+    help = "Recompute Result/AnnualResult rows for registrations marked dirty."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', help="Only flush this school (UUID).")
+        parser.add_argument('--limit', type=int, help="Flush at most this many dirty registrations.")
+
+    def handle(self, *args, **options):
+        summary = flush_dirty_results(school_id=options['school'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {summary['dirty']} dirty registrations: "
+            f"{summary['results']} results, {summary['annual_results']} annual results, "
+            f"{summary['rankings']} student rankings."
+        ))
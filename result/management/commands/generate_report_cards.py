@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_registration.models import Year, Term, ClassYear, ClassDepartment
+from result.report_cards import REPORT_CARD_FORMATS, class_students, build_class_report_data, build_report_card_zip
+
+
+class Command(BaseCommand):
+    help = "Render report cards for every student of a class arm or class year into one ZIP file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', required=True, help="Year UUID.")
+        parser.add_argument('--term', help="Term UUID. Omit for annual report cards.")
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--class-arm', help="ClassDepartment UUID.")
+        group.add_argument('--class-year', help="ClassYear UUID.")
+        parser.add_argument('--format', choices=REPORT_CARD_FORMATS, default='xlsx')
+        parser.add_argument('--workers', type=int, help="Render processes (default REPORT_CARD_WORKERS).")
+        parser.add_argument('--output', required=True, help="Path of the ZIP file to write.")
+
+    def handle(self, *args, **options):
+        try:
+            year = Year.objects.get(year_id=options['year'])
+            term = Term.objects.get(term_id=options['term']) if options['term'] else None
+            class_arm = ClassDepartment.objects.get(subject_class_id=options['class_arm']) if options['class_arm'] else None
+            class_year = ClassYear.objects.get(class_year_id=options['class_year']) if options['class_year'] else None
+        except (Year.DoesNotExist, Term.DoesNotExist, ClassDepartment.DoesNotExist, ClassYear.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+
+        started = time.perf_counter()
+        payloads = build_class_report_data(class_students(class_arm, class_year), year, term)
+        built = time.perf_counter()
+        archive = build_report_card_zip(payloads, options['format'], options['workers'])
+        with open(options['output'], 'wb') as output:
+            while chunk := archive.read(1024 * 1024):
+                output.write(chunk)
+        archive.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(payloads)} report cards to {options['output']} "
+            f"(data {built - started:.2f}s, render {time.perf_counter() - built:.2f}s)."
+        ))
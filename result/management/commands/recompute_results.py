@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from result.recompute import RECOMPUTE_CHUNK_SIZE, check_term_consistency, recompute_term_results
+from user_registration.models import School, Term
+
+
+class Command(BaseCommand):
+    help = ("Rebuild ContinuousAssessment, Result and AnnualResult rows of a school's term from the stored scores, "
+            "one class arm per worker process, then check the stored rows for consistency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', required=True, help="School (UUID).")
+        parser.add_argument('--term', required=True, help="Term (UUID).")
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help="Worker processes (1 runs in this process; SQLite needs the IMMEDIATE "
+                                 "transaction mode for more).")
+        parser.add_argument('--chunk-size', type=int, default=RECOMPUTE_CHUNK_SIZE,
+                            help="Largest number of registrations per partition.")
+
+    def handle(self, *args, **options):
+        school = School.objects.filter(pk=options['school']).first()
+        if school is None:
+            raise CommandError(f"School {options['school']} does not exist.")
+        term = Term.objects.filter(pk=options['term'], school=school).first()
+        if term is None:
+            raise CommandError(f"Term {options['term']} does not exist for {school.school_name}.")
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--workers and --chunk-size must be at least 1.")
+
+        def progress(counts):
+            self.stdout.write(
+                f"  {counts['registrations']} registrations: {counts['results']} results, "
+                f"{counts['annual_results']} annual results in {counts['seconds']:.2f}s"
+            )
+
+        self.stdout.write(f"Recomputing {term.name} results of {school.school_name}...")
+        totals = recompute_term_results(
+            school, term, workers=options['workers'], chunk_size=options['chunk_size'], progress=progress
+        )
+        rows = totals['continuous_assessments'] + totals['results'] + totals['annual_results']
+        rate = rows / totals['seconds'] if totals['seconds'] else 0
+        self.stdout.write(
+            f"{totals['registrations']} registrations in {totals['partitions']} partitions "
+            f"({totals['workers']} worker(s)): "
+            f"{totals['continuous_assessments']} CA, {totals['results']} results, "
+            f"{totals['annual_results']} annual results, {totals['rankings']} rankings "
+            f"in {totals['seconds']:.2f}s ({rate:.0f} rows/s)."
+        )
+
+        issues = check_term_consistency(school, term)
+        if any(issues.values()):
+            raise CommandError("Consistency check failed: " + ", ".join(
+                f"{name.replace('_', ' ')}: {count}" for name, count in issues.items() if count
+            ))
+        self.stdout.write(self.style.SUCCESS("Consistency check passed."))
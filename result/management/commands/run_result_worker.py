@@ -0,0 +1,42 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from result.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Claim and run queued result jobs (recompute term/annual results, rebuild rankings, flush dirty results, publish)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty instead of polling.")
+        parser.add_argument('--sleep', type=float, default=5, help="Seconds between polls of an empty queue.")
+        parser.add_argument('--max-jobs', type=int, help="Exit after running this many jobs.")
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        ran = 0
+        try:
+            while options['max_jobs'] is None or ran < options['max_jobs']:
+                job = claim_next_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                self.stdout.write(f"Running {job.kind} job {job.job_id} for {job.school_id}")
+                ok = run_job(job)
+                attempt = job.attempts
+                job.refresh_from_db()
+                if (job.worker, job.attempts) != (worker, attempt):
+                    self.stdout.write(self.style.WARNING(f"Job {job.job_id} was reclaimed by {job.worker}"))
+                elif ok:
+                    self.stdout.write(self.style.SUCCESS(f"Job {job.job_id} succeeded: {job.summary}"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"Job {job.job_id} failed:\n{job.error}"))
+                ran += 1
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Worker {worker} stopped after {ran} jobs.")
@@ -0,0 +1,191 @@
+"""
+Dirty-flag materialisation of Result and AnnualResult rows.
+
+Score, exam, weight-config and grading writes mark the registrations they
+affect as dirty; flush_dirty_results recomputes only those rows and then
+re-ranks the class years and terms whose totals actually changed. It runs in
+flush_dirty jobs (which the materialize endpoint queues) and from the
+flush_dirty_results management command.
+
+When RESULT_MATERIALIZE_ON_WRITE is on (the default), a committed write
+that dirtied at most RESULT_INLINE_FLUSH_LIMIT registrations of a school
+recomputes just those in place and queues rebuild_rankings jobs for their
+class years; larger sets (grading or configuration changes) only queue a
+flush_dirty job. Either way the run_result_worker command has to be
+running for rankings to catch up. Result list GETs only read.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from user_registration.models import AnnualResult, DirtyResultRegistration, Result, StudentSubjectRegistration
+from .jobs import enqueue_ranking_jobs, enqueue_result_job
+from .rankings import ranking_scopes, rank_scopes
+from .summaries import refresh_term_summaries, summary_pairs
+from .utils import compute_results_for_registrations, compute_annual_results_for_registrations
+
+MARK_BATCH_SIZE = 500
+FLUSH_BATCH_SIZE = 2000
+INLINE_FLUSH_LIMIT = 200
+
+
+def _schedule_flush(rows):
+    """
+    Once the current transaction commits, recompute the marked registrations
+    of each school in place, or queue a flush_dirty job when there are more
+    than RESULT_INLINE_FLUSH_LIMIT of them. robust=True keeps a failure from
+    failing the already committed write; the rows just stay dirty.
+    """
+    if not getattr(settings, 'RESULT_MATERIALIZE_ON_WRITE', True):
+        return
+    limit = getattr(settings, 'RESULT_INLINE_FLUSH_LIMIT', INLINE_FLUSH_LIMIT)
+    by_school = defaultdict(list)
+    for row in rows:
+        by_school[row.school_id].append(row.registration_id)
+    for school_id, registration_ids in by_school.items():
+        if len(registration_ids) <= limit:
+            callback = lambda school_id=school_id, ids=registration_ids: flush_registrations(school_id, ids)
+        else:
+            callback = lambda school_id=school_id: enqueue_result_job(school_id, 'flush_dirty', reuse_running=False)
+        transaction.on_commit(callback, robust=True)
+
+
+def mark_registrations_dirty(registrations, term=True):
+    """
+    Queue registrations (a queryset or iterable of instances/ids) for
+    recomputation. term=False only queues the annual result.
+    """
+    if registrations is None:
+        return 0
+    if isinstance(registrations, StudentSubjectRegistration):
+        registrations = [registrations]
+    if hasattr(registrations, 'values_list'):
+        pairs = registrations.filter(school__isnull=False).values_list('registration_id', 'school_id')
+    else:
+        ids = [getattr(r, 'pk', r) for r in registrations if r is not None]
+        pairs = StudentSubjectRegistration.objects.filter(
+            pk__in=ids, school__isnull=False
+        ).values_list('registration_id', 'school_id')
+
+    rows = [
+        DirtyResultRegistration(registration_id=registration_id, school_id=school_id, term_dirty=term)
+        for registration_id, school_id in pairs
+    ]
+    if not rows:
+        return 0
+
+    if term:
+        DirtyResultRegistration.objects.bulk_create(
+            rows, batch_size=MARK_BATCH_SIZE,
+            update_conflicts=True, unique_fields=['registration'], update_fields=['term_dirty', 'marked_at'],
+        )
+    else:
+        # Never clear a pending term recompute; just make sure a row exists.
+        DirtyResultRegistration.objects.bulk_create(rows, batch_size=MARK_BATCH_SIZE, ignore_conflicts=True)
+        DirtyResultRegistration.objects.filter(
+            registration_id__in=[row.registration_id for row in rows]
+        ).update(marked_at=timezone.now())
+
+    _schedule_flush(rows)
+    return len(rows)
+
+
+def flush_dirty_results(school_id=None, limit=None):
+    """
+    Recompute everything currently marked dirty (optionally for one school,
+    at most `limit` registrations), in batches, then re-rank the class years
+    whose totals changed. Rows marked while the flush runs are left for the
+    next one.
+    Returns a summary dict.
+    """
+    summary, term_scopes, annual_class_years = _flush(school_id, limit)
+    summary['rankings'] = rank_scopes(term_scopes, annual_class_years)
+    return summary
+
+
+def flush_registrations(school_id, registration_ids):
+    """
+    Recompute just these dirty registrations of a school (the ones a request
+    wrote) and queue ranking rebuilds for their class years instead of
+    re-ranking here. Returns a summary dict.
+    """
+    summary, term_scopes, annual_class_years = _flush(school_id, registration_ids=registration_ids)
+    summary['ranking_jobs'] = enqueue_ranking_jobs(school_id, term_scopes, annual_class_years)
+    return summary
+
+
+def _flush(school_id=None, limit=None, registration_ids=None):
+    started_at = timezone.now()
+    summary = {'dirty': 0, 'results': 0, 'annual_results': 0}
+    term_scopes, annual_class_years = set(), set()
+    while limit is None or summary['dirty'] < limit:
+        batch_size = FLUSH_BATCH_SIZE if limit is None else min(FLUSH_BATCH_SIZE, limit - summary['dirty'])
+        batch, batch_term_scopes, batch_annual_scopes = _flush_batch(started_at, school_id, batch_size,
+                                                                     only_ids=registration_ids)
+        if not batch['dirty']:
+            break
+        for key, value in batch.items():
+            summary[key] += value
+        term_scopes |= batch_term_scopes
+        annual_class_years |= {class_year_id for class_year_id, _ in batch_annual_scopes}
+    return summary, term_scopes, annual_class_years
+
+
+def _scores(model, field, registrations):
+    return dict(model.objects.filter(registration__in=registrations).values_list('registration_id', field))
+
+
+def _changed(before, after):
+    return [registration_id for registration_id in before.keys() | after.keys()
+            if before.get(registration_id) != after.get(registration_id)]
+
+
+def _flush_batch(started_at, school_id, batch_size, only_ids=None):
+    """
+    Recompute Result rows for term-dirty registrations, then AnnualResult rows
+    for every registration sharing a student class and subject with any dirty
+    one (an annual average spans all three terms). Returns the batch counts
+    and the ranking scopes of the term totals and annual averages that changed.
+    """
+    dirty = DirtyResultRegistration.objects.filter(marked_at__lte=started_at)
+    if school_id is not None:
+        dirty = dirty.filter(school_id=school_id)
+    if only_ids is not None:
+        dirty = dirty.filter(registration_id__in=only_ids)
+    rows = list(dirty.order_by('marked_at').values_list('registration_id', 'term_dirty')[:batch_size])
+    if not rows:
+        return {'dirty': 0, 'results': 0, 'annual_results': 0}, set(), set()
+
+    registration_ids = [registration_id for registration_id, _ in rows]
+    term_ids = [registration_id for registration_id, term_dirty in rows if term_dirty]
+
+    with transaction.atomic():
+        results_written = 0
+        changed_totals = []
+        if term_ids:
+            term_registrations = StudentSubjectRegistration.objects.filter(pk__in=term_ids)
+            before = _scores(Result, 'total_score', term_registrations)
+            results_written = compute_results_for_registrations(term_registrations)
+            refresh_term_summaries(summary_pairs(term_registrations))
+            changed_totals = _changed(before, _scores(Result, 'total_score', term_registrations))
+
+        siblings = StudentSubjectRegistration.objects.filter(
+            Exists(StudentSubjectRegistration.objects.filter(
+                pk__in=registration_ids,
+                student_class=OuterRef('student_class'),
+                subject_class=OuterRef('subject_class'),
+            ))
+        )
+        before = _scores(AnnualResult, 'annual_average', siblings)
+        annual_written = compute_annual_results_for_registrations(siblings)
+        changed_averages = _changed(before, _scores(AnnualResult, 'annual_average', siblings))
+
+        DirtyResultRegistration.objects.filter(
+            registration_id__in=registration_ids, marked_at__lte=started_at
+        ).delete()
+
+    batch = {'dirty': len(rows), 'results': results_written, 'annual_results': annual_written}
+    return batch, ranking_scopes(changed_totals), ranking_scopes(changed_averages)
@@ -0,0 +1,180 @@
+"""
+Class positions computed by the database.
+
+For one class year and term (or the whole year) the students' results are
+aggregated per student class and ranked with Window(Rank()) annotations:
+by arm, by year group and, per subject, within the arm. Ties share the
+lower position, as calculate_position does. Overall positions go to
+StudentRanking and subject positions to Result/AnnualResult.subject_position,
+so broadsheets and report cards read positions instead of sorting.
+Only rows whose values changed are written. Scopes are re-ranked when a
+dirty-result flush changes their totals, or by rebuild_rankings jobs.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, F, OuterRef, Q, Subquery, Sum, Window
+from django.db.models.functions import Rank, Round
+from django.utils import timezone
+
+from user_registration.models import (AnnualResult, ClassYear, Result, StudentRanking,
+                                      StudentSubjectRegistration)
+from .cache import bump_results_version
+
+RANKING_UPDATE_BATCH_SIZE = 500
+RANKING_FIELDS = ['class_year', 'class_arm', 'subjects_count', 'total_score', 'average_score',
+                  'position_in_class_arm', 'position_in_class_year']
+
+
+def _ranked(queryset, score):
+    """Aggregate `score` per student class and rank the averages by arm and by year group."""
+    return queryset.values(
+        'registration__student_class', 'registration__student_class__class_arm',
+    ).annotate(
+        subjects_count=Count('pk'),
+        total=Sum(score),
+        average=Round(Avg(score), 2),
+    ).annotate(
+        arm_position=Window(
+            Rank(), partition_by=F('registration__student_class__class_arm'), order_by=F('average').desc()
+        ),
+        year_position=Window(Rank(), order_by=F('average').desc()),
+    )
+
+
+def _ranking_values(ranking):
+    return tuple(getattr(ranking, StudentRanking._meta.get_field(field).attname) for field in RANKING_FIELDS)
+
+
+def _subject_positions(queryset, score):
+    return queryset.annotate(
+        position=Window(
+            Rank(),
+            partition_by=[F('registration__subject_class'), F('registration__student_class__class_arm')],
+            order_by=F(score).desc(),
+        )
+    )
+
+
+def _annual_scope(class_year):
+    """
+    One AnnualResult per student class and subject. The rows of the other
+    terms' registrations carry the same average and would count it twice.
+    """
+    first_registration = StudentSubjectRegistration.objects.filter(
+        student_class=OuterRef('registration__student_class'),
+        subject_class=OuterRef('registration__subject_class'),
+        annual_results__isnull=False,
+    ).order_by('pk').values('pk')[:1]
+    return AnnualResult.objects.filter(
+        registration__student_class__class_year=class_year,
+        annual_average__isnull=False,
+        registration=Subquery(first_registration),
+    )
+
+
+def rank_class_year(class_year, term=None):
+    """
+    Recompute positions for a class year in a term, or the annual positions
+    when term is None, writing only the rankings and subject positions that
+    changed. Returns the number of students ranked.
+    """
+    class_year = class_year if isinstance(class_year, ClassYear) else ClassYear.objects.get(pk=class_year)
+    term_id = getattr(term, 'pk', term)
+
+    if term_id:
+        scope = Result.objects.filter(
+            registration__term_id=term_id, registration__student_class__class_year=class_year
+        )
+        ranked = _ranked(scope, 'total_score')
+        subject_updates = [
+            Result(pk=pk, subject_position=position)
+            for pk, position, current in _subject_positions(scope, 'total_score').values_list(
+                'pk', 'position', 'subject_position'
+            )
+            if position != current
+        ]
+        model = Result
+    else:
+        scope = _annual_scope(class_year)
+        ranked = _ranked(scope, 'annual_average')
+        # Every term registration of a subject carries the same annual position
+        by_subject = {
+            (student_class_id, subject_class_id): position
+            for student_class_id, subject_class_id, position in _subject_positions(scope, 'annual_average').values_list(
+                'registration__student_class', 'registration__subject_class', 'position'
+            )
+        }
+        subject_updates = [
+            AnnualResult(pk=pk, subject_position=by_subject.get((student_class_id, subject_class_id)))
+            for pk, student_class_id, subject_class_id, current in AnnualResult.objects.filter(
+                registration__student_class__class_year=class_year
+            ).values_list('pk', 'registration__student_class', 'registration__subject_class', 'subject_position')
+            if by_subject.get((student_class_id, subject_class_id)) != current
+        ]
+        model = AnnualResult
+
+    rankings = [
+        StudentRanking(
+            school_id=class_year.school_id,
+            student_class_id=row['registration__student_class'],
+            class_year=class_year,
+            class_arm_id=row['registration__student_class__class_arm'],
+            term_id=term_id,
+            subjects_count=row['subjects_count'],
+            total_score=row['total'],
+            average_score=row['average'],
+            position_in_class_arm=row['arm_position'],
+            position_in_class_year=row['year_position'],
+        )
+        for row in ranked
+    ]
+
+    with transaction.atomic():
+        # Students who moved class year still have a row under their old one.
+        existing = {
+            ranking.student_class_id: ranking
+            for ranking in StudentRanking.objects.select_for_update().filter(
+                Q(class_year=class_year) | Q(student_class__in=[ranking.student_class_id for ranking in rankings]),
+                term_id=term_id,
+            )
+        }
+        now = timezone.now()
+        created, updated = [], []
+        for ranking in rankings:
+            current = existing.pop(ranking.student_class_id, None)
+            if current is None:
+                created.append(ranking)
+            elif _ranking_values(current) != _ranking_values(ranking):
+                ranking.pk, ranking.computed_at = current.pk, now
+                updated.append(ranking)
+        # Whatever is left is no longer ranked in this class year.
+        StudentRanking.objects.filter(pk__in=[ranking.pk for ranking in existing.values()]).delete()
+        StudentRanking.objects.bulk_create(created, batch_size=RANKING_UPDATE_BATCH_SIZE)
+        StudentRanking.objects.bulk_update(updated, RANKING_FIELDS + ['computed_at'],
+                                           batch_size=RANKING_UPDATE_BATCH_SIZE)
+        model.objects.bulk_update(subject_updates, ['subject_position'], batch_size=RANKING_UPDATE_BATCH_SIZE)
+        if existing or created or updated or subject_updates:
+            bump_results_version(class_year.school_id)
+    return len(rankings)
+
+
+def ranking_scopes(registration_ids):
+    """The (class_year_id, term_id) pairs the registrations belong to."""
+    return set(
+        StudentSubjectRegistration.objects.filter(
+            pk__in=registration_ids, student_class__class_year__isnull=False
+        ).values_list('student_class__class_year', 'term').distinct()
+    )
+
+
+def rank_scopes(term_scopes, annual_class_years):
+    """
+    Re-rank the given (class_year_id, term_id) term scopes and the annual
+    positions of the given class years. Returns the number of rankings written.
+    """
+    ranked = 0
+    for class_year_id, term_id in term_scopes:
+        if term_id:
+            ranked += rank_class_year(class_year_id, term_id)
+    for class_year_id in annual_class_years:
+        ranked += rank_class_year(class_year_id)
+    return ranked
@@ -0,0 +1,170 @@
+"""
+Offline reprocessing of a school's term results.
+
+recompute_term_results rebuilds, for every registration of a term, the
+category and ContinuousAssessment totals from the instance scores, the
+Result rows, the AnnualResult rows of the same student class and subject,
+and the student term summaries, then re-ranks the affected class years.
+
+Registrations are partitioned by class arm (arms larger than chunk_size are
+split) and the partitions run in a process pool. The parent closes its
+database connections before forking so every worker opens its own; each
+partition is written in one transaction. SQLite only takes one writer and
+fails deferred transactions that collide instead of waiting, so there the
+pool is used only with the IMMEDIATE transaction mode; otherwise the
+partitions run in this process. check_term_consistency re-reads the stored
+rows afterwards and counts anything that does not add up.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.db import connection, connections, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+from user_registration.models import (ContinuousAssessment, DirtyResultRegistration, ExamScore, Result,
+                                      StudentSubjectRegistration, StudentTermSummary)
+from .cache import bump_results_version
+from .grading import invalidate_grade_index
+from .rankings import ranking_scopes, rank_scopes
+from .summaries import refresh_term_summaries, summary_pairs
+from .utils import (compute_annual_results_for_registrations, compute_results_for_registrations,
+                    invalidate_ca_denominator, rebuild_assessment_totals)
+
+RECOMPUTE_CHUNK_SIZE = 500
+SCORE_TOLERANCE = 0.005
+
+
+def class_arm_partitions(school, term, chunk_size=RECOMPUTE_CHUNK_SIZE):
+    """Lists of registration ids of the term, one per class arm (split at chunk_size)."""
+    arms = {}
+    for registration_id, class_arm_id in StudentSubjectRegistration.objects.filter(
+        school=school, term=term
+    ).order_by('student_class__class_arm', 'pk').values_list('registration_id', 'student_class__class_arm'):
+        arms.setdefault(class_arm_id, []).append(registration_id)
+    return [
+        registration_ids[start:start + chunk_size]
+        for registration_ids in arms.values()
+        for start in range(0, len(registration_ids), chunk_size)
+    ]
+
+
+def recompute_partition(school_id, registration_ids):
+    """
+    Rebuild CA totals, Results, AnnualResults and term summaries of one
+    partition. Runs in a pool worker. Returns a dict of counts.
+    """
+    started = time.monotonic()
+    registrations = StudentSubjectRegistration.objects.filter(pk__in=registration_ids)
+    siblings = StudentSubjectRegistration.objects.filter(
+        Exists(StudentSubjectRegistration.objects.filter(
+            pk__in=registration_ids,
+            student_class=OuterRef('student_class'),
+            subject_class=OuterRef('subject_class'),
+        ))
+    )
+    with transaction.atomic():
+        counts = {
+            'registrations': len(registration_ids),
+            'continuous_assessments': rebuild_assessment_totals(registration_ids, school_id),
+            'results': compute_results_for_registrations(registrations),
+            'annual_results': compute_annual_results_for_registrations(siblings),
+        }
+        refresh_term_summaries(summary_pairs(registrations))
+    counts['seconds'] = time.monotonic() - started
+    return counts
+
+
+def _init_worker():
+    django.setup()
+
+
+def pool_supported():
+    """Whether partitions can be written concurrently on the default database."""
+    if connection.vendor != 'sqlite':
+        return True
+    return str(connection.settings_dict['OPTIONS'].get('transaction_mode', '')).upper() == 'IMMEDIATE'
+
+
+def recompute_term_results(school, term, workers=1, chunk_size=RECOMPUTE_CHUNK_SIZE, progress=None):
+    """
+    Recompute every result of the school's term with `workers` processes
+    (1, or a database without concurrent writers, runs in this process).
+    `progress` is called with each partition's counts as it finishes.
+    Returns the summed counts, including rankings and the workers used.
+    """
+    started_at = timezone.now()
+    started = time.monotonic()
+    # Workers must see the current grading scale and CA configuration.
+    invalidate_grade_index(school)
+    invalidate_ca_denominator(school.pk)
+
+    partitions = class_arm_partitions(school, term, chunk_size)
+    workers = min(workers, len(partitions)) if pool_supported() else 1
+    totals = {'partitions': len(partitions), 'workers': max(workers, 1), 'registrations': 0,
+              'continuous_assessments': 0, 'results': 0, 'annual_results': 0}
+
+    def collect(counts):
+        for key in ('registrations', 'continuous_assessments', 'results', 'annual_results'):
+            totals[key] += counts[key]
+        if progress:
+            progress(counts)
+
+    if workers <= 1:
+        for registration_ids in partitions:
+            collect(recompute_partition(school.pk, registration_ids))
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(recompute_partition, school.pk, registration_ids) for registration_ids in partitions]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    registration_ids = [registration_id for registration_ids in partitions for registration_id in registration_ids]
+    scopes = ranking_scopes(registration_ids)
+    totals['rankings'] = rank_scopes(scopes, {class_year_id for class_year_id, _ in scopes})
+    DirtyResultRegistration.objects.filter(
+        registration_id__in=registration_ids, marked_at__lte=started_at
+    ).delete()
+    # Pool workers only retired the payloads cached in their own process.
+    bump_results_version(school)
+    totals['seconds'] = time.monotonic() - started
+    return totals
+
+
+def check_term_consistency(school, term):
+    """
+    Count stored rows of the term that disagree with their inputs:
+    registrations with a CA and an exam score but no Result, Results whose
+    CA, exam or total differ from the stored scores, and students with
+    Results but no term summary. All zeros means consistent.
+    """
+    registrations = StudentSubjectRegistration.objects.filter(school=school, term=term)
+    results = Result.objects.filter(registration__in=registrations).annotate(
+        stored_ca=Subquery(ContinuousAssessment.objects.filter(
+            registration=OuterRef('registration')).values('ca_total')[:1]),
+        stored_exam=Subquery(ExamScore.objects.filter(
+            registration=OuterRef('registration')).values('score')[:1]),
+    )
+    summarised = StudentTermSummary.objects.filter(
+        student=OuterRef('registration__student_class__student'), term=term
+    )
+    return {
+        'missing_results': registrations.filter(
+            Exists(ContinuousAssessment.objects.filter(registration=OuterRef('pk'))),
+            Exists(ExamScore.objects.filter(registration=OuterRef('pk'))),
+        ).exclude(Exists(Result.objects.filter(registration=OuterRef('pk')))).count(),
+        'mismatched_results': results.alias(
+            ca_diff=Abs(F('ca_total') - F('stored_ca')),
+            exam_diff=Abs(F('exam_score') - F('stored_exam')),
+            total_diff=Abs(F('total_score') - F('ca_total') - F('exam_score')),
+        ).filter(
+            Q(stored_ca__isnull=True) | Q(stored_exam__isnull=True) | Q(total_score__isnull=True)
+            | Q(ca_diff__gt=SCORE_TOLERANCE) | Q(exam_diff__gt=SCORE_TOLERANCE) | Q(total_diff__gt=SCORE_TOLERANCE)
+        ).count(),
+        'missing_summaries': results.exclude(Exists(summarised)).values(
+            'registration__student_class__student'
+        ).distinct().count(),
+    }
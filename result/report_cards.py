@@ -0,0 +1,169 @@
+"""
+Bulk report card generation for a class arm or class year.
+
+Payloads for every student are built in one pass: the school, grade index
+and weight configs are loaded once and the results of the whole class are
+read with the same prefetches the single-student builders use. Rendering
+(xlsx or HTML) needs no database, so it runs across a process pool and the
+per-student files are bundled into one ZIP.
+"""
+import os
+import re
+import tempfile
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import openpyxl
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from user_registration.models import Student
+from .utils import (get_school_info, get_student_info, term_report_results, term_result_row,
+                    annual_report_results, annual_result_row, report_rankings,
+                    report_term_summaries)
+from .grading import get_grade_index
+from .weights import get_weight_resolver
+
+REPORT_CARD_FORMATS = ('xlsx', 'html')
+# Below this many cards the pool start-up costs more than it saves.
+REPORT_CARD_POOL_THRESHOLD = 8
+
+
+def class_students(class_arm=None, class_year=None):
+    """Students placed in a class arm (ClassDepartment) or class year, by name."""
+    filters = {'student_classes__class_arm': class_arm.classes_id} if class_arm else {
+        'student_classes__class_year': class_year
+    }
+    return Student.objects.filter(**filters).distinct().order_by('last_name', 'first_name')
+
+
+def build_class_report_data(students, year, term=None):
+    """
+    Report payloads (as get_full_term_result_data / get_full_annual_result_data
+    return them) for every student, in a constant number of queries.
+    """
+    students = list(students.select_related('school'))
+    if not students:
+        return []
+    school = students[0].school
+    school_info = get_school_info(school)
+
+    rows = defaultdict(list)
+    if term:
+        for result in term_report_results(year, term, registration__student_class__student__in=students):
+            rows[result.registration.student_class.student_id].append(term_result_row(result))
+    else:
+        weights = get_weight_resolver(school)
+        grades = get_grade_index(school)
+        for annual in annual_report_results(year, registration__student_class__student__in=students):
+            rows[annual.registration.student_class.student_id].append(annual_result_row(annual, weights, grades))
+
+    rankings = report_rankings(students, year, term)
+    summaries = report_term_summaries(students, term) if term else {}
+    payloads = []
+    for student in students:
+        payload = {"school": school_info, "student": get_student_info(student), "year": year.name}
+        if term:
+            payload.update(term=term.name)
+        payload["ranking"] = rankings.get(student.student_id)
+        if term:
+            payload.update(summary=summaries.get(student.student_id), term_results=rows[student.student_id])
+        else:
+            payload.update(annual_results=rows[student.student_id])
+        payloads.append(payload)
+    return payloads
+
+
+def _report_filename(payload, fmt):
+    student = payload["student"]
+    name = f"{student['admission_number']}_{student['last_name']}_{student['first_name']}"
+    return f"{re.sub(r'[^A-Za-z0-9_-]+', '-', name)}.{fmt}"
+
+
+def _render_xlsx(payload):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Report Card")
+    student = payload["student"]
+    period = payload.get("term") or "Annual"
+    ws.append([payload["school"]["school_name"]])
+    ws.append([f"{student['first_name']} {student['last_name']}", f"Admission No: {student['admission_number']}"])
+    ws.append([f"{payload['year']} - {period}"])
+    ranking = payload.get("ranking")
+    if ranking:
+        ws.append([f"Average: {ranking['average_score']}",
+                   f"Position in arm: {ranking['position_in_class_arm']}",
+                   f"Position in class: {ranking['position_in_class_year']}"])
+    summary = payload.get("summary")
+    if summary:
+        ws.append([f"Total: {summary['total_score']}",
+                   f"Subjects passed: {summary['subjects_passed']}",
+                   f"Subjects failed: {summary['subjects_failed']}"])
+    ws.append([])
+
+    if "term_results" in payload:
+        ws.append(["Subject", "CA", "Exam", "Total", "Grade", "Remarks", "Position"])
+        for row in payload["term_results"]:
+            ws.append([row["subject"]["name"], row["ca_total"], row["exam_score"],
+                       row["total_score"], row["grade"], row["remarks"], row["subject_position"]])
+    else:
+        ws.append(["Subject", "First Term", "Second Term", "Third Term", "Annual Average", "Grade", "Remarks", "Position"])
+        for row in payload["annual_results"]:
+            weighted = row["weighted_term_scores"]
+            ws.append([row["subject"]["name"], weighted["first_term"], weighted["second_term"],
+                       weighted["third_term"], row["annual_average"], row["grade"], row["remarks"],
+                       row["subject_position"]])
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def _render_html(payload):
+    return render_to_string("result/report_card.html", {"report": payload}).encode("utf-8")
+
+
+def render_report_card(payload, fmt):
+    """Render one payload; returns (filename, bytes). Runs in pool workers."""
+    content = _render_xlsx(payload) if fmt == "xlsx" else _render_html(payload)
+    return _report_filename(payload, fmt), content
+
+
+def _render_one(args):
+    return render_report_card(*args)
+
+
+def build_report_card_zip(payloads, fmt="xlsx", workers=None):
+    """
+    Render every payload and bundle the files into a ZIP written to a
+    temporary file, which is returned rewound. Rendering runs across a process
+    pool of `workers` (REPORT_CARD_WORKERS, default the CPU count, at most 8).
+    """
+    if fmt not in REPORT_CARD_FORMATS:
+        raise ValueError(f"Unsupported report card format: {fmt}")
+    if workers is None:
+        workers = getattr(settings, 'REPORT_CARD_WORKERS', min(8, os.cpu_count() or 1))
+
+    output = tempfile.TemporaryFile()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        jobs = [(payload, fmt) for payload in payloads]
+        if workers > 1 and len(jobs) >= REPORT_CARD_POOL_THRESHOLD:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                _write_cards(archive, pool.map(_render_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        else:
+            _write_cards(archive, map(_render_one, jobs))
+    output.seek(0)
+    return output
+
+
+def _write_cards(archive, rendered):
+    seen = set()
+    for filename, content in rendered:
+        stem, ext = os.path.splitext(filename)
+        unique, n = filename, 1
+        while unique in seen:
+            n += 1
+            unique = f"{stem}_{n}{ext}"
+        seen.add(unique)
+        archive.writestr(unique, content)
@@ -0,0 +1,149 @@
+"""
+Bulk assessment score entry for a class and assessment category.
+
+A teacher posts (registration, instance_number, score) rows as JSON or a
+CSV/xlsx upload. The active term and the teacher's assignments are loaded
+once and every row is checked against them; any invalid row rejects the
+whole batch with per-row errors. Valid batches are written with
+bulk_create/bulk_update, which skip the per-instance signals, so the
+category and CA totals are recounted for the touched registrations in one
+set-based pass and the registrations are queued for result recomputation.
+"""
+import uuid
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from user_registration.models import (ScorePerAssessmentInstance, StudentSubjectRegistration, TeacherAssignment,
+                                      Term, Year)
+from .materialize import mark_registrations_dirty
+from .utils import recount_assessment_totals
+
+SCORE_ROW_FIELDS = ('registration', 'instance_number', 'score')
+SCORE_WRITE_BATCH_SIZE = 500
+
+
+class ScoreEntryError(Exception):
+    """The upload cannot be processed at all (bad file, missing columns)."""
+
+
+def read_score_rows(file_obj):
+    """Rows (dicts of SCORE_ROW_FIELDS) from an uploaded CSV or xlsx file."""
+    try:
+        if file_obj.name.lower().endswith(('.xlsx', '.xlsm')):
+            df = pd.read_excel(file_obj, dtype=object)
+        else:
+            df = pd.read_csv(file_obj, dtype=object)
+    except Exception as e:
+        raise ScoreEntryError(f"Error reading file: {e}")
+
+    df = df.rename(columns=lambda column: str(column).strip().lower()).rename(
+        columns={'registration_id': 'registration'}
+    )
+    missing_fields = set(SCORE_ROW_FIELDS) - set(df.columns)
+    if missing_fields:
+        raise ScoreEntryError(f"Missing columns: {', '.join(sorted(missing_fields))}")
+    df = df[list(SCORE_ROW_FIELDS)].astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+def _number(value, cast):
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number  # NaN
+
+
+def _validate_row(row, registration, category, assigned, active_term):
+    if registration is None:
+        return "Unknown registration."
+    if registration['term_id'] != active_term.pk:
+        return "You can only record scores for the active term."
+    if (registration['subject_class_id'], registration['student_class__class_arm_id']) not in assigned:
+        return "You are not assigned to this subject and class."
+    instance_number = _number(row.get('instance_number'), float)
+    if instance_number is None or instance_number != int(instance_number) \
+            or not 1 <= instance_number <= category.number_of_times:
+        return f"instance_number must be between 1 and {category.number_of_times}."
+    score = _number(row.get('score'), float)
+    if score is None or not 0 <= score <= category.max_score_per_one:
+        return f"score must be between 0 and {category.max_score_per_one}."
+    return None
+
+
+def bulk_record_assessment_scores(teacher, category, rows):
+    """
+    Validate and store a batch of instance scores for `category`.
+    Returns (summary, errors); nothing is written when errors is not empty.
+    Existing instances (same registration, category and instance number)
+    are updated in place.
+    """
+    school = teacher.school
+    active_year = Year.objects.filter(school=school, status=True).first()
+    active_term = Term.objects.filter(school=school, status=True).first()
+    if not active_year or not active_term:
+        return None, [{"row": None, "error": "The school has no active year and term."}]
+
+    assigned = set(TeacherAssignment.objects.filter(teacher=teacher).values_list(
+        'subject_class_id', 'class_department_assigned__classes_id'
+    ))
+
+    registration_ids = set()
+    for row in rows:
+        try:
+            row['registration'] = uuid.UUID(str(row.get('registration')))
+            registration_ids.add(row['registration'])
+        except ValueError:
+            row['registration'] = None
+    registrations = {
+        registration['registration_id']: registration
+        for registration in StudentSubjectRegistration.objects.filter(
+            pk__in=registration_ids, school=school
+        ).values('registration_id', 'term_id', 'subject_class_id', 'student_class__class_arm_id')
+    }
+
+    errors, scores, seen = [], {}, set()
+    for index, row in enumerate(rows):
+        registration = registrations.get(row['registration'])
+        error = _validate_row(row, registration, category, assigned, active_term)
+        key = (row['registration'], _number(row.get('instance_number'), float))
+        if error is None and key in seen:
+            error = "Duplicate score for this registration and instance."
+        if error:
+            errors.append({"row": index + 1, "error": error})
+            continue
+        seen.add(key)
+        scores[(row['registration'], int(key[1]))] = float(row['score'])
+    if errors:
+        return None, errors
+
+    touched = {registration_id for registration_id, _ in scores}
+    existing = {}
+    for instance in ScorePerAssessmentInstance.objects.filter(
+        registration_id__in=touched, category=category
+    ).order_by('-pk'):
+        existing[(instance.registration_id, instance.instance_number)] = instance
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for (registration_id, instance_number), score in scores.items():
+        instance = existing.get((registration_id, instance_number))
+        if instance is None:
+            to_create.append(ScorePerAssessmentInstance(
+                registration_id=registration_id, category=category, instance_number=instance_number, score=score,
+            ))
+        elif instance.score != score:
+            instance.score, instance.updated_at = score, now
+            to_update.append(instance)
+
+    with transaction.atomic():
+        ScorePerAssessmentInstance.objects.bulk_create(to_create, batch_size=SCORE_WRITE_BATCH_SIZE)
+        ScorePerAssessmentInstance.objects.bulk_update(
+            to_update, ['score', 'updated_at'], batch_size=SCORE_WRITE_BATCH_SIZE
+        )
+        recount_assessment_totals(touched, category.pk, school.pk)
+        mark_registrations_dirty(touched)
+
+    return {"created": len(to_create), "updated": len(to_update), "registrations": len(touched)}, []
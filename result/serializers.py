@@ -2,7 +2,7 @@ from rest_framework import serializers
 from user_registration.models import (ResultVisibilityControl,AssessmentCategory,ResultConfiguration,
                                       AnnualResultWeightConfig, GradingSystem,ScorePerAssessmentInstance,
                                      ScoreObtainedPerAssessment, ExamScore,Result,ContinuousAssessment,
-                                     AnnualResult, ClassTeacherComment
+                                     AnnualResult, ClassTeacherComment, ResultJob
                                      )
 
 #=========================================================================================
@@ -238,19 +238,19 @@ class AnnualResultSerializer(serializers.ModelSerializer):
 
     def get_third_term_detail(self, obj):
         registration = obj.registration
+        if registration is None or registration.term.ordinal != 3:
+            return {'ca_total': None, 'exam_score': None, 'assessment_scores': []}
 
-        # Get CA and exam for third term
-        ca = ContinuousAssessment.objects.filter(registration=registration, registration__term__name__iexact='Third Term').first()
-        exam = ExamScore.objects.filter(registration=registration, registration__term__name__iexact='Third Term').first()
+        # Read through the relations so rows prefetched by the views are used
+        # (at most one CA and one exam score per registration).
+        ca = next(iter(registration.continuous_assessments.all()), None)
+        exam = next(iter(registration.exam_scores.all()), None)
 
         ca_total = ca.ca_total if ca else None
         exam_score = exam.score if exam else None
 
         # Get detailed assessment scores
-        assessment_totals = ScoreObtainedPerAssessment.objects.filter(
-            registration=registration,
-            registration__term__name__iexact='Third Term'
-        )
+        assessment_totals = registration.total_assessment_scores.all()
 
         assessment_data = []
         for score in assessment_totals:
@@ -316,12 +316,15 @@ class FullTermResultSerializer(serializers.Serializer):
     student = StudentInfoSerializer()
     year = serializers.CharField()
     term = serializers.CharField()
+    ranking = serializers.DictField(allow_null=True, required=False)
+    summary = serializers.DictField(allow_null=True, required=False)
     term_results = serializers.ListField()
 
 class FullAnnualResultSerializer(serializers.Serializer):
     school = SchoolInfoSerializer()
     student = StudentInfoSerializer()
     year = serializers.CharField()
+    ranking = serializers.DictField(allow_null=True, required=False)
     annual_results = serializers.ListField()
 
 ##########Broadsheet Serializer###############
@@ -356,3 +359,38 @@ class BroadsheetSerializer(serializers.Serializer):
     students = BroadsheetStudentSerializer(many=True)
 
 ##############################################
+
+class ResultJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ResultJob
+        fields = ['job_id', 'kind', 'year', 'term', 'class_year', 'options', 'status', 'progress_done',
+                  'progress_total', 'progress', 'summary', 'error', 'attempts', 'created_at', 'started_at',
+                  'finished_at']
+        read_only_fields = ['job_id', 'class_year', 'options', 'status', 'progress_done', 'progress_total', 'summary', 'error',
+                            'attempts', 'created_at', 'started_at', 'finished_at']
+
+    def get_progress(self, obj):
+        if not obj.progress_total:
+            return 100.0 if obj.status == 'succeeded' else 0.0
+        return round(obj.progress_done / obj.progress_total * 100, 1)
+
+    def validate(self, data):
+        school = self.context['request'].user.school_admin.school
+        year, term = data.get('year'), data.get('term')
+        if data['kind'] == 'flush_dirty':
+            # Covers whatever is dirty in the school.
+            data['year'] = data['term'] = None
+            return data
+        if data['kind'] == 'recompute_term' and not term:
+            raise serializers.ValidationError({"term": "A term is required for this job."})
+        if data['kind'] == 'recompute_annual' and term:
+            raise serializers.ValidationError({"term": "Annual recomputation covers the whole year."})
+        if term and not year:
+            data['year'] = year = term.year
+        if not year:
+            raise serializers.ValidationError({"year": "A year is required for this job."})
+        if year.school_id != school.pk or (term and term.year_id != year.pk):
+            raise serializers.ValidationError("Year and term must belong to your school.")
+        return data
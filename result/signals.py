@@ -0,0 +1,181 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models import QuerySet
+from django.dispatch import receiver
+from user_registration.models import (GradingSystem, ScorePerAssessmentInstance, AssessmentCategory,
+                                      ResultConfiguration, StudentSubjectRegistration, ContinuousAssessment,
+                                      ExamScore, AnnualResultWeightConfig, Result, AnnualResult,
+                                      Student, School)
+from .cache import bump_results_version
+from .grading import invalidate_grade_index
+from .materialize import mark_registrations_dirty
+from .summaries import refresh_term_summaries, summary_pairs
+from .utils import apply_assessment_score_delta, rescale_continuous_assessments
+from .weights import invalidate_weight_resolver
+
+
+@receiver([post_save, post_delete], sender=GradingSystem)
+def refresh_grade_index(sender, instance, **kwargs):
+    """
+    Drop the cached grade bands for the school whenever one of its bands changes,
+    and queue the school's results for regrading.
+    """
+    invalidate_grade_index(instance.school_id)
+    if _is_cascade(sender, kwargs):
+        return
+    mark_registrations_dirty(StudentSubjectRegistration.objects.filter(school_id=instance.school_id))
+
+
+def _is_cascade(sender, kwargs):
+    """
+    True when a post_delete comes from deleting a parent (registration,
+    category, school...). Those rows are going away too, so nothing is adjusted.
+    """
+    origin = kwargs.get('origin')
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin is not None and origin_model is not sender
+
+
+#==================== Continuous assessment aggregates ====================
+
+@receiver(pre_save, sender=ScorePerAssessmentInstance)
+def remember_previous_instance_score(sender, instance, **kwargs):
+    """
+    Keep the stored (registration, category, score) so post_save can apply the delta.
+    """
+    instance._previous_score = None
+    if not instance._state.adding:
+        instance._previous_score = (
+            ScorePerAssessmentInstance.objects.filter(pk=instance.pk)
+            .values_list('registration_id', 'category_id', 'score')
+            .first()
+        )
+
+
+@receiver(post_save, sender=ScorePerAssessmentInstance)
+def apply_instance_score_write(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_score', None)
+    if previous:
+        registration_id, category_id, score = previous
+        if registration_id == instance.registration_id and category_id == instance.category_id:
+            apply_assessment_score_delta(instance.registration, instance.category_id, instance.score - score)
+            mark_registrations_dirty(instance.registration)
+            return
+        old_registration = StudentSubjectRegistration.objects.filter(pk=registration_id).first()
+        apply_assessment_score_delta(old_registration, category_id, -score)
+        mark_registrations_dirty(old_registration)
+    apply_assessment_score_delta(instance.registration, instance.category_id, instance.score)
+    mark_registrations_dirty(instance.registration)
+
+
+@receiver(post_delete, sender=ScorePerAssessmentInstance)
+def apply_instance_score_delete(sender, instance, **kwargs):
+    if _is_cascade(sender, kwargs):
+        return
+    registration = StudentSubjectRegistration.objects.filter(pk=instance.registration_id).first()
+    apply_assessment_score_delta(registration, instance.category_id, -instance.score)
+    mark_registrations_dirty(registration)
+
+
+@receiver([post_save, post_delete], sender=AssessmentCategory)
+@receiver([post_save, post_delete], sender=ResultConfiguration)
+def rescale_school_cas(sender, instance, **kwargs):
+    """
+    The CA denominator (sum of category maxima) or CA weight changed:
+    refresh the cached value and rescale the school's stored CA totals.
+    """
+    if _is_cascade(sender, kwargs):
+        return
+    # A deleted category takes its totals with it, so the raw sums are rebuilt.
+    resync_raw = sender is AssessmentCategory and kwargs.get('signal') is post_delete
+    rescale_continuous_assessments(instance.school_id, resync_raw=resync_raw)
+    mark_registrations_dirty(StudentSubjectRegistration.objects.filter(school_id=instance.school_id))
+
+
+@receiver(post_save, sender=StudentSubjectRegistration)
+def create_empty_continuous_assessment(sender, instance, created, **kwargs):
+    """
+    Every registration gets a zero CA row up front, so CA reads never have to create one.
+    """
+    if created:
+        ContinuousAssessment.objects.get_or_create(registration=instance)
+
+
+#==================== Result materialisation ====================
+
+@receiver([post_save, post_delete], sender=ExamScore)
+def mark_exam_registration_dirty(sender, instance, **kwargs):
+    if instance.registration_id and not _is_cascade(sender, kwargs):
+        mark_registrations_dirty([instance.registration_id])
+
+
+@receiver([post_save, post_delete], sender=AnnualResultWeightConfig)
+def mark_weighted_registrations_dirty(sender, instance, **kwargs):
+    """
+    Drop the school's cached weights; annual averages for this class year and
+    department use the changed weights.
+    """
+    invalidate_weight_resolver(instance.school_id)
+    if _is_cascade(sender, kwargs):
+        return
+    mark_registrations_dirty(
+        StudentSubjectRegistration.objects.filter(
+            school_id=instance.school_id,
+            student_class__class_year_id=instance.class_year_id,
+            subject_class__department_id=instance.department_id,
+        ),
+        term=False,
+    )
+
+
+#==================== Result payload cache ====================
+
+@receiver([post_save, post_delete], sender=Result)
+@receiver([post_save, post_delete], sender=AnnualResult)
+@receiver(post_delete, sender=StudentSubjectRegistration)
+def bump_version_for_result_write(sender, instance, **kwargs):
+    """
+    Row-level result writes (admin edits, detail views, deletes). The bulk
+    engines bump the version themselves.
+    """
+    registration_id = instance.pk if sender is StudentSubjectRegistration else instance.registration_id
+    school_id = getattr(instance, 'school_id', None) or (
+        StudentSubjectRegistration.objects.filter(pk=registration_id).values_list('school_id', flat=True).first()
+    )
+    bump_results_version(school_id)
+
+
+@receiver([post_save, post_delete], sender=GradingSystem)
+@receiver([post_save, post_delete], sender=ResultConfiguration)
+@receiver([post_save, post_delete], sender=AssessmentCategory)
+@receiver([post_save, post_delete], sender=AnnualResultWeightConfig)
+@receiver(post_save, sender=Student)
+def bump_version_for_payload_input(sender, instance, **kwargs):
+    """Grading, configuration and student details are part of the cached payloads too."""
+    bump_results_version(instance.school_id)
+
+
+@receiver(post_save, sender=School)
+def bump_version_for_school(sender, instance, **kwargs):
+    bump_results_version(instance.pk)
+
+
+#==================== Student term summaries ====================
+
+@receiver([post_save, post_delete], sender=Result)
+def refresh_summary_for_result_write(sender, instance, **kwargs):
+    """
+    Row-level Result writes; the flush refreshes the rows it bulk-writes.
+    The pair is looked up now because a cascading delete removes the
+    registration before commit.
+    """
+    pairs = summary_pairs(StudentSubjectRegistration.objects.filter(pk=instance.registration_id))
+    if not pairs:
+        return
+
+    def refresh():
+        refresh_term_summaries(pairs)
+        # Payloads cached between the commit and this refresh read the old summary.
+        bump_results_version(*{school_id for school_id, _, _ in pairs})
+
+    transaction.on_commit(refresh)
@@ -0,0 +1,167 @@
+"""
+Frozen result publication.
+
+publish_results materialises, per class year, every student's term (or
+annual) report payload and the class year and class arm broadsheets into
+ResultSnapshot rows, stored as zlib-compressed compact JSON. While a
+snapshot exists FullStudentResultView and BroadsheetView serve it as is.
+
+Re-publishing after corrections only rebuilds class years whose results
+or positions changed since they were published: each class year's
+broadsheet snapshot keeps a change marker (latest result update, result
+count and ranking time), and class years whose marker still matches are
+skipped. Within a rebuilt class year, only snapshots whose payload
+checksum changed are rewritten. Snapshots are upserted on their unique
+snapshot_key, so concurrent publishes cannot duplicate them. Publishing
+runs in a publish ResultJob (see result.jobs), not in the request.
+"""
+import hashlib
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max
+
+from user_registration.models import (AnnualResult, ClassDepartment, ClassYear, Result, ResultSnapshot,
+                                      StudentRanking)
+from .materialize import flush_dirty_results
+from .report_cards import build_class_report_data, class_students
+from .serializers import FullAnnualResultSerializer, FullTermResultSerializer
+from .utils import get_broadsheet_data
+
+SNAPSHOT_BATCH_SIZE = 200
+
+
+def encode_payload(payload):
+    """(compressed blob, checksum) of a payload as compact JSON."""
+    raw = json.dumps(payload, separators=(',', ':'), cls=DjangoJSONEncoder).encode('utf-8')
+    return zlib.compress(raw), hashlib.sha1(raw).hexdigest()
+
+
+def decode_payload(blob):
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def snapshot_key(kind, year_id, term_id, class_year_id, class_arm_id=None, student_id=None):
+    """The unique ResultSnapshot.snapshot_key of a snapshot."""
+    return ':'.join('-' if part is None else str(part)
+                    for part in (kind, year_id, term_id, class_year_id, class_arm_id, student_id))
+
+
+def _class_year_markers(class_years, year, term):
+    """{class_year_id: change marker} over the results and rankings of the period."""
+    if term:
+        results = Result.objects.filter(registration__term=term)
+    else:
+        results = AnnualResult.objects.filter(registration__term__year=year)
+    markers = {
+        row['registration__student_class__class_year']: [row['latest'], row['count'], None]
+        for row in results.filter(registration__student_class__class_year__in=class_years).values(
+            'registration__student_class__class_year'
+        ).annotate(latest=Max('updated_at'), count=Count('pk'))
+    }
+    for class_year_id, computed_at in StudentRanking.objects.filter(
+        class_year__in=class_years, term=term
+    ).values('class_year').annotate(latest=Max('computed_at')).values_list('class_year', 'latest'):
+        markers.setdefault(class_year_id, [None, 0, None])[2] = computed_at
+    return {
+        class_year_id: '|'.join('' if part is None else str(part) for part in marker)
+        for class_year_id, marker in markers.items()
+    }
+
+
+def _build_class_year(class_year, year, term):
+    """{(student_id, class_arm_id): payload} for one class year's reports and broadsheets."""
+    serializer = FullTermResultSerializer if term else FullAnnualResultSerializer
+    payloads = {}
+    for report in build_class_report_data(class_students(class_year=class_year), year, term):
+        payloads[(report["student"]["student_id"], None)] = dict(serializer(report).data)
+    payloads[(None, None)] = get_broadsheet_data(class_year=class_year, year=year, term=term)
+    for class_arm in ClassDepartment.objects.filter(classes__class_year=class_year).select_related(
+        'classes__class_year', 'department'
+    ):
+        payloads[(None, class_arm.pk)] = get_broadsheet_data(class_arm=class_arm, year=year, term=term)
+    return payloads
+
+
+def _publish_class_year(class_year, year, term, marker):
+    report_kind = 'term_report' if term else 'annual_report'
+    term_id = getattr(term, 'pk', None)
+    existing = dict(
+        ResultSnapshot.objects.filter(class_year=class_year, year=year, term=term).values_list('snapshot_key', 'checksum')
+    )
+
+    written = []
+    for (student_id, class_arm_id), payload in _build_class_year(class_year, year, term).items():
+        blob, checksum = encode_payload(payload)
+        kind = report_kind if student_id else 'broadsheet'
+        key = snapshot_key(kind, year.pk, term_id, class_year.pk, class_arm_id, student_id)
+        is_class_sheet = student_id is None and class_arm_id is None
+        if existing.pop(key, None) == checksum and not is_class_sheet:
+            continue
+        written.append(ResultSnapshot(
+            school_id=class_year.school_id, year=year, term=term, class_year=class_year, kind=kind,
+            student_id=student_id, class_arm_id=class_arm_id, snapshot_key=key,
+            payload=blob, checksum=checksum, source_version=marker if is_class_sheet else '',
+        ))
+
+    with transaction.atomic():
+        ResultSnapshot.objects.bulk_create(
+            written, batch_size=SNAPSHOT_BATCH_SIZE, update_conflicts=True, unique_fields=['snapshot_key'],
+            update_fields=['payload', 'checksum', 'source_version', 'published_at'],
+        )
+        if existing:
+            ResultSnapshot.objects.filter(snapshot_key__in=list(existing)).delete()
+    return len(written), len(existing)
+
+
+def publish_results(school, year, term=None, full=False):
+    """
+    Publish (or re-publish) the school's term results, or annual results when
+    term is None. Dirty results are flushed first. full=True rebuilds every
+    class year. Returns a summary dict.
+    """
+    flush_dirty_results(school_id=school.pk)
+    class_years = list(ClassYear.objects.filter(school=school, year=year))
+    markers = _class_year_markers(class_years, year, term)
+    published = dict(ResultSnapshot.objects.filter(
+        class_year__in=class_years, year=year, term=term, kind='broadsheet', class_arm__isnull=True
+    ).values_list('class_year', 'source_version'))
+
+    summary = {'class_years': 0, 'skipped': 0, 'written': 0, 'removed': 0}
+    for class_year in class_years:
+        marker = markers.get(class_year.pk, '')
+        if not full and class_year.pk in published and published[class_year.pk] == marker:
+            summary['skipped'] += 1
+            continue
+        written, removed = _publish_class_year(class_year, year, term, marker)
+        summary['class_years'] += 1
+        summary['written'] += written
+        summary['removed'] += removed
+    return summary
+
+
+def unpublish_results(school, year, term=None):
+    """Drop the published snapshots; result endpoints compute live again."""
+    deleted, _ = ResultSnapshot.objects.filter(school=school, year=year, term=term).delete()
+    return deleted
+
+
+def published_report(student, year_id, term=None):
+    """The published report payload of a student, or None."""
+    blob = ResultSnapshot.objects.filter(
+        student=student, year_id=year_id, term=term, kind='term_report' if term else 'annual_report'
+    ).values_list('payload', flat=True).first()
+    return decode_payload(blob) if blob is not None else None
+
+
+def published_broadsheet(year, term=None, class_year=None, class_arm=None):
+    """The published class year (or class arm) broadsheet, or None."""
+    snapshots = ResultSnapshot.objects.filter(kind='broadsheet', year=year, term=term)
+    if class_arm:
+        snapshots = snapshots.filter(class_arm=class_arm)
+    else:
+        snapshots = snapshots.filter(class_year=class_year, class_arm__isnull=True)
+    blob = snapshots.values_list('payload', flat=True).first()
+    return decode_payload(blob) if blob is not None else None
@@ -0,0 +1,108 @@
+"""
+Per-student term aggregates (StudentTermSummary).
+
+Only the (student, term) pairs whose Results changed are recomputed: the
+dirty-result flush refreshes the students it wrote Results for, row-level
+Result writes refresh theirs after commit (see result/signals.py), and a
+pass mark change refreshes the whole school. backfill_term_summaries fills
+the table for historical terms.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import Round
+
+from user_registration.models import (Result, ResultConfiguration, StudentSubjectRegistration,
+                                      StudentTermSummary)
+
+SUMMARY_BATCH_SIZE = 500
+SUMMARY_UPSERT_FIELDS = [
+    'school', 'subjects_count', 'total_score', 'average_score', 'subjects_passed', 'subjects_failed', 'updated_at',
+]
+
+
+def summary_pairs(registrations):
+    """(school_id, student_id, term_id) for a queryset of registrations."""
+    return set(
+        registrations.filter(school__isnull=False, term__isnull=False).values_list(
+            'school_id', 'student_class__student_id', 'term_id'
+        ).distinct()
+    )
+
+
+def refresh_term_summaries(pairs):
+    """
+    Recompute StudentTermSummary for the given (school_id, student_id, term_id)
+    triples, dropping summaries of students left without Results.
+    Returns the number of summaries written.
+    """
+    by_school = defaultdict(set)
+    for school_id, student_id, term_id in pairs:
+        if student_id and term_id:
+            by_school[school_id].add((student_id, term_id))
+
+    written = 0
+    for school_id, school_pairs in by_school.items():
+        pass_mark = ResultConfiguration.objects.filter(school_id=school_id).values_list('pass_mark', flat=True).first()
+        pass_mark = 50 if pass_mark is None else pass_mark
+        pairs_list = list(school_pairs)
+        for start in range(0, len(pairs_list), SUMMARY_BATCH_SIZE):
+            written += _refresh_batch(school_id, pass_mark, set(pairs_list[start:start + SUMMARY_BATCH_SIZE]))
+    return written
+
+
+def _refresh_batch(school_id, pass_mark, pairs):
+    students = {student_id for student_id, _ in pairs}
+    terms = {term_id for _, term_id in pairs}
+    aggregates = Result.objects.filter(
+        registration__student_class__student__in=students, registration__term__in=terms
+    ).values(
+        'registration__student_class__student', 'registration__term'
+    ).annotate(
+        subjects_count=Count('pk'),
+        total=Sum('total_score'),
+        average=Round(Avg('total_score'), 2),
+        passed=Count('pk', filter=Q(total_score__gte=pass_mark)),
+    )
+
+    summaries = []
+    for row in aggregates:
+        key = (row['registration__student_class__student'], row['registration__term'])
+        if key not in pairs:
+            continue
+        summaries.append(StudentTermSummary(
+            school_id=school_id,
+            student_id=key[0],
+            term_id=key[1],
+            subjects_count=row['subjects_count'],
+            total_score=row['total'],
+            average_score=row['average'],
+            subjects_passed=row['passed'],
+            subjects_failed=row['subjects_count'] - row['passed'],
+        ))
+    empty = pairs - {(summary.student_id, summary.term_id) for summary in summaries}
+
+    with transaction.atomic():
+        StudentTermSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['student', 'term'],
+            update_fields=SUMMARY_UPSERT_FIELDS,
+        )
+        if empty:
+            stale = Q()
+            for student_id, term_id in empty:
+                stale |= Q(student_id=student_id, term_id=term_id)
+            StudentTermSummary.objects.filter(stale).delete()
+    return len(summaries)
+
+
+def rebuild_term_summaries(school_id=None, term_id=None):
+    """Recompute every summary (optionally for one school and/or term)."""
+    registrations = StudentSubjectRegistration.objects.filter(results__isnull=False)
+    if school_id:
+        registrations = registrations.filter(school_id=school_id)
+    if term_id:
+        registrations = registrations.filter(term_id=term_id)
+    return refresh_term_summaries(summary_pairs(registrations))
@@ -1,3 +1,1118 @@
-from django.test import TestCase
+import uuid
+from io import BytesIO
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+import openpyxl
+from rest_framework.test import APIClient
+
+from user_registration.models import (School, Term, ClassYear, Class, Department, Subject, SubjectClass, Student,
+                                      StudentClass, StudentSubjectRegistration, AssessmentCategory,
+                                      ResultConfiguration, GradingSystem, ScorePerAssessmentInstance, ExamScore,
+                                      AnnualResultWeightConfig, Result, StudentRanking, Teacher, TeacherAssignment,
+                                      ClassDepartment, ContinuousAssessment, ScoreObtainedPerAssessment, AnnualResult,
+                                      Role, UserRole, SchoolAdmin, DirtyResultRegistration, ResultJob,
+                                      ResultSnapshot, ResultVisibilityControl, term_ordinal_from_name)
+from tests.fixtures import MEMORY_CACHE, SeededSchool, enrol, make_class_year, make_subject_class, make_year, register
+from tests.query_budget import EndpointQueryBudgetMixin
+from result.analytics import subject_performance
+from result.cache import bump_results_version, get_or_build, result_cache_stats
+from result.checks import check_shared_cache
+from result.exam_import import import_exam_scores, read_exam_rows
+from result.grading import NOT_GRADED, get_grade_index
+from result.jobs import claim_next_job, enqueue_result_job, run_job
+from result.materialize import flush_dirty_results
+from result.rankings import rank_class_year
+from result.recompute import check_term_consistency, recompute_term_results
+from result.score_entry import bulk_record_assessment_scores
+from result.snapshots import publish_results, published_broadsheet, published_report
+from result.summaries import rebuild_term_summaries
+from result.weights import annual_averages, get_weight_resolver
+from result.utils import (get_full_term_result_data, get_full_annual_result_data, compute_annual_result,
+                          compute_annual_results_for_registrations, compute_results_for_registrations,
+                          calculate_position, format_position, get_broadsheet_data,
+                          export_broadsheet_to_excel, export_school_broadsheets_to_excel)
+
+
+class FullResultQueryBudgetTest(TestCase):
+    """
+    Report card builders must cost the same number of queries whatever the
+    number of subjects a student takes.
+    """
+    TERM_REPORT_QUERIES = 6      # year, school, ranking, summary, results, assessment breakdowns
+    ANNUAL_REPORT_QUERIES = 7    # year, school, ranking, annual results, assessments, CAs, exams
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        cls.year, cls.terms = make_year(cls.school, "First Term", "Second Term", "Third Term")
+        department = baker.make(Department, school=cls.school, name="Junior")
+        class_year, (class_arm,) = make_class_year(cls.school, cls.year, class_name="JSS1")
+        baker.make(ResultConfiguration, school=cls.school)
+        # Commit-time invalidations have to run for the warm loads in setUp to be cached.
+        with cls.captureOnCommitCallbacks(execute=True):
+            baker.make(AnnualResultWeightConfig, school=cls.school, class_year=class_year, department=department)
+            for low, high, grade in [(70, 100, "A"), (50, 69.99, "C"), (0, 49.99, "F")]:
+                baker.make(GradingSystem, school=cls.school, min_score=low, max_score=high, grade=grade)
+        categories = [
+            baker.make(AssessmentCategory, school=cls.school, number_of_times=1, max_score_per_one=10)
+            for _ in range(2)
+        ]
+
+        cls.students = {}
+        for n_subjects in (1, 8):
+            student_class = enrol(cls.school, class_arm)
+            for i in range(n_subjects):
+                subject_class = make_subject_class(cls.school, department=department)
+                for term in cls.terms:
+                    registration = register(student_class, subject_class, term)
+                    for category in categories:
+                        ScorePerAssessmentInstance.objects.create(
+                            registration=registration, category=category, instance_number=1, score=5 + i % 5
+                        )
+                    ExamScore.objects.create(registration=registration, score=40 + i)
+            cls.students[n_subjects] = student_class.student
+        # TestCase never commits, so the on-commit flush has to be run by hand.
+        flush_dirty_results()
+
+    def setUp(self):
+        # Keep the grade index and weight resolver loads out of the budget
+        get_grade_index(self.school)
+        get_weight_resolver(self.school)
+
+    def _student(self, n_subjects):
+        return Student.objects.get(pk=self.students[n_subjects].pk)
+
+    def test_term_report_query_count_is_constant(self):
+        for n_subjects in (1, 8):
+            student = self._student(n_subjects)
+            with self.assertNumQueries(self.TERM_REPORT_QUERIES):
+                data = get_full_term_result_data(student, self.year.year_id, self.terms[0])
+            self.assertEqual(len(data["term_results"]), n_subjects)
+            self.assertTrue(all(len(row["assessments"]) == 2 for row in data["term_results"]))
+            self.assertEqual(data["summary"]["subjects_count"], n_subjects)
+            self.assertEqual(data["summary"]["total_score"], sum(row["total_score"] for row in data["term_results"]))
+
+    def test_annual_report_query_count_is_constant(self):
+        for n_subjects in (1, 8):
+            student = self._student(n_subjects)
+            with self.assertNumQueries(self.ANNUAL_REPORT_QUERIES):
+                data = get_full_annual_result_data(student, self.year.year_id)
+            self.assertEqual(len(data["annual_results"]), n_subjects * len(self.terms))
+            self.assertTrue(all(row["third_term_assessments"]["exam_score"] is not None
+                                for row in data["annual_results"]))
+
+
+class RankClassYearTest(TestCase):
+    """Positions come from Window(Rank()): ties share the lower position, arms rank separately."""
+
+    @classmethod
+    def setUpTestData(cls):
+        school = baker.make(School)
+        year, (cls.term,) = make_year(school, "First Term")
+        cls.class_year, arms = make_class_year(school, year, arms=2)
+        subject_classes = baker.make(SubjectClass, school=school, subject=baker.make(Subject, school=school), _quantity=2)
+
+        # (arm, [subject scores]) per student
+        cls.students = {}
+        for name, arm, scores in [("a", 0, [80, 60]), ("b", 0, [70, 70]), ("c", 0, [50, 40]),
+                                  ("d", 1, [90, 90]), ("e", 1, [30, 50])]:
+            student_class = enrol(school, arms[arm])
+            for subject_class, score in zip(subject_classes, scores):
+                registration = register(student_class, subject_class, cls.term)
+                baker.make(Result, registration=registration, ca_total=0, exam_score=score, total_score=score)
+            cls.students[name] = student_class
+
+    def test_term_positions(self):
+        self.assertEqual(rank_class_year(self.class_year, self.term), 5)
+        positions = {
+            ranking.student_class_id: (ranking.average_score, ranking.position_in_class_arm, ranking.position_in_class_year)
+            for ranking in StudentRanking.objects.filter(term=self.term)
+        }
+        self.assertEqual(positions[self.students["d"].pk], (90, 1, 1))
+        self.assertEqual(positions[self.students["a"].pk], (70, 1, 2))
+        self.assertEqual(positions[self.students["b"].pk], (70, 1, 2))
+        self.assertEqual(positions[self.students["c"].pk], (45, 3, 4))
+        self.assertEqual(positions[self.students["e"].pk], (40, 2, 5))
+
+        subject_positions = dict(
+            Result.objects.filter(registration__student_class=self.students["a"]).values_list(
+                "total_score", "subject_position"
+            )
+        )
+        self.assertEqual(subject_positions, {80: 1, 60: 2})
+
+    def test_moved_student_is_reranked(self):
+        rank_class_year(self.class_year, self.term)
+        new_class_year = baker.make(ClassYear, school=self.class_year.school, year=self.class_year.year)
+        StudentClass.objects.filter(pk=self.students["e"].pk).update(class_year=new_class_year)
+        self.assertEqual(rank_class_year(new_class_year, self.term), 1)
+        ranking = StudentRanking.objects.get(student_class=self.students["e"], term=self.term)
+        self.assertEqual((ranking.class_year_id, ranking.position_in_class_year), (new_class_year.pk, 1))
+
+    def test_unchanged_positions_are_not_rewritten(self):
+        rank_class_year(self.class_year, self.term)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rank_class_year(self.class_year, self.term), 5)
+        self.assertFalse([q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+
+        # Only e's average changes, so the other students' rows are left alone
+        Result.objects.filter(registration__student_class=self.students["e"], total_score=30).update(total_score=10)
+        untouched = StudentRanking.objects.get(student_class=self.students["d"], term=self.term).computed_at
+        rank_class_year(self.class_year, self.term)
+        self.assertEqual(StudentRanking.objects.get(student_class=self.students["d"], term=self.term).computed_at,
+                         untouched)
+        self.assertEqual(StudentRanking.objects.get(student_class=self.students["e"], term=self.term).average_score, 30)
+
+
+def legacy_term_result(registration):
+    """(total, grade, remarks) as the old per-registration compute_result_for_registration produced them."""
+    ca = registration.continuous_assessments.first()
+    exam = registration.exam_scores.first()
+    if not ca or not exam:
+        return None
+    total = ca.ca_total + exam.score
+    grading = GradingSystem.objects.filter(
+        school=registration.school, min_score__lte=total, max_score__gte=total
+    ).first()
+    return total, grading.grade if grading else 'N/A', grading.remarks if grading else 'Not Graded'
+
+
+class TermResultEngineTest(TestCase):
+    """The set-based engine writes what the per-registration function did, and ranks on it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        year, (cls.term,) = make_year(cls.school, "First Term")
+        cls.class_year, (arm,) = make_class_year(cls.school, year)
+        for low, high, grade in [(70, 100, "A"), (50, 69.99, "C"), (0, 49.99, "F")]:
+            GradingSystem.objects.create(school=cls.school, min_score=low, max_score=high, grade=grade,
+                                         remarks=f"{grade} band")
+        subject_classes = [make_subject_class(cls.school) for _ in range(3)]
+        # (CA, exam) per subject; None leaves the row out
+        scores = {
+            "top": [(30, 40), (30, 40), (20, 50)],        # 70, 70, 70 - a band edge
+            "tied": [(25, 45), (20, 50), (35, 35)],       # the same 70 average as "top"
+            "no_ca": [(None, 60), (20, 29.995), (10, 40)],  # 49.995 falls between two bands
+            "no_exam": [(20, None), (15, 35), (0, 0)],
+            "neither": [(None, None), (None, None), (None, None)],
+        }
+        cls.registrations = []
+        for name, pairs in scores.items():
+            student_class = enrol(cls.school, arm)
+            for subject_class, (ca_total, exam_score) in zip(subject_classes, pairs):
+                registration = register(student_class, subject_class, cls.term)
+                # Registrations start with a zero CA row; older data may have none
+                cas = ContinuousAssessment.objects.filter(registration=registration)
+                if ca_total is None:
+                    cas.delete()
+                else:
+                    cas.update(ca_total=ca_total)
+                if exam_score is not None:
+                    ExamScore.objects.create(registration=registration, score=exam_score)
+                cls.registrations.append(registration)
+
+    def test_matches_per_registration_results(self):
+        expected = {r.pk: legacy_term_result(r) for r in self.registrations}
+        Result.objects.all().delete()
+        written = compute_results_for_registrations(
+            StudentSubjectRegistration.objects.filter(pk__in=[r.pk for r in self.registrations])
+        )
+        self.assertEqual(written, sum(row is not None for row in expected.values()))
+        actual = {pk: (total, grade, remarks) for pk, total, grade, remarks in
+                  Result.objects.values_list("registration_id", "total_score", "grade", "remarks")}
+        self.assertEqual(actual, {pk: row for pk, row in expected.items() if row is not None})
+
+    def test_positions_and_averages_match_per_row_ranking(self):
+        compute_results_for_registrations(StudentSubjectRegistration.objects.filter(term=self.term))
+        rank_class_year(self.class_year, self.term)
+
+        totals = {}
+        for registration in self.registrations:
+            row = legacy_term_result(registration)
+            if row is not None:
+                totals.setdefault(registration.student_class_id, []).append(row[0])
+        students = [{"student_id": pk, "average": round(sum(t) / len(t), 2)} for pk, t in totals.items()]
+        positions = calculate_position(students, "average")
+
+        rankings = StudentRanking.objects.filter(term=self.term)
+        self.assertEqual(
+            {r.student_class_id: (round(r.average_score, 2), format_position(r.position_in_class_year))
+             for r in rankings},
+            {s["student_id"]: (s["average"], positions[s["student_id"]]) for s in students},
+        )
+
+
+class SubjectPerformanceTest(TestCase):
+    """Vectorised subject statistics against hand-computed values."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        year, (cls.term,) = make_year(cls.school, "First Term")
+        ResultConfiguration.objects.create(school=cls.school, pass_mark=50)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for low, high, grade in [(70, 100, "A"), (50, 69.99, "C"), (0, 49.99, "F")]:
+                GradingSystem.objects.create(school=cls.school, min_score=low, max_score=high, grade=grade)
+        _, (arm,) = make_class_year(cls.school, year)
+        maths, english = (make_subject_class(cls.school, name) for name in ("Maths", "English"))
+        for maths_score, english_score in [(80, 40), (70, 60), (50, None), (90, None), (30, None)]:
+            student_class = enrol(cls.school, arm)
+            for subject_class, score in [(maths, maths_score), (english, english_score)]:
+                if score is None:
+                    continue
+                registration = register(student_class, subject_class, cls.term)
+                # A blank grade is filled from the grading system
+                baker.make(Result, registration=registration, ca_total=0, exam_score=score, total_score=score, grade="")
+
+    def test_statistics(self):
+        get_grade_index(self.school)
+        with self.assertNumQueries(2):
+            data = subject_performance(self.school, self.term)
+        english, maths = data["subjects"]
+        self.assertEqual(data["grades"], ["A", "C", "F"])
+        self.assertEqual(
+            {key: maths[key] for key in ("students", "mean", "median", "std_dev", "lowest", "highest", "passed", "pass_rate")},
+            {"students": 5, "mean": 64.0, "median": 70.0, "std_dev": 21.54, "lowest": 30.0, "highest": 90.0,
+             "passed": 4, "pass_rate": 80.0},
+        )
+        self.assertEqual(maths["grade_distribution"], {"A": 3, "C": 1, "F": 1})
+        self.assertEqual((english["median"], english["pass_rate"]), (50.0, 50.0))
+        self.assertEqual(english["grade_distribution"], {"A": 0, "C": 1, "F": 1})
+
+
+class ResultPayloadCacheTest(TestCase):
+    """Payloads are rebuilt once the school's results version is bumped, and every read is counted."""
+
+    def test_hits_misses_and_invalidation(self):
+        school, other = baker.make(School), baker.make(School)
+        before = result_cache_stats()["broadsheet"]
+        built = []
+
+        def load(school, scope, payload):
+            return get_or_build("broadsheet", school, scope, lambda: built.append(payload) or payload)
+
+        self.assertEqual([load(school, (1,), "v1"), load(school, (1,), "v2"), load(school, (2,), "v1"),
+                          load(other, (1,), "v1")], ["v1", "v1", "v1", "v1"])
+        self.assertEqual(len(built), 3)
+
+        # The bump retires the school's payloads once the write commits, and only that school's
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_results_version(school)
+            self.assertEqual(load(school, (1,), "v2"), "v1")
+        self.assertEqual([load(school, (1,), "v2"), load(school, (1,), "v3"), load(other, (1,), "v2")],
+                         ["v2", "v2", "v1"])
+        self.assertEqual(len(built), 4)
+
+        after = result_cache_stats()["broadsheet"]
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (4, 4))
+        self.assertGreater(after["hit_rate"], 0)
+
+
+class GradeIndexTest(TestCase):
+    """The cached index grades like the GradingSystem query it replaced, and follows band changes."""
+
+    SCORES = [-1, 0, 49.99, 49.995, 50, 69.99, 70, 85.5, 100, 100.01, None]
+
+    def make_bands(self, bands):
+        school = baker.make(School)
+        with self.captureOnCommitCallbacks(execute=True):
+            for low, high, grade in bands:
+                GradingSystem.objects.create(school=school, min_score=low, max_score=high, grade=grade,
+                                             remarks=f"{grade} band")
+        return school
+
+    def query_grade(self, school, score):
+        if score is None:
+            return NOT_GRADED
+        band = GradingSystem.objects.filter(school=school, min_score__lte=score, max_score__gte=score).first()
+        return (band.grade, band.remarks) if band else NOT_GRADED
+
+    def assert_matches_query(self, school):
+        index = get_grade_index(school)
+        expected = [self.query_grade(school, score) for score in self.SCORES]
+        self.assertEqual([index.lookup(score, NOT_GRADED) for score in self.SCORES], expected)
+        self.assertEqual(index.grade_many([float("nan") if s is None else s for s in self.SCORES]), expected)
+
+    def test_band_edges_and_scores_outside_every_band(self):
+        school = self.make_bands([(0, 49.99, "F"), (50, 69.99, "C"), (70, 100, "A")])
+        self.assert_matches_query(school)
+        index = get_grade_index(school)
+        self.assertEqual([index.lookup(s, NOT_GRADED)[0] for s in (49.99, 49.995, 50, 100, 100.01)],
+                         ["F", "N/A", "C", "A", "N/A"])
+
+    def test_overlapping_bands_fall_back_to_a_scan(self):
+        school = self.make_bands([(0, 60, "P"), (50, 100, "H"), (55, 58, "M")])
+        self.assert_matches_query(school)
+        self.assertEqual(get_grade_index(school).lookup(56)[0], "H")  # the matching band with the highest max
+
+    def test_index_follows_saved_and_deleted_bands(self):
+        school = self.make_bands([(0, 49.99, "F"), (50, 100, "P")])
+        self.assertEqual(get_grade_index(school).lookup(75)[0], "P")
+        with self.assertNumQueries(0):
+            get_grade_index(school)
+
+        band = GradingSystem.objects.get(school=school, grade="P")
+        with self.captureOnCommitCallbacks(execute=True):
+            band.max_score = 69.99
+            band.save()
+            GradingSystem.objects.create(school=school, min_score=70, max_score=100, grade="A")
+        self.assertEqual(get_grade_index(school).lookup(75)[0], "A")
+        self.assert_matches_query(school)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GradingSystem.objects.filter(school=school, grade="A").get().delete()
+        self.assertIsNone(get_grade_index(school).lookup(75))
+        self.assert_matches_query(school)
+
+
+class SharedCacheCheckTest(TestCase):
+    def test_process_local_cache_is_reported(self):
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+        with self.settings(CACHES=MEMORY_CACHE):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['result.W001'])
+
+
+class ContinuousAssessmentTotalsTest(TestCase):
+    """Incremental category and CA totals always equal a full recount of the instance scores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        _, (term,) = make_year(cls.school, "First Term")
+        cls.config = ResultConfiguration.objects.create(school=cls.school, total_ca_score=30)
+        cls.quiz = AssessmentCategory.objects.create(
+            school=cls.school, assessment_name="Quiz", number_of_times=2, max_score_per_one=10
+        )
+        cls.test = AssessmentCategory.objects.create(
+            school=cls.school, assessment_name="Test", number_of_times=1, max_score_per_one=20
+        )
+        _, (arm,) = make_class_year(cls.school, term.year)
+        subject_class = make_subject_class(cls.school)
+        cls.first, cls.second = (register(enrol(cls.school, arm), subject_class, term) for _ in range(2))
+
+    def assert_recounted(self):
+        max_possible = sum(c.number_of_times * c.max_score_per_one
+                           for c in AssessmentCategory.objects.filter(school=self.school))
+        ca_max = ResultConfiguration.objects.get(school=self.school).total_ca_score
+        category_totals, ca_totals = {}, {}
+        for registration in (self.first, self.second):
+            raw = 0
+            for category in AssessmentCategory.objects.filter(school=self.school):
+                total = sum(ScorePerAssessmentInstance.objects.filter(
+                    registration=registration, category=category).values_list("score", flat=True))
+                category_totals[registration.pk, category.pk] = total
+                raw += total
+            ca_totals[registration.pk] = (raw, round(raw / max_possible * ca_max, 2))
+
+        stored = {(row.registration_id, row.category_id): row.total_score
+                  for row in ScoreObtainedPerAssessment.objects.all()}
+        self.assertEqual({key: stored.get(key, 0) for key in category_totals}, category_totals)
+        self.assertEqual(
+            {ca.registration_id: (ca.raw_total, round(ca.ca_total, 2)) for ca in ContinuousAssessment.objects.all()},
+            ca_totals,
+        )
+
+    def test_instance_writes_keep_totals_recounted(self):
+        quiz_1 = ScorePerAssessmentInstance.objects.create(
+            registration=self.first, category=self.quiz, instance_number=1, score=7)
+        ScorePerAssessmentInstance.objects.create(registration=self.first, category=self.quiz, instance_number=2, score=4)
+        test = ScorePerAssessmentInstance.objects.create(
+            registration=self.first, category=self.test, instance_number=1, score=15)
+        self.assert_recounted()
+
+        quiz_1.score = 9
+        quiz_1.save()
+        self.assert_recounted()
+
+        quiz_1.registration = self.second  # moved to another student
+        quiz_1.save()
+        self.assert_recounted()
+
+        test.category = self.quiz  # filed under the wrong category
+        test.instance_number = 2
+        test.score = 8
+        test.save()
+        self.assert_recounted()
+
+        quiz_1.delete()
+        self.assert_recounted()
+
+    def test_category_and_configuration_changes_rescale(self):
+        ScorePerAssessmentInstance.objects.create(registration=self.first, category=self.quiz, instance_number=1, score=6)
+        ScorePerAssessmentInstance.objects.create(registration=self.first, category=self.test, instance_number=1, score=12)
+        ScorePerAssessmentInstance.objects.create(registration=self.second, category=self.test, instance_number=1, score=20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test.max_score_per_one = 40
+            self.test.save()
+        self.assert_recounted()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.config.total_ca_score = 40
+            self.config.save()
+        self.assert_recounted()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test.delete()
+        self.assert_recounted()
+
+
+class BulkScoreEntryTest(TestCase):
+    """Bulk instance scores end with the same totals the per-instance signals keep."""
+
+    @classmethod
+    def setUpTestData(cls):
+        school = baker.make(School)
+        year, (term,) = make_year(school, "First Term", status=True)
+        ResultConfiguration.objects.create(school=school, total_ca_score=30)
+        cls.category = AssessmentCategory.objects.create(
+            school=school, assessment_name="Quiz", number_of_times=2, max_score_per_one=10
+        )
+        AssessmentCategory.objects.create(school=school, assessment_name="Test", number_of_times=1, max_score_per_one=20)
+        _, (arm,) = make_class_year(school, year)
+        subject_class = make_subject_class(school)
+        cls.teacher = baker.make(Teacher, school=school)
+        baker.make(TeacherAssignment, teacher=cls.teacher, subject_class=subject_class, school=school,
+                   class_department_assigned=baker.make(ClassDepartment, school=school, classes=arm))
+        cls.registrations = [register(enrol(school, arm), subject_class, term) for _ in range(3)]
+        # Recorded earlier through the single-score endpoint; the bulk upload replaces it.
+        ScorePerAssessmentInstance.objects.create(
+            registration=cls.registrations[0], category=cls.category, instance_number=1, score=2
+        )
+
+    def _rows(self, *scores):
+        return [
+            {"registration": str(registration.pk), "instance_number": number, "score": score}
+            for registration, pair in zip(self.registrations, scores) for number, score in enumerate(pair, 1)
+        ]
+
+    def test_totals_are_recounted(self):
+        summary, errors = bulk_record_assessment_scores(self.teacher, self.category, self._rows((8, 6), (10, 10), (0, 5)))
+        self.assertEqual(errors, [])
+        self.assertEqual((summary["created"], summary["updated"]), (5, 1))
+        totals = dict(ScoreObtainedPerAssessment.objects.values_list("registration", "total_score"))
+        self.assertEqual([totals[r.pk] for r in self.registrations], [14, 20, 5])
+        # 30 CA marks over 40 possible: 14 -> 10.5
+        cas = dict(ContinuousAssessment.objects.values_list("registration", "ca_total"))
+        self.assertEqual([cas[r.pk] for r in self.registrations], [10.5, 15.0, 3.75])
+
+    def test_any_invalid_row_rejects_the_batch(self):
+        summary, errors = bulk_record_assessment_scores(self.teacher, self.category, self._rows((8, 11), (10, 10)))
+        self.assertIsNone(summary)
+        self.assertEqual(errors, [{"row": 2, "error": "score must be between 0 and 10."}])
+        self.assertEqual(ScorePerAssessmentInstance.objects.count(), 1)
+
+
+class ExamImportTest(TestCase):
+    """Exam sheets are matched by admission number and subject and upserted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        _, (term,) = make_year(cls.school, "First Term", status=True)
+        ResultConfiguration.objects.create(school=cls.school, total_exam_score=60)
+        subject_class = make_subject_class(cls.school, "Maths")
+        cls.registrations = [
+            register(enrol(cls.school, student=baker.make(Student, school=cls.school, admission_number=n)),
+                     subject_class, term)
+            for n in (101, 102)
+        ]
+        ExamScore.objects.create(registration=cls.registrations[0], score=10)
+
+    def _import(self, csv_text):
+        upload = BytesIO(csv_text.encode())
+        upload.name = "exam.csv"
+        return import_exam_scores(self.school, read_exam_rows(upload))
+
+    def test_import_upserts_scores(self):
+        summary, errors = self._import("Admission Number,Subject,Score\n101,maths,45\n102,MATHS,58.5\n")
+        self.assertEqual((summary["imported"], errors), (2, []))
+        self.assertEqual(
+            [ExamScore.objects.get(registration=registration).score for registration in self.registrations], [45, 58.5]
+        )
+
+    def test_invalid_rows_roll_back(self):
+        summary, errors = self._import("admission_number,subject,score\n102,Maths,40\n101,Maths,61\n103,Maths,5\n")
+        self.assertIsNone(summary)
+        self.assertEqual([error["row"] for error in errors], [3, 4])
+        self.assertEqual(ExamScore.objects.count(), 1)
+
+
+class PublishResultsTest(TestCase):
+    """Published payloads are frozen and re-publishing skips unchanged class years."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        cls.year, (cls.term,) = make_year(cls.school, "First Term")
+        subject_class = make_subject_class(cls.school)
+        cls.class_years, cls.results = [], []
+        for _ in range(2):
+            class_year, (arm,) = make_class_year(cls.school, cls.year)
+            baker.make(ClassDepartment, school=cls.school, classes=arm)
+            registration = register(enrol(cls.school, arm), subject_class, cls.term)
+            cls.class_years.append(class_year)
+            cls.results.append(baker.make(Result, registration=registration, ca_total=20, exam_score=40, total_score=60))
+        for class_year in cls.class_years:
+            rank_class_year(class_year, cls.term)
+        cls.admin = baker.make(SchoolAdmin, school=cls.school)
+        baker.make(UserRole, user=cls.admin.user, role=Role.objects.get_or_create(name="School Admin")[0])
+
+    def test_publish_endpoint_queues_a_job(self):
+        client = APIClient()
+        client.force_authenticate(self.admin.user)
+        response = client.post(reverse("result_publish"),
+                               {"year_id": self.year.pk, "term_id": self.term.pk, "full": "true"})
+        self.assertEqual((response.status_code, response.data["kind"], response.data["options"]),
+                         (202, "publish", {"full": True}))
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+        self.assertTrue(run_job(claim_next_job("test-worker")))
+        self.assertEqual(ResultSnapshot.objects.count(), 6)
+        self.assertTrue(ResultVisibilityControl.objects.get(school=self.school).term_result_open)
+
+        # A full re-publish upserts onto the same snapshot keys
+        publish_results(self.school, self.year, self.term, full=True)
+        self.assertEqual(ResultSnapshot.objects.count(), 6)
+
+    def test_republish_rebuilds_changed_class_years_only(self):
+        summary = publish_results(self.school, self.year, self.term)
+        self.assertEqual((summary["class_years"], summary["written"]), (2, 6))
+        student = self.results[0].registration.student_class.student
+        self.assertEqual(published_report(student, self.year.pk, self.term)["term_results"][0]["total_score"], 60)
+
+        self.assertEqual(publish_results(self.school, self.year, self.term)["skipped"], 2)
+
+        Result.objects.filter(pk=self.results[0].pk).update(total_score=70, updated_at=timezone.now())
+        summary = publish_results(self.school, self.year, self.term)
+        self.assertEqual((summary["class_years"], summary["skipped"]), (1, 1))
+        self.assertEqual(published_report(student, self.year.pk, self.term)["term_results"][0]["total_score"], 70)
+        broadsheet = published_broadsheet(self.year, self.term, class_year=self.class_years[0])
+        subject = self.results[0].registration.subject_class.subject.name
+        self.assertEqual(broadsheet["students"][0]["scores"][subject]["score"], 70)
+
+
+class ResultJobTest(TestCase):
+    """Queued jobs are deduplicated, claimed once and record their outcome."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        cls.year, (cls.term,) = make_year(cls.school, "Term")
+        cls.class_year, (arm,) = make_class_year(cls.school, cls.year)
+        subject_class = make_subject_class(cls.school)
+        cls.registrations = []
+        for total in (55, 75):
+            registration = register(enrol(cls.school, arm), subject_class, cls.term)
+            baker.make(Result, registration=registration, ca_total=20, exam_score=total - 20, total_score=total)
+            cls.registrations.append(registration)
+
+    def test_rebuild_rankings_job(self):
+        job, created = enqueue_result_job(self.school, 'rebuild_rankings', year=self.year, term=self.term)
+        self.assertTrue(created)
+        self.assertEqual(enqueue_result_job(self.school, 'rebuild_rankings', year=self.year, term=self.term),
+                         (job, False))
+
+        claimed = claim_next_job('test-worker')
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, 'running', 1))
+        self.assertIsNone(claim_next_job('other-worker'))
+
+        self.assertTrue(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress_done, job.progress_total), ('succeeded', 1, 1))
+        self.assertEqual(job.summary, {"rankings": 2})
+        self.assertEqual(
+            list(StudentRanking.objects.filter(term=self.term).order_by('position_in_class_year')
+                 .values_list('average_score', flat=True)), [75, 55]
+        )
+
+    def test_reclaimed_job_keeps_new_outcome(self):
+        job, _ = enqueue_result_job(self.school, 'rebuild_rankings', year=self.year, term=self.term)
+        stale = claim_next_job('slow-worker')
+        # The heartbeat went stale and another worker took the job over
+        ResultJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timezone.timedelta(days=1))
+        fresh = claim_next_job('other-worker')
+        self.assertEqual((fresh.pk, fresh.attempts), (job.pk, 2))
+
+        self.assertFalse(run_job(stale))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.summary), ('running', 'other-worker', None))
+        self.assertTrue(run_job(fresh))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.summary), ('succeeded', {"rankings": 2}))
+
+    def test_score_write_recomputes_in_place_and_queues_ranking(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExamScore.objects.create(registration=self.registrations[0], score=90)
+        self.assertEqual(Result.objects.get(registration=self.registrations[0]).total_score, 90)
+        self.assertFalse(DirtyResultRegistration.objects.exists())
+        self.assertFalse(StudentRanking.objects.exists())
+        # The term total changed; no annual average exists for a term without an ordinal
+        self.assertEqual(
+            list(ResultJob.objects.values_list('kind', 'class_year', 'term', 'status')),
+            [('rebuild_rankings', self.class_year.pk, self.term.pk, 'queued')],
+        )
+        self.assertTrue(run_job(claim_next_job('test-worker')))
+        self.assertEqual(StudentRanking.objects.filter(term=self.term).count(), 2)
+
+        # Writing the same score again changes no total, so nothing is re-ranked
+        with self.captureOnCommitCallbacks(execute=True):
+            ExamScore.objects.filter(registration=self.registrations[0]).get().save()
+        self.assertFalse(ResultJob.objects.filter(status='queued').exists())
+
+    @override_settings(RESULT_INLINE_FLUSH_LIMIT=1)
+    def test_school_wide_change_is_left_to_a_job(self):
+        for registration in self.registrations:
+            ExamScore.objects.create(registration=registration, score=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            GradingSystem.objects.create(school=self.school, min_score=0, max_score=100, grade="P")
+        self.assertEqual(DirtyResultRegistration.objects.count(), 2)
+        job = ResultJob.objects.get()
+        self.assertEqual((job.kind, job.status), ('flush_dirty', 'queued'))
+
+        self.assertTrue(run_job(claim_next_job('test-worker')))
+        self.assertFalse(DirtyResultRegistration.objects.exists())
+        self.assertEqual(set(Result.objects.values_list('grade', flat=True)), {"P"})
+
+    def test_materialize_endpoint_queues_a_flush(self):
+        admin = baker.make(SchoolAdmin, school=self.school)
+        baker.make(UserRole, user=admin.user, role=Role.objects.get_or_create(name="School Admin")[0])
+        ExamScore.objects.create(registration=self.registrations[0], score=90)
+        client = APIClient()
+        client.force_authenticate(admin.user)
+
+        response = client.post(reverse("result_materialize"))
+        self.assertEqual((response.status_code, response.data["kind"], response.data["status"]),
+                         (202, "flush_dirty", "queued"))
+        self.assertEqual(DirtyResultRegistration.objects.count(), 1)
+
+        self.assertTrue(run_job(claim_next_job('test-worker')))
+        self.assertFalse(DirtyResultRegistration.objects.exists())
+        self.assertEqual(Result.objects.get(registration=self.registrations[0]).total_score, 90)
+
+
+class RecomputeResultsTest(TestCase):
+    """Offline recomputation rebuilds stale CA totals and Results from the stored scores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        year, (cls.term,) = make_year(cls.school, "First Term")
+        ResultConfiguration.objects.create(school=cls.school, total_ca_score=30)
+        category = AssessmentCategory.objects.create(
+            school=cls.school, assessment_name="Quiz", number_of_times=2, max_score_per_one=10
+        )
+        GradingSystem.objects.create(school=cls.school, min_score=0, max_score=100, grade="P", remarks="Pass")
+        _, arms = make_class_year(cls.school, year, arms=2)
+        subject_class = make_subject_class(cls.school)
+        cls.registrations = []
+        for arm in arms:
+            registration = register(enrol(cls.school, arm), subject_class, cls.term)
+            for number, score in enumerate((6, 10), 1):
+                ScorePerAssessmentInstance.objects.create(
+                    registration=registration, category=category, instance_number=number, score=score
+                )
+            ExamScore.objects.create(registration=registration, score=50)
+            cls.registrations.append(registration)
+
+    def test_recompute_repairs_stale_rows(self):
+        ContinuousAssessment.objects.update(raw_total=0, ca_total=0)
+        Result.objects.create(registration=self.registrations[0], ca_total=0, exam_score=10, total_score=10)
+        self.assertEqual(check_term_consistency(self.school, self.term)["mismatched_results"], 1)
+
+        totals = recompute_term_results(self.school, self.term)
+        self.assertEqual((totals["partitions"], totals["results"]), (2, 2))
+        # 16 of 20 CA marks scaled to 30 -> 24, plus 50 in the exam
+        self.assertEqual(sorted(Result.objects.values_list("ca_total", "total_score", "grade")),
+                         [(24.0, 74.0, "P"), (24.0, 74.0, "P")])
+        self.assertEqual(check_term_consistency(self.school, self.term),
+                         {"missing_results": 0, "mismatched_results": 0, "missing_summaries": 0})
+
+
+class TermOrdinalTest(TestCase):
+    """Annual results match terms on (year, ordinal), whatever the terms are called."""
+
+    @classmethod
+    def setUpTestData(cls):
+        school = baker.make(School)
+        year, terms = make_year(school, "Term 1", "2nd term", "Third")
+        _, (arm,) = make_class_year(school, year)
+        student_class = enrol(school, arm)
+        subject_class = make_subject_class(school)
+        cls.registrations = []
+        for term, total in zip(terms, (40, 60, 80)):
+            registration = register(student_class, subject_class, term)
+            baker.make(Result, registration=registration, ca_total=20, exam_score=total - 20, total_score=total)
+            cls.registrations.append(registration)
+
+    def test_ordinal_from_name(self):
+        self.assertEqual([term_ordinal_from_name(name) for name in ("First Term", "Term 2", "3rd", "Summer")],
+                         [1, 2, 3, None])
+        self.assertEqual([r.term.ordinal for r in self.registrations], [1, 2, 3])
+
+    def test_rename_rederives_a_derived_ordinal_only(self):
+        term = Term.objects.get(pk=self.registrations[0].term_id)
+        term.name = "Third Term"
+        term.save()
+        self.assertEqual(Term.objects.get(pk=term.pk).ordinal, 3)
+
+        term.name, term.ordinal = "Summer", 2
+        term.save()
+        term = Term.objects.get(pk=term.pk)
+        self.assertEqual(term.ordinal, 2)
+        # An explicit ordinal survives later renames
+        term.name = "First Term"
+        term.save()
+        self.assertEqual(Term.objects.get(pk=term.pk).ordinal, 2)
+
+    def test_annual_result_pivots_on_ordinal(self):
+        compute_annual_results_for_registrations(StudentSubjectRegistration.objects.filter(pk=self.registrations[2].pk))
+        annual = AnnualResult.objects.get(registration=self.registrations[2])
+        self.assertEqual((annual.first_term_score, annual.second_term_score, annual.third_term_score,
+                          annual.annual_average), (40, 60, 80, 60))
+        self.assertEqual(compute_annual_result(self.registrations[2]).annual_average, 60)
+
+
+class WeightResolverTest(TestCase):
+    """Annual weights are loaded once per school and reloaded when a config changes."""
+
+    def test_cached_until_config_changes(self):
+        school = baker.make(School)
+        class_year = baker.make(ClassYear, school=school)
+        department = baker.make(Department, school=school)
+        with self.captureOnCommitCallbacks(execute=True):
+            config = baker.make(AnnualResultWeightConfig, school=school, class_year=class_year, department=department,
+                                first_term_weight=0.2, second_term_weight=0.3, third_term_weight=0.5)
+        self.assertEqual(get_weight_resolver(school).get(class_year.pk, department.pk), (0.2, 0.3, 0.5))
+        with self.assertNumQueries(0):
+            get_weight_resolver(school)
+
+        # The writing transaction sees its own change at once, everyone else once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            config.third_term_weight = 0.6
+            config.save()
+            self.assertEqual(get_weight_resolver(school).get(class_year.pk, department.pk).third, 0.6)
+        self.assertEqual(get_weight_resolver(school).get(class_year.pk, department.pk).third, 0.6)
+        with self.assertNumQueries(0):
+            get_weight_resolver(school)
+        config.delete()
+        self.assertIsNone(get_weight_resolver(school).get(class_year.pk, department.pk))
+
+    def test_annual_averages(self):
+        nan = float("nan")
+        averages = annual_averages(
+            [60, nan, 60, nan, 60], [70, 70, nan, nan, 70], [80, 80, nan, 80, 80],
+            [[nan] * 3, [nan] * 3, [nan] * 3, [nan] * 3, [0.2, 0.3, 0.5]],
+        )
+        self.assertEqual([round(a, 2) for a in averages[[0, 1, 3, 4]]], [70, 75, 80, 73])
+        self.assertTrue(averages[2] != averages[2])  # one term that is not the third: no rule
+
+
+def legacy_annual_average(registration):
+    """The annual average the old per-registration compute_annual_result produced, or None."""
+    term_results = Result.objects.filter(
+        registration__student_class=registration.student_class,
+        registration__subject_class=registration.subject_class,
+    )
+    first, second, third = (
+        getattr(term_results.filter(registration__term__name__iexact=name).first(), 'total_score', None)
+        for name in ("First Term", "Second Term", "Third Term")
+    )
+    config = AnnualResultWeightConfig.objects.filter(
+        school=registration.school, class_year=registration.student_class.class_year,
+        department=registration.subject_class.department,
+    ).first()
+    if config:
+        return ((first or 0) * config.first_term_weight + (second or 0) * config.second_term_weight
+                + (third or 0) * config.third_term_weight)
+    available = [score for score in (first, second, third) if score is not None]
+    if len(available) == 3:
+        return (first + second + third) / 3
+    if len(available) == 2:
+        return sum(available) / 2
+    if available and third is not None:
+        return third
+    return None
+
+
+class AnnualWeightEquivalenceTest(TestCase):
+    """Both annual engines average every combination of terms as the old per-row function did."""
+
+    TERM_PATTERNS = [(1, 1, 1), (1, 1, 0), (1, 0, 1), (0, 1, 1), (1, 0, 0), (0, 1, 0), (0, 0, 1), (0, 0, 0)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        year, terms = make_year(cls.school, "First Term", "Second Term", "Third Term")
+        class_year, (arm,) = make_class_year(cls.school, year)
+        other_class_year, _ = make_class_year(cls.school, year)
+        weighted, uneven, plain = (baker.make(Department, school=cls.school) for _ in range(3))
+        with cls.captureOnCommitCallbacks(execute=True):
+            AnnualResultWeightConfig.objects.create(school=cls.school, class_year=class_year, department=weighted,
+                                                    first_term_weight=0.25, second_term_weight=0.25,
+                                                    third_term_weight=0.5)
+            # Weights need not add up to 1, and missing terms count as 0
+            AnnualResultWeightConfig.objects.create(school=cls.school, class_year=class_year, department=uneven,
+                                                    first_term_weight=0.3, second_term_weight=0.3,
+                                                    third_term_weight=0.3)
+            # Another class year's weights do not leak into this one's fallback rules
+            AnnualResultWeightConfig.objects.create(school=cls.school, class_year=other_class_year, department=plain,
+                                                    first_term_weight=1, second_term_weight=0,
+                                                    third_term_weight=0)
+            for low, high, grade in [(70, 100, "A"), (50, 69.99, "C"), (0, 49.99, "F")]:
+                GradingSystem.objects.create(school=cls.school, min_score=low, max_score=high, grade=grade)
+
+        subject_classes = [make_subject_class(cls.school, department=department)
+                           for department in (weighted, uneven, plain)]
+        for n, pattern in enumerate(cls.TERM_PATTERNS):
+            student_class = enrol(cls.school, arm)
+            for subject_class in subject_classes:
+                for term, present, score in zip(terms, pattern, (62.5, 71.25, 48.4)):
+                    registration = register(student_class, subject_class, term)
+                    if present:
+                        baker.make(Result, registration=registration, total_score=score + n / 3)
+
+    def test_batch_and_per_row_engines_match_the_old_rules(self):
+        registrations = StudentSubjectRegistration.objects.filter(school=self.school)
+        expected = {registration.pk: legacy_annual_average(registration) for registration in registrations}
+        # Without weights, the first-only, second-only and no-result students get none in each of their 3 terms
+        self.assertEqual(sum(average is None for average in expected.values()), 3 * 3)
+
+        compute_annual_results_for_registrations(registrations)
+        self.assertEqual(
+            dict(AnnualResult.objects.values_list('registration_id', 'annual_average')),
+            {pk: round(average, 2) for pk, average in expected.items() if average is not None},
+        )
+
+        AnnualResult.objects.all().delete()
+        for registration in registrations:
+            annual = compute_annual_result(registration)
+            self.assertEqual(annual and annual.annual_average,
+                             None if expected[registration.pk] is None else round(expected[registration.pk], 2))
+
+
+class BroadsheetTest(TestCase):
+    """
+    A 50 student x 15 subject term broadsheet is read in 5 queries, with tied
+    students sharing positions, and its Excel exports reload intact.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = baker.make(School)
+        cls.year, (cls.term,) = make_year(cls.school, "First Term")
+        cls.class_year, arms = make_class_year(cls.school, cls.year, arms=2, class_name="JSS1")
+        department = baker.make(Department, school=cls.school)
+        for arm, arm_name in zip(arms, "AB"):
+            arm.arm_name = arm_name
+            arm.save()
+            baker.make(ClassDepartment, school=cls.school, classes=arm, department=department)
+        ResultConfiguration.objects.create(school=cls.school, pass_mark=50)
+        subject_classes = [make_subject_class(cls.school, department=department) for _ in range(15)]
+
+        registrations, results, cls.totals = [], [], {}
+        for i in range(50):
+            student_class = enrol(cls.school, arms[i % 2])
+            # Students 0 and 1 score alike (a tie across arms); student 2 has no result in the last subject
+            row = [40 + (max(i, 1) * 7 + j * 13) % 55 for j in range(15 if i != 2 else 14)]
+            cls.totals[str(student_class.student_id)] = (row, arms[i % 2].pk)
+            for subject_class, total in zip(subject_classes, row + [None]):
+                registration = StudentSubjectRegistration(student_class=student_class, subject_class=subject_class,
+                                                          term=cls.term, school=cls.school)
+                registrations.append(registration)
+                if total is not None:
+                    results.append(Result(registration=registration, ca_total=0, exam_score=total,
+                                          total_score=total, grade="A" if total >= 70 else "C"))
+        StudentSubjectRegistration.objects.bulk_create(registrations)
+        Result.objects.bulk_create(results)
+        rebuild_term_summaries(cls.school.pk, cls.term.pk)
+        rank_class_year(cls.class_year, cls.term)
+
+    def test_term_broadsheet(self):
+        class_year = ClassYear.objects.select_related("school").get(pk=self.class_year.pk)
+        # department, result configuration, registrations, term summaries, rankings
+        with self.assertNumQueries(5):
+            broadsheet = get_broadsheet_data(class_year=class_year, year=self.year, term=self.term)
+        self.assertEqual((len(broadsheet["students"]), len(broadsheet["subjects"])), (50, 15))
+
+        averages = [{"student_id": student_id, "average": round(sum(row) / len(row), 2), "arm": arm}
+                    for student_id, (row, arm) in self.totals.items()]
+        by_year = calculate_position(averages, "average")
+        by_arm = {}
+        for arm in {row["arm"] for row in averages}:
+            by_arm.update(calculate_position([row for row in averages if row["arm"] == arm], "average"))
+
+        rows = {row["student_id"]: row for row in broadsheet["students"]}
+        self.assertEqual(
+            {student_id: (row["average_score"], row["passed_subjects"], row["failed_subjects"],
+                          row["position_in_class_year"], row["position_in_class_arm"])
+             for student_id, row in rows.items()},
+            {row["student_id"]: (row["average"], sum(t >= 50 for t in self.totals[row["student_id"]][0]),
+                                 sum(t < 50 for t in self.totals[row["student_id"]][0]),
+                                 by_year[row["student_id"]], by_arm[row["student_id"]])
+             for row in averages},
+        )
+        tied = [rows[row["student_id"]] for row in averages[:2]]
+        self.assertEqual(tied[0]["position_in_class_year"], tied[1]["position_in_class_year"])
+        self.assertEqual(len(rows[averages[2]["student_id"]]["scores"]), 14)
+
+    def test_excel_exports_reload(self):
+        def reload(response):
+            return openpyxl.load_workbook(BytesIO(b"".join(response.streaming_content)))
+
+        broadsheet = get_broadsheet_data(class_year=self.class_year, year=self.year, term=self.term)
+        headers = ["Student Name", *broadsheet["subjects"], "Average", "Class Pos", "Arm Pos", "Passed", "Failed"]
+        workbook = reload(export_broadsheet_to_excel(broadsheet))
+        self.assertEqual(workbook.sheetnames, ["Broadsheet"])
+        sheet = workbook["Broadsheet"]
+        self.assertEqual([cell.value for cell in sheet[2]], headers)
+        self.assertEqual(sheet.max_row, 2 + 50)
+
+        workbook = reload(export_school_broadsheets_to_excel(self.school, self.year, self.term))
+        self.assertEqual(workbook.sheetnames, ["JSS1 A", "JSS1 B"])
+        for sheet in workbook.worksheets:
+            self.assertEqual([cell.value for cell in sheet[2]], headers)
+            self.assertEqual(sheet.max_row, 2 + 25)
+
+
+class ResultCursorPagesTest(TestCase):
+    """Cursor pages of term and annual results run by student, then subject."""
+
+    def test_pages_follow_students_and_subjects(self):
+        seeded = SeededSchool()
+        seeded.grow(1, 1)
+        Student.objects.filter(pk=seeded.students[1].pk).update(last_name=seeded.students[0].last_name)
+        # The class teacher sees every result of the arm, a student their own
+        for name, visible, user, count in (
+            ("result_list", Result.objects.all(), seeded.teacher.user, 9),
+            ("annual_result_list", AnnualResult.objects.filter(registration__student_class__student=seeded.student),
+             seeded.student.user, 3),
+        ):
+            client = APIClient()
+            client.force_authenticate(user)
+            expected = list(visible.order_by(
+                "registration__student_class__student__last_name", "registration__student_class__student_id",
+                "registration__subject_class__subject__name", "pk",
+            ).values_list("pk", flat=True))
+            seen, url = [], reverse(name) + "?pagination=cursor&page_size=2"
+            while url:
+                response = client.get(url)
+                seen += [row[visible.model._meta.pk.name] for row in response.data["results"]]
+                url = response.data["next"]
+            self.assertEqual([uuid.UUID(str(pk)) for pk in seen], expected)
+            self.assertEqual(len(expected), count)
+
+
+def first_pk(model, **filters):
+    """An endpoint kwargs helper: the pk of the first `model` row of the seeded student."""
+    return model.objects.filter(registration__student_class__student=filters.pop("student"), **filters).values_list(
+        "pk", flat=True).first()
+
+
+def term_params(seeded, **params):
+    return {"year_id": seeded.term.year_id, "term_id": seeded.term.pk, **params}
+
+
+class ResultEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """Result list, detail, report and broadsheet endpoints run no queries per row."""
+
+    ENDPOINTS = [
+        ("assessment_category_list_create", None, "admin"),
+        ("grading_system_list_create", None, "admin"),
+        ("assessment_score_list_create", None, "admin"),
+        ("score_obtained_list", None, "teacher"),
+        ("exam_score_list_create", None, "admin"),
+        ("ca_list", None, "teacher"),
+        ("result_list", None, "teacher"),
+        ("annual_result_list", None, "student"),
+        ("annual_result_detail", lambda s: {"annual_result_id": AnnualResult.objects.filter(
+            registration__student_class__student=s.student).values_list("pk", flat=True).first()}, "student"),
+        ("result_job_list_create", None, "admin"),
+        ("result_detail", lambda s: {"result_id": first_pk(Result, student=s.student)}, "teacher"),
+        ("exam_score_detail", lambda s: {"examscore_id": first_pk(ExamScore, student=s.student)}, "admin"),
+        ("assessment_score_detail",
+         lambda s: {"scoreperassessment_id": first_pk(ScorePerAssessmentInstance, student=s.student)}, "admin"),
+        ("full_student_result", lambda s: {"student_id": s.student.pk}, "student", term_params),
+        ("full_student_result", lambda s: {"student_id": s.student.pk}, "student",
+         lambda s: {"year_id": s.term.year_id}),
+        ("broadsheet", None, "admin", lambda s: term_params(s, class_year_id=s.class_year.pk)),
+        ("broadsheet", None, "admin", lambda s: term_params(s, class_arm_id=s.class_department.pk, download="excel")),
+        ("broadsheet", None, "admin", lambda s: term_params(s, scope="school")),
+        ("subject_analytics", None, "admin", term_params),
+        ("subject_analytics", None, "admin", lambda s: term_params(s, class_year_id=s.class_year.pk)),
+        ("class_report_cards", None, "admin", lambda s: term_params(s, class_arm_id=s.class_department.pk)),
+    ]
+
+
+class ClassReportCardsTest(TestCase):
+    """Report card downloads stay within the user's school, and a class teacher's arm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded, cls.other = SeededSchool(), SeededSchool()
+        school = cls.seeded.school
+        cls.other_arm = baker.make(ClassDepartment, school=school, department=cls.seeded.department,
+                                   classes=baker.make(Class, school=school, class_year=cls.seeded.class_year))
+
+    def get(self, user, seeded=None, **params):
+        seeded = seeded or self.seeded
+        params = {"year_id": seeded.term.year_id, "term_id": seeded.term.pk, **params}
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse("class_report_cards"), params)
+
+    def test_admin_only_reaches_own_school(self):
+        admin = self.seeded.admin.user
+        arm = self.seeded.class_department.pk
+        self.assertEqual(self.get(admin, class_arm_id=arm).status_code, 200)
+        self.assertEqual(self.get(admin, class_year_id=self.seeded.class_year.pk).status_code, 200)
+        # Any id from another school is not found
+        self.assertEqual(self.get(admin, seeded=self.other, class_arm_id=arm).status_code, 404)
+        self.assertEqual(self.get(admin, term_id=self.other.term.pk, class_arm_id=arm).status_code, 404)
+        self.assertEqual(self.get(admin, class_arm_id=self.other.class_department.pk).status_code, 404)
+        self.assertEqual(self.get(admin, class_year_id=self.other.class_year.pk).status_code, 404)
+
+    def test_class_teacher_only_reaches_assigned_arm(self):
+        teacher = self.seeded.teacher.user
+        self.assertEqual(self.get(teacher, class_arm_id=self.seeded.class_department.pk).status_code, 200)
+        self.assertEqual(self.get(teacher, class_arm_id=self.other_arm.pk).status_code, 403)
+        self.assertEqual(self.get(teacher, class_year_id=self.seeded.class_year.pk).status_code, 403)
+        self.assertEqual(self.get(self.other.teacher.user, seeded=self.other,
+                                  class_arm_id=self.seeded.class_department.pk).status_code, 404)
+
+
+class SubjectAnalyticsScopeTest(TestCase):
+    """Subject analytics take the school from the user, not from the ids in the query string."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded, cls.other = SeededSchool(), SeededSchool()
+
+    def get(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse("subject_analytics"), params)
+
+    def test_foreign_ids_are_not_found(self):
+        admin, term = self.seeded.admin.user, self.seeded.term.pk
+        self.assertEqual(self.get(admin, term_id=term).status_code, 200)
+        self.assertEqual(self.get(admin, term_id=self.other.term.pk).status_code, 404)
+        self.assertEqual(self.get(admin, term_id=term, class_year_id=self.other.class_year.pk).status_code, 404)
+        self.assertEqual(self.get(admin, term_id=term, class_arm_id=self.other.class_department.pk).status_code, 404)
+        # A class teacher of the other school cannot reach this one through its class ids either
+        self.assertEqual(self.get(self.other.teacher.user, term_id=self.other.term.pk,
+                                  class_arm_id=self.seeded.class_department.pk).status_code, 404)
+
+    def test_class_teacher_limited_to_assigned_arm(self):
+        teacher, term = self.seeded.teacher.user, self.seeded.term.pk
+        self.assertEqual(self.get(teacher, term_id=term, class_arm_id=self.seeded.class_department.pk).status_code, 200)
+        self.assertEqual(self.get(teacher, term_id=term, class_year_id=self.seeded.class_year.pk).status_code, 403)
+        self.assertEqual(self.get(teacher, term_id=term).status_code, 403)
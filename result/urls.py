@@ -4,10 +4,11 @@ from .views import (ResultVisibilityControlListCreateView, ResultVisibilityContr
                     ResultConfigurationListCreateView,ResultConfigurationDetailView,
                     AnnualWeightConfigListCreateView,AnnualWeightConfigDetailView,
                     GradingSystemListCreateView, GradingSystemDetailView,ScorePerAssessmentListCreateView,
-                    ScorePerAssessmentDetailView,ScoreObtainedPerAssessmentListView,ScoreObtainedPerAssessmentListView,
-                    ExamScoreListCreateView, ExamScoreDetailView,ContinuousAssessmentListView,ContinuousAssessmentDetailView,
+                    ScorePerAssessmentDetailView,BulkScorePerAssessmentView,ScoreObtainedPerAssessmentListView,ScoreObtainedPerAssessmentListView,
+                    ExamScoreListCreateView, ExamScoreDetailView, ExamScoreImportView,ContinuousAssessmentListView,ContinuousAssessmentDetailView,
                     AnnualResultListView, AnnualResultDetailView, ResultListView, ResultDetailView,
                     FullStudentResultView, BroadsheetView, ClassTeacherCommentListCreateView, ClassTeacherCommentDetailView,
+                    MaterializeResultsView, ResultCacheStatsView, PublishResultsView, ResultJobListCreateView, ResultJobDetailView, ClassReportCardsView, SubjectAnalyticsView,
                     )
 
 urlpatterns = [
@@ -27,11 +28,13 @@ urlpatterns = [
     path('result/grading-systems/<uuid:id>/', GradingSystemDetailView.as_view(), name='grading_system_detail'),
 
     path('result/assessment-scores/', ScorePerAssessmentListCreateView.as_view(), name='assessment_score_list_create'),
+    path('result/assessment-scores/bulk/', BulkScorePerAssessmentView.as_view(), name='assessment_score_bulk'),
     path('result/assessment-scores/<uuid:scoreperassessment_id>/', ScorePerAssessmentDetailView.as_view(), name='assessment_score_detail'),
 
     path('result/assessment-score-totals/', ScoreObtainedPerAssessmentListView.as_view(), name='score_obtained_list'),
 
     path('result/exam-scores/', ExamScoreListCreateView.as_view(), name='exam_score_list_create'),
+    path('result/exam-scores/import/', ExamScoreImportView.as_view(), name='exam_score_import'),
     path('result/exam-scores/<uuid:examscore_id>/', ExamScoreDetailView.as_view(), name='exam_score_detail'),
 
     path('result/continuous-assessments/', ContinuousAssessmentListView.as_view(), name='ca_list'),
@@ -43,11 +46,19 @@ urlpatterns = [
     path('result/annual-results/', AnnualResultListView.as_view(), name='annual_result_list'),
     path('result/annual-results/<uuid:annual_result_id>/', AnnualResultDetailView.as_view(), name='annual_result_detail'),
 
+    path('result/materialize/', MaterializeResultsView.as_view(), name='result_materialize'),
+    path('result/cache-stats/', ResultCacheStatsView.as_view(), name='result_cache_stats'),
+    path('result/publish/', PublishResultsView.as_view(), name='result_publish'),
+    path('result/jobs/', ResultJobListCreateView.as_view(), name='result_job_list_create'),
+    path('result/jobs/<uuid:job_id>/', ResultJobDetailView.as_view(), name='result_job_detail'),
+
     path('result/classteacher-comments/', ClassTeacherCommentListCreateView.as_view(), name='classteacher_comment_list_create'),
     path('result/classteacher-comments/<uuid:classteacher_comment_id>/', ClassTeacherCommentDetailView.as_view(), name='classteacher_comment_detail'),
 
     path('result/full-student-result/<uuid:student_id>/', FullStudentResultView.as_view(), name='full_student_result'),
     path('result/broadsheet/', BroadsheetView.as_view(), name='broadsheet'),
+    path('result/report-cards/', ClassReportCardsView.as_view(), name='class_report_cards'),
+    path('result/subject-analytics/', SubjectAnalyticsView.as_view(), name='subject_analytics'),
 ]
 
 
@@ -2,18 +2,29 @@ from user_registration.models import (ScoreObtainedPerAssessment, ScorePerAssess
                     ScoreObtainedPerAssessment, ResultConfiguration,Result, 
                     GradingSystem, ExamScore, ContinuousAssessment,AnnualResult,
                     AnnualResultWeightConfig,StudentClass,Year,Department,
-                    StudentSubjectRegistration, Term,)
+                    StudentSubjectRegistration, Term, AssessmentCategory, ClassDepartment,
+                    StudentRanking, StudentTermSummary,)
 
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from .grading import get_grade_index, grade_many, NOT_GRADED
+from .cache import SchoolTableCache, bump_results_version, get_or_build
+from .weights import annual_average, annual_averages, get_weight_resolver
 
 from django.db.models import Q
+import numpy as np
+import pandas as pd
 # excel_export.py
 import openpyxl
 from openpyxl.styles import Font, Alignment
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
-from io import BytesIO
-from django.http import HttpResponse
+from django.http import FileResponse
+import re
+import tempfile
 
 
 def is_result_viewable(school, result_type='term'):
@@ -30,47 +41,232 @@ def is_result_viewable(school, result_type='term'):
         return False
 
 ########==========================================########
-def update_score_obtained_per_assessment(registration, category):
+CA_DENOMINATOR_CACHE_PREFIX = 'result:ca-denominator'
+
+
+def _load_ca_denominator(school_id):
+    max_possible = AssessmentCategory.objects.filter(school_id=school_id).aggregate(
+        total=Sum(F('number_of_times') * F('max_score_per_one'))
+    )['total'] or 0
+    ca_max = ResultConfiguration.objects.filter(school_id=school_id).values_list(
+        'total_ca_score', flat=True
+    ).first()
+    return max_possible, ca_max
+
+
+_ca_denominators = SchoolTableCache(CA_DENOMINATOR_CACHE_PREFIX, _load_ca_denominator)
+
+
+def get_ca_denominator(school_id):
     """
-    Updates or creates the total score for a specific registration and assessment category.
-    Only considers instance scores within the active term.
+    Returns (max_possible, total_ca_score) for a school, cached until its
+    assessment categories or result configuration change.
+    max_possible is the sum of number_of_times * max_score_per_one over all
+    categories; total_ca_score is None when the school has no configuration.
     """
-    # Sum all scores for this registration and category
-    instances = ScorePerAssessmentInstance.objects.filter(
-        registration=registration,
-        category=category
+    return _ca_denominators.get(school_id)
+
+
+def invalidate_ca_denominator(school_id):
+    """Reload a school's CA denominator here at once and everywhere once the transaction commits."""
+    _ca_denominators.invalidate(school_id)
+
+
+def scaled_ca_expression(raw, school_id):
+    """
+    Database expression scaling a raw CA sum to the school's total_ca_score,
+    matching round((raw / max_possible) * ca_max, 2).
+    """
+    max_possible, ca_max = get_ca_denominator(school_id)
+    if not max_possible or ca_max is None:
+        return Value(0.0)
+    return Round(raw / Value(float(max_possible)) * Value(ca_max), 2)
+
+
+def rescale_continuous_assessments(school_id, resync_raw=False):
+    """
+    Drops the cached denominator and rescales every stored CA total for the
+    school in a single UPDATE. Called when categories or the CA weight change;
+    resync_raw first rebuilds raw_total from the category totals.
+    """
+    invalidate_ca_denominator(school_id)
+    cas = ContinuousAssessment.objects.filter(registration__school_id=school_id)
+    if resync_raw:
+        category_sum = ScoreObtainedPerAssessment.objects.filter(
+            registration=OuterRef('registration')
+        ).values('registration').annotate(total=Sum('total_score')).values('total')
+        cas.update(raw_total=Coalesce(Subquery(category_sum), Value(0.0)))
+    cas.update(
+        ca_total=scaled_ca_expression(F('raw_total'), school_id),
+        updated_at=timezone.now(),
     )
 
-    total_score = sum([instance.score for instance in instances])
 
-    # Update or create the total score record
-    obj, _ = ScoreObtainedPerAssessment.objects.update_or_create(
+def apply_assessment_score_delta(registration, category_id, delta):
+    """
+    Adjusts the category total and the ContinuousAssessment for a registration
+    by `delta` after an instance score is created, changed or deleted.
+    Runs inside the caller's transaction.
+    """
+    if registration is None or not delta:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = ScoreObtainedPerAssessment.objects.filter(
+            registration=registration, category_id=category_id
+        ).update(total_score=F('total_score') + delta, updated_at=now)
+        if not updated:
+            ScoreObtainedPerAssessment.objects.create(
+                registration=registration, category_id=category_id, total_score=delta
+            )
+
+        raw = F('raw_total') + delta
+        updated = ContinuousAssessment.objects.filter(registration=registration).update(
+            raw_total=raw,
+            ca_total=scaled_ca_expression(raw, registration.school_id),
+            updated_at=now,
+        )
+        if not updated:
+            ContinuousAssessment.objects.create(
+                registration=registration,
+                raw_total=delta,
+                ca_total=compute_continuous_assessment(registration, raw_total=delta),
+            )
+
+
+def update_score_obtained_per_assessment(registration, category):
+    """
+    Rebuilds the total score for a registration and assessment category from
+    its instance scores, and resyncs the registration's CA. Normal score writes
+    are applied incrementally by apply_assessment_score_delta; this is the
+    full recount used for repairs.
+    """
+    total_score = ScorePerAssessmentInstance.objects.filter(
         registration=registration,
-        category=category,
-        defaults={'total_score': total_score}
-    )
+        category=category
+    ).aggregate(total=Sum('score'))['total'] or 0
+
+    with transaction.atomic():
+        obj, _ = ScoreObtainedPerAssessment.objects.update_or_create(
+            registration=registration,
+            category=category,
+            defaults={'total_score': total_score}
+        )
+        raw_total = ScoreObtainedPerAssessment.objects.filter(
+            registration=registration
+        ).aggregate(total=Sum('total_score'))['total'] or 0
+        ContinuousAssessment.objects.update_or_create(
+            registration=registration,
+            defaults={
+                'raw_total': raw_total,
+                'ca_total': compute_continuous_assessment(registration, raw_total=raw_total),
+            }
+        )
 
     return obj
 
-########==========================================########
-def compute_continuous_assessment(registration):
-    school = registration.school
-    result_config = getattr(school, 'result_configuration', None)
-    if not result_config:
-        return 0.0
 
-    ca_max = result_config.total_ca_score
+def recount_assessment_totals(registration_ids, category_id, school_id):
+    """
+    Set-based update_score_obtained_per_assessment for many registrations of
+    one school and category: the category totals are rebuilt from the
+    instance scores in one upsert, then raw and scaled CA totals in one
+    UPDATE each. Used after bulk score writes, which bypass the signals.
+    """
+    registration_ids = list(registration_ids)
+    totals = ScorePerAssessmentInstance.objects.filter(
+        registration_id__in=registration_ids, category_id=category_id
+    ).values('registration_id').annotate(total=Sum('score'))
+    now = timezone.now()
+
+    with transaction.atomic():
+        ScoreObtainedPerAssessment.objects.bulk_create(
+            [
+                ScoreObtainedPerAssessment(
+                    registration_id=row['registration_id'], category_id=category_id,
+                    total_score=row['total'], updated_at=now,
+                )
+                for row in totals
+            ],
+            update_conflicts=True,
+            unique_fields=['registration', 'category'],
+            update_fields=['total_score', 'updated_at'],
+            batch_size=RESULT_UPSERT_CHUNK_SIZE,
+        )
+        category_sum = ScoreObtainedPerAssessment.objects.filter(
+            registration=OuterRef('registration')
+        ).values('registration').annotate(total=Sum('total_score')).values('total')
+        cas = ContinuousAssessment.objects.filter(registration_id__in=registration_ids)
+        cas.update(raw_total=Coalesce(Subquery(category_sum), Value(0.0)))
+        cas.update(ca_total=scaled_ca_expression(F('raw_total'), school_id), updated_at=now)
 
-    scores = ScoreObtainedPerAssessment.objects.filter(registration=registration)
-    raw_total = sum([s.total_score for s in scores])
-    max_possible = sum([
-        cat.number_of_times * cat.max_score_per_one
-        for cat in school.assessment_categories.all()
-    ])
 
-    if max_possible == 0:
+def rebuild_assessment_totals(registration_ids, school_id):
+    """
+    Full recount of every category total and ContinuousAssessment of the
+    registrations from their instance scores, all categories at once.
+    Category totals without instances drop to 0 and missing CA rows are
+    created, as update_score_obtained_per_assessment does one at a time.
+    Returns the number of CA rows written.
+    """
+    registration_ids = list(registration_ids)
+    instances = ScorePerAssessmentInstance.objects.filter(registration_id__in=registration_ids)
+    category_totals = ScoreObtainedPerAssessment.objects.filter(registration_id__in=registration_ids)
+    max_possible, ca_max = get_ca_denominator(school_id)
+    now = timezone.now()
+
+    with transaction.atomic():
+        ScoreObtainedPerAssessment.objects.bulk_create(
+            [
+                ScoreObtainedPerAssessment(
+                    registration_id=registration_id, category_id=category_id, total_score=total, updated_at=now,
+                )
+                for registration_id, category_id, total in instances.values(
+                    'registration_id', 'category_id'
+                ).annotate(total=Sum('score')).values_list('registration_id', 'category_id', 'total')
+            ],
+            update_conflicts=True,
+            unique_fields=['registration', 'category'],
+            update_fields=['total_score', 'updated_at'],
+            batch_size=RESULT_UPSERT_CHUNK_SIZE,
+        )
+        category_totals.exclude(
+            Exists(instances.filter(registration=OuterRef('registration'), category=OuterRef('category')))
+        ).exclude(total_score=0).update(total_score=0, updated_at=now)
+
+        cas = []
+        for registration_id, raw_total in category_totals.values('registration_id').annotate(
+            total=Sum('total_score')
+        ).values_list('registration_id', 'total'):
+            ca_total = round((raw_total / max_possible) * ca_max, 2) if max_possible and ca_max is not None else 0.0
+            cas.append(ContinuousAssessment(
+                registration_id=registration_id, raw_total=raw_total, ca_total=ca_total, updated_at=now,
+            ))
+        ContinuousAssessment.objects.bulk_create(
+            cas,
+            update_conflicts=True,
+            unique_fields=['registration'],
+            update_fields=['raw_total', 'ca_total', 'updated_at'],
+            batch_size=RESULT_UPSERT_CHUNK_SIZE,
+        )
+    return len(cas)
+
+########==========================================########
+def compute_continuous_assessment(registration, raw_total=None):
+    """
+    Scales a registration's raw CA sum to the school's total_ca_score.
+    Reads the stored category totals unless `raw_total` is given.
+    """
+    max_possible, ca_max = get_ca_denominator(registration.school_id)
+    if ca_max is None or max_possible == 0:
         return 0.0
 
+    if raw_total is None:
+        raw_total = ScoreObtainedPerAssessment.objects.filter(
+            registration=registration
+        ).aggregate(total=Sum('total_score'))['total'] or 0
+
     scaled_total = (raw_total / max_possible) * ca_max
     return round(scaled_total, 2)
 
@@ -80,38 +276,76 @@ def compute_result_for_registration(registration):
     Computes and stores a Result for a student's subject registration.
     Uses ContinuousAssessment and ExamScore values.
     """
-    try:
-        ca_obj = registration.continuous_assessments
-        exam_obj = registration.exam_scores.first()
-    except:
+    registrations = StudentSubjectRegistration.objects.filter(pk=registration.pk)
+    if not compute_results_for_registrations(registrations):
         return None
+    return Result.objects.filter(registration=registration).first()
 
-    if not ca_obj or not exam_obj:
-        return None
 
-    ca_total = ca_obj.ca_total
-    exam_score = exam_obj.score
-    total = ca_total + exam_score
+RESULT_UPSERT_CHUNK_SIZE = 500
+# Term ordinal -> annual pivot column
+TERM_COLUMNS = {1: 'first', 2: 'second', 3: 'third'}
+RESULT_UPSERT_FIELDS = ['ca_total', 'exam_score', 'total_score', 'grade', 'remarks', 'updated_at']
 
-    school = registration.school
-    grading = GradingSystem.objects.filter(
-        school=school, min_score__lte=total, max_score__gte=total
-    ).first()
 
-    grade = grading.grade if grading else 'N/A'
-    remarks = grading.remarks if grading else 'Not Graded'
+def compute_results_for_registrations(registrations, chunk_size=RESULT_UPSERT_CHUNK_SIZE):
+    """
+    Set-based version of compute_result_for_registration.
 
-    result, _ = Result.objects.update_or_create(
-        registration=registration,
-        defaults={
-            'ca_total': ca_total,
-            'exam_score': exam_score,
-            'total_score': total,
-            'grade': grade,
-            'remarks': remarks
-        }
-    )
-    return result
+    Loads every ContinuousAssessment and ExamScore for the given registrations
+    in two queries, grades the totals in memory against each school's cached
+    grade index and upserts the Result rows with one bulk_create per chunk.
+    Registrations without both a CA and an exam score are skipped, as before.
+    Returns the number of Result rows written.
+    """
+    registration_schools = dict(registrations.values_list('registration_id', 'school_id'))
+    if not registration_schools:
+        return 0
+
+    # First CA / exam per registration, mirroring the old `.first()` lookups
+    ca_totals = {}
+    for registration_id, ca_total in ContinuousAssessment.objects.filter(
+        registration__in=registrations
+    ).values_list('registration_id', 'ca_total'):
+        ca_totals.setdefault(registration_id, ca_total)
+
+    exam_scores = {}
+    for registration_id, score in ExamScore.objects.filter(
+        registration__in=registrations
+    ).values_list('registration_id', 'score'):
+        exam_scores.setdefault(registration_id, score)
+
+    results = []
+    grade_indexes = {}
+    for registration_id, school_id in registration_schools.items():
+        if registration_id not in ca_totals or registration_id not in exam_scores:
+            continue
+        ca_total = ca_totals[registration_id]
+        exam_score = exam_scores[registration_id]
+        total = ca_total + exam_score
+        if school_id not in grade_indexes:
+            grade_indexes[school_id] = get_grade_index(school_id)
+        grade, remarks = grade_indexes[school_id].lookup(total, NOT_GRADED)
+        results.append(Result(
+            registration_id=registration_id,
+            ca_total=ca_total,
+            exam_score=exam_score,
+            total_score=total,
+            grade=grade,
+            remarks=remarks,
+        ))
+
+    with transaction.atomic():
+        for start in range(0, len(results), chunk_size):
+            Result.objects.bulk_create(
+                results[start:start + chunk_size],
+                update_conflicts=True,
+                unique_fields=['registration'],
+                update_fields=RESULT_UPSERT_FIELDS,
+            )
+        # bulk_create sends no signals, so the cached payloads are retired here.
+        bump_results_version(*set(registration_schools.values()))
+    return len(results)
 ########==========================================########
 
 def compute_annual_result(registration):
@@ -123,63 +357,29 @@ def compute_annual_result(registration):
       - 2 terms: 50% each
       - 1 term: must be 3rd term (100%)
     """
-    # Fetch term result scores
-    term_results = Result.objects.filter(
+    # Fetch the three term scores of the year in one query, matched on term ordinal
+    term_scores = {}
+    for ordinal, total_score in Result.objects.filter(
         registration__student_class=registration.student_class,
         registration__subject_class=registration.subject_class,
-        registration__student_class__student=registration.student_class.student
-    )
+        registration__term__year=registration.term.year_id,
+        registration__term__ordinal__in=TERM_COLUMNS,
+    ).order_by('pk').values_list('registration__term__ordinal', 'total_score'):
+        term_scores.setdefault(ordinal, total_score)
 
-    first_term_result = term_results.filter(registration__term__name__iexact='First Term').first()
-    second_term_result = term_results.filter(registration__term__name__iexact='Second Term').first()
-    third_term_result = term_results.filter(registration__term__name__iexact='Third Term').first()
-
-    first_score = first_term_result.total_score if first_term_result else None
-    second_score = second_term_result.total_score if second_term_result else None
-    third_score = third_term_result.total_score if third_term_result else None
-
-    # Check configured weights
-    weight_config = AnnualResultWeightConfig.objects.filter(
-        school=registration.school,
-        class_year=registration.student_class.class_year,
-        department=registration.subject_class.department
-    ).first()
+    first_score, second_score, third_score = (term_scores.get(ordinal) for ordinal in TERM_COLUMNS)
 
-    if weight_config:
-        annual_average = (
-            (first_score or 0) * weight_config.first_term_weight +
-            (second_score or 0) * weight_config.second_term_weight +
-            (third_score or 0) * weight_config.third_term_weight
-        )
-    else:
-        # Apply fallback logic
-        present_scores = {
-            'first': first_score,
-            'second': second_score,
-            'third': third_score
-        }
-        available = {k: v for k, v in present_scores.items() if v is not None}
-        count = len(available)
-
-        if count == 3:
-            annual_average = (first_score + second_score + third_score) / 3
-        elif count == 2:
-            annual_average = sum(available.values()) / 2
-        elif count == 1 and 'third' in available:
-            annual_average = third_score
-        else:
-            # Not enough valid data
-            return None
+    # Configured weights, or the fallback rules
+    weights = get_weight_resolver(registration.school_id).get(
+        registration.student_class.class_year_id, registration.subject_class.department_id
+    )
+    average = annual_average(first_score, second_score, third_score, weights)
+    if average is None:
+        # Not enough valid data
+        return None
 
     # Fetch grade
-    grading = GradingSystem.objects.filter(
-        school=registration.school,
-        min_score__lte=annual_average,
-        max_score__gte=annual_average
-    ).first()
-
-    grade = grading.grade if grading else 'N/A'
-    remarks = grading.remarks if grading else 'Not Graded'
+    grade, remarks = get_grade_index(registration.school_id).lookup(average, NOT_GRADED)
 
     # Save or update record
     annual_result, _ = AnnualResult.objects.update_or_create(
@@ -188,141 +388,286 @@ def compute_annual_result(registration):
             'first_term_score': first_score,
             'second_term_score': second_score,
             'third_term_score': third_score,
-            'annual_average': round(annual_average, 2),
+            'annual_average': round(average, 2),
             'grade': grade,
             'remarks': remarks
         }
     )
 
     return annual_result
+
+
+ANNUAL_UPSERT_FIELDS = [
+    'first_term_score', 'second_term_score', 'third_term_score',
+    'annual_average', 'grade', 'remarks', 'updated_at',
+]
+
+
+def compute_annual_results_for_registrations(registrations, chunk_size=RESULT_UPSERT_CHUNK_SIZE):
+    """
+    Set-based version of compute_annual_result, producing identical rows.
+
+    Fetches every term Result for the registrations' student classes in one
+    query, pivots it on (year, term ordinal) into first/second/third term
+    columns, applies the weight
+    config (or the fallback rules) over whole arrays and bulk-upserts
+    AnnualResult. Returns the number of rows written.
+    """
+    registration_rows = list(registrations.values_list(
+        'registration_id', 'school_id', 'student_class_id', 'subject_class_id', 'term__year_id',
+        'student_class__class_year_id', 'subject_class__department_id',
+    ))
+    if not registration_rows:
+        return 0
+    frame = pd.DataFrame(registration_rows, columns=[
+        'registration_id', 'school_id', 'student_class_id', 'subject_class_id', 'year_id',
+        'class_year_id', 'department_id',
+    ])
+
+    # One query for every term result of these student classes
+    term_results = pd.DataFrame(
+        list(Result.objects.filter(
+            registration__student_class__in=registrations.values('student_class'),
+            registration__term__ordinal__in=TERM_COLUMNS,
+        ).values_list(
+            'registration__student_class_id', 'registration__subject_class_id', 'registration__term__year_id',
+            'registration__term__ordinal', 'total_score',
+        ).order_by('pk')),
+        columns=['student_class_id', 'subject_class_id', 'year_id', 'term', 'total_score'],
+    )
+    term_results['term'] = term_results['term'].map(TERM_COLUMNS)
+    term_results = term_results.drop_duplicates(['student_class_id', 'subject_class_id', 'year_id', 'term'], keep='first')
+    pivot = term_results.pivot(
+        index=['student_class_id', 'subject_class_id', 'year_id'], columns='term', values='total_score'
+    ).reindex(columns=['first', 'second', 'third'])
+    frame = frame.join(pivot, on=['student_class_id', 'subject_class_id', 'year_id'])
+
+    weights = np.full((len(frame), 3), np.nan)
+    for school_id, positions in frame.groupby('school_id', sort=False).indices.items():
+        weights[positions] = get_weight_resolver(school_id).weight_matrix(
+            frame['class_year_id'].to_numpy()[positions], frame['department_id'].to_numpy()[positions]
+        )
+    annual = annual_averages(
+        frame['first'].to_numpy(dtype=float), frame['second'].to_numpy(dtype=float),
+        frame['third'].to_numpy(dtype=float), weights,
+    )
+    frame['annual_average'] = annual
+    frame = frame[~np.isnan(annual)]
+
+    annual_results = []
+    for school_id, rows in frame.groupby('school_id', sort=False):
+        grades = grade_many(school_id, rows['annual_average'].to_numpy())
+        for row, (grade, remarks) in zip(rows.itertuples(index=False), grades):
+            annual_results.append(AnnualResult(
+                registration_id=row.registration_id,
+                first_term_score=_none_if_nan(row.first),
+                second_term_score=_none_if_nan(row.second),
+                third_term_score=_none_if_nan(row.third),
+                annual_average=round(float(row.annual_average), 2),
+                grade=grade,
+                remarks=remarks,
+            ))
+
+    with transaction.atomic():
+        for start in range(0, len(annual_results), chunk_size):
+            AnnualResult.objects.bulk_create(
+                annual_results[start:start + chunk_size],
+                update_conflicts=True,
+                unique_fields=['registration'],
+                update_fields=ANNUAL_UPSERT_FIELDS,
+            )
+        bump_results_version(*frame['school_id'].unique().tolist())
+    return len(annual_results)
+
+
+def _none_if_nan(value):
+    return None if value is None or np.isnan(value) else float(value)
+
 ################################### Full Result#########################
 # utils.py
 
 def calculate_grade(score, school):
-    grading = GradingSystem.objects.filter(school=school).order_by('-max_score')
-    for g in grading:
-        if g.min_score <= score <= g.max_score:
-            return g.grade, g.remarks
-    return "", ""
+    return get_grade_index(school).lookup(score, ("", ""))
+
+def _assessment_prefetch():
+    return Prefetch(
+        'registration__total_assessment_scores',
+        queryset=ScoreObtainedPerAssessment.objects.select_related('category'),
+        to_attr='prefetched_assessments',
+    )
+
+
+def _assessment_rows(registration):
+    return [
+        {
+            "assessment_name": a.category.assessment_name,
+            "obtained_score": a.total_score,
+            "max_score": a.category.number_of_times * a.category.max_score_per_one
+        }
+        for a in registration.prefetched_assessments
+    ]
+
+
+def term_report_results(year, term, **filters):
+    """Term Results for report cards, with everything term_result_row reads preloaded."""
+    return Result.objects.filter(
+        registration__term=term,
+        registration__term__year=year,
+        **filters
+    ).select_related(
+        'registration__subject_class__subject', 'registration__student_class'
+    ).prefetch_related(_assessment_prefetch())
+
+
+def term_result_row(result):
+    reg = result.registration
+    subject = reg.subject_class.subject
+    return {
+        "subject": {"subject_id": str(subject.subject_id), "name": subject.name},
+        "class_year": reg.class_year_name,
+        "class_arm": reg.class_arm_name,
+        "ca_total": result.ca_total,
+        "exam_score": result.exam_score,
+        "total_score": result.total_score,
+        "grade": result.grade,
+        "remarks": result.remarks,
+        "subject_position": format_position(result.subject_position),
+        "assessments": _assessment_rows(reg)
+    }
+
+
+def annual_report_results(year, **filters):
+    """AnnualResults for report cards, with everything annual_result_row reads preloaded."""
+    return AnnualResult.objects.filter(
+        registration__term__year=year,
+        **filters
+    ).select_related(
+        'registration__subject_class__subject', 'registration__student_class'
+    ).prefetch_related(
+        _assessment_prefetch(),
+        Prefetch('registration__continuous_assessments',
+                 queryset=ContinuousAssessment.objects.order_by('pk'), to_attr='prefetched_cas'),
+        Prefetch('registration__exam_scores',
+                 queryset=ExamScore.objects.order_by('pk'), to_attr='prefetched_exams'),
+    )
+
+
+def annual_result_row(annual, weights, grades):
+    reg = annual.registration
+    subject = reg.subject_class.subject
+
+    config = weights.get(reg.student_class.class_year_id, reg.subject_class.department_id)
+
+    f, s, t = annual.first_term_score or 0, annual.second_term_score or 0, annual.third_term_score or 0
+    if config:
+        weighted = {
+            "first_term": round(f * config.first, 2),
+            "second_term": round(s * config.second, 2),
+            "third_term": round(t * config.third, 2),
+        }
+    else:
+        terms_present = [score for score in [f, s, t] if score > 0]
+        if len(terms_present) == 3:
+            weighted = {"first_term": f/3, "second_term": s/3, "third_term": t/3}
+        elif len(terms_present) == 2:
+            weighted = {"first_term": f/2, "second_term": s/2, "third_term": t/2}
+        else:
+            weighted = {"first_term": 0, "second_term": 0, "third_term": t} if t else {"first_term": f, "second_term": 0, "third_term": 0}
+
+    avg = round(sum(weighted.values()), 2)
+    grade, remarks = grades.lookup(avg, ("", ""))
+
+    third_ca = reg.prefetched_cas[0] if reg.prefetched_cas else None
+    third_exam = reg.prefetched_exams[0] if reg.prefetched_exams else None
+    third_assessments = _assessment_rows(reg) if third_ca else []
+
+    return {
+        "subject": {"subject_id": str(subject.subject_id), "name": subject.name},
+        "class_year": reg.class_year_name,
+        "class_arm": reg.class_arm_name,
+        "weights_used": {
+            "first_term_weight": config.first if config else None,
+            "second_term_weight": config.second if config else None,
+            "third_term_weight": config.third if config else None
+        },
+        "weighted_term_scores": weighted,
+        "annual_average": avg,
+        "grade": grade,
+        "remarks": remarks,
+        "subject_position": format_position(annual.subject_position),
+        "third_term_assessments": {
+            "ca_total": third_ca.ca_total if third_ca else None,
+            "exam_score": third_exam.score if third_exam else None,
+            "assessments": third_assessments
+        }
+    }
+
+
+def report_rankings(students, year, term=None):
+    """Overall positions per student id for report cards, from StudentRanking."""
+    return {
+        row.pop("student_class__student_id"): {
+            "average_score": row["average_score"],
+            "subjects_count": row["subjects_count"],
+            "position_in_class_arm": format_position(row["position_in_class_arm"]),
+            "position_in_class_year": format_position(row["position_in_class_year"]),
+        }
+        for row in StudentRanking.objects.filter(
+            student_class__student__in=students, class_year__year=year, term=term
+        ).order_by("computed_at").values(
+            "student_class__student_id", "average_score", "subjects_count",
+            "position_in_class_arm", "position_in_class_year",
+        )
+    }
+
+
+def report_term_summaries(students, term):
+    """Term totals per student id for report cards, from StudentTermSummary."""
+    return {
+        row.pop("student_id"): row
+        for row in StudentTermSummary.objects.filter(student__in=students, term=term).values(
+            "student_id", "subjects_count", "total_score", "average_score", "subjects_passed", "subjects_failed",
+        )
+    }
+
 
 def get_full_term_result_data(student, year_id, term):
+    """
+    A student's term report. Assessment breakdowns are prefetched, so the
+    query count does not depend on the number of subjects.
+    """
     year = get_object_or_404(Year, year_id=year_id)
-    results = Result.objects.filter(
-        registration__student_class__student=student,
-        registration__term=term,
-        registration__term__year=year
-    ).select_related('registration__subject_class__subject', 'registration')
+    results = term_report_results(year, term, registration__student_class__student=student)
 
-    data = {
+    return {
         "school": get_school_info(student.school),
         "student": get_student_info(student),
         "year": year.name,
         "term": term.name,
-        "term_results": []
+        "ranking": report_rankings([student], year, term).get(student.student_id),
+        "summary": report_term_summaries([student], term).get(student.student_id),
+        "term_results": [term_result_row(result) for result in results]
     }
 
-    for result in results:
-        reg = result.registration
-        subject = reg.subject_class.subject
-        assessments = []
-        assessment_scores = ScoreObtainedPerAssessment.objects.filter(registration=reg)
-        for a in assessment_scores:
-            max_score = a.category.number_of_times * a.category.max_score_per_one
-            assessments.append({
-                "assessment_name": a.category.assessment_name,
-                "obtained_score": a.total_score,
-                "max_score": max_score
-            })
-
-        data["term_results"].append({
-            "subject": {"subject_id": str(subject.subject_id), "name": subject.name},
-            "class_year": reg.class_year_name,
-            "class_arm": reg.class_arm_name,
-            "ca_total": result.ca_total,
-            "exam_score": result.exam_score,
-            "total_score": result.total_score,
-            "grade": result.grade,
-            "remarks": result.remarks,
-            "assessments": assessments
-        })
-    return data
-
 def get_full_annual_result_data(student, year_id):
+    """
+    A student's annual report. CA, exam and assessment rows are prefetched and
+    weight configs are read once into a dict, so the query count does not
+    depend on the number of subjects.
+    """
     year = get_object_or_404(Year, year_id=year_id)
-    annuals = AnnualResult.objects.filter(
-        registration__student_class__student=student,
-        registration__term__year=year
-    ).select_related('registration__subject_class__subject', 'registration')
-
     school = student.school
     data = {
         "school": get_school_info(school),
         "student": get_student_info(student),
         "year": year.name,
+        "ranking": report_rankings([student], year).get(student.student_id),
         "annual_results": []
     }
-
-    for annual in annuals:
-        reg = annual.registration
-        subject = reg.subject_class.subject
-
-        config = AnnualResultWeightConfig.objects.filter(
-            school=school,
-            class_year=reg.student_class.class_year,
-            department=reg.subject_class.department
-        ).first()
-
-        f, s, t = annual.first_term_score or 0, annual.second_term_score or 0, annual.third_term_score or 0
-        if config:
-            weighted = {
-                "first_term": round(f * config.first_term_weight, 2),
-                "second_term": round(s * config.second_term_weight, 2),
-                "third_term": round(t * config.third_term_weight, 2),
-            }
-        else:
-            terms_present = [score for score in [f, s, t] if score > 0]
-            if len(terms_present) == 3:
-                weighted = {"first_term": f/3, "second_term": s/3, "third_term": t/3}
-            elif len(terms_present) == 2:
-                weighted = {"first_term": f/2, "second_term": s/2, "third_term": t/2}
-            else:
-                weighted = {"first_term": 0, "second_term": 0, "third_term": t} if t else {"first_term": f, "second_term": 0, "third_term": 0}
-
-        avg = round(sum(weighted.values()), 2)
-        grade, remarks = calculate_grade(avg, school)
-
-        third_ca = ContinuousAssessment.objects.filter(registration=reg).first()
-        third_exam = ExamScore.objects.filter(registration=reg).first()
-        third_assessments = []
-        if third_ca:
-            scored_assessments = ScoreObtainedPerAssessment.objects.filter(registration=reg)
-            for a in scored_assessments:
-                max_score = a.category.number_of_times * a.category.max_score_per_one
-                third_assessments.append({
-                    "assessment_name": a.category.assessment_name,
-                    "obtained_score": a.total_score,
-                    "max_score": max_score
-                })
-
-        data["annual_results"].append({
-            "subject": {"subject_id": str(subject.subject_id), "name": subject.name},
-            "class_year": reg.class_year_name,
-            "class_arm": reg.class_arm_name,
-            "weights_used": {
-                "first_term_weight": config.first_term_weight if config else None,
-                "second_term_weight": config.second_term_weight if config else None,
-                "third_term_weight": config.third_term_weight if config else None
-            },
-            "weighted_term_scores": weighted,
-            "annual_average": avg,
-            "grade": grade,
-            "remarks": remarks,
-            "third_term_assessments": {
-                "ca_total": third_ca.ca_total if third_ca else None,
-                "exam_score": third_exam.score if third_exam else None,
-                "assessments": third_assessments
-            }
-        })
+    weights = get_weight_resolver(school)
+    grades = get_grade_index(school)
+    annuals = annual_report_results(year, registration__student_class__student=student)
+    data["annual_results"] = [annual_result_row(annual, weights, grades) for annual in annuals]
     return data
 
 def get_school_info(school):
@@ -348,12 +693,8 @@ def get_student_info(student):
     }
 ################################ Broadsheet #####################
 # utils_broadsheet.py
-def calculate_grade(score, school):
-    grading = GradingSystem.objects.filter(school=school).order_by('-max_score')
-    for g in grading:
-        if g.min_score <= score <= g.max_score:
-            return g.grade
-    return "F"
+def calculate_broadsheet_grade(score, school):
+    return get_grade_index(school).lookup(score, ("F", None))[0]
 
 
 def calculate_position(students, key):
@@ -375,10 +716,34 @@ def ordinal_suffix(n):
     return "th" if 11 <= n % 100 <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
 
 
+def format_position(position):
+    return f"{position}{ordinal_suffix(position)}" if position else None
+
+
+def _broadsheet_department(class_year=None, class_arm=None):
+    if class_arm:
+        return class_arm.department
+    class_department = ClassDepartment.objects.filter(
+        classes__class_year=class_year, department__isnull=False
+    ).select_related('department').first()
+    return class_department.department if class_department else None
+
+
 def get_broadsheet_data(class_year=None, class_arm=None, year=None, term=None):
+    """
+    Build a class broadsheet from one values query over the registrations,
+    left-joined to their Result (term) or AnnualResult (annual) rows and
+    pivoted into a student x subject matrix. Term averages and pass/fail
+    counts are read from StudentTermSummary (see result.summaries), falling
+    back to the matrix for students without a summary and for annual sheets;
+    arm and year-group positions are read from StudentRanking (see
+    result.rankings).
+
+    Target: a 50 student x 15 subject broadsheet in 5 queries and under
+    100 ms (see the benchmark_result_reads command).
+    """
     school = class_year.school if class_year else class_arm.school
-    department = class_year.department if class_year else class_arm.department
-    is_primary_or_junior = department.name.lower() in ["junior", "primary"]
+    department = _broadsheet_department(class_year, class_arm)
 
     result_config = ResultConfiguration.objects.filter(school=school).first()
     pass_mark = result_config.pass_mark if result_config else 50
@@ -393,103 +758,141 @@ def get_broadsheet_data(class_year=None, class_arm=None, year=None, term=None):
     if class_year:
         filters["student_class__class_year"] = class_year
     if class_arm:
-        filters["student_class__class_arm"] = class_arm
-
-    registrations = StudentSubjectRegistration.objects.filter(**filters)
+        filters["student_class__class_arm"] = class_arm.classes_id
+
+    result_prefix, score_key = ("results", "score") if term else ("annual_results", "annual_average")
+    score_field = f"{result_prefix}__total_score" if term else f"{result_prefix}__annual_average"
+    rows = pd.DataFrame(
+        list(StudentSubjectRegistration.objects.filter(**filters).order_by(f"{result_prefix}__pk").values_list(
+            "student_class__student_id", "student_class__student__first_name", "student_class__student__last_name",
+            "subject_class__subject__name", score_field, f"{result_prefix}__grade",
+        )),
+        columns=["student_id", "first_name", "last_name", "subject", "score", "grade"],
+    )
 
-    subjects = list({reg.subject_class.subject.name for reg in registrations})
-    students = list({reg.student_class.student for reg in registrations})
+    students = rows.drop_duplicates("student_id").sort_values(["last_name", "first_name"], kind="stable")
+    subjects = sorted(rows["subject"].unique().tolist())
 
     broadsheet = {
         "broadsheet_type": "term" if term else "annual",
         "year": year.name,
         "term": term.name if term else None,
-        "class_year": class_year.class_name if class_year else None,
+        "class_year": class_year.class_name if class_year else class_arm.classes.class_year.class_name,
         "class_arm": class_arm.classes.arm_name if class_arm else None,
-        "department": department.name,
+        "department": department.name if department else None,
         "pass_mark": pass_mark,
         "subjects": subjects,
         "students": []
     }
+    if students.empty:
+        return broadsheet
+
+    # Keep the first result per student and subject, as .first() did
+    scored = rows[rows["score"].notna()].drop_duplicates(["student_id", "subject"], keep="first").copy()
+    missing_grade = scored["grade"].isna() | (scored["grade"] == "")
+    if missing_grade.any():
+        fallback = get_grade_index(school).grade_many(scored.loc[missing_grade, "score"].to_numpy(), ("F", None))
+        scored.loc[missing_grade, "grade"] = [grade for grade, _ in fallback]
+
+    student_ids = students["student_id"].tolist()
+    matrix = scored.pivot(index="student_id", columns="subject", values="score").reindex(
+        index=student_ids, columns=subjects
+    ).to_numpy(dtype=float)
+    has_score = ~np.isnan(matrix)
+    passed = (has_score & (np.nan_to_num(matrix, nan=-np.inf) >= pass_mark)).sum(axis=1)
+    counts = has_score.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.nansum(matrix, axis=1) / counts
+
+    summaries = {}
+    if term:
+        summaries = {
+            student_id: (average_score, subjects_passed, subjects_failed)
+            for student_id, average_score, subjects_passed, subjects_failed in StudentTermSummary.objects.filter(
+                term=term, student__in=student_ids
+            ).values_list("student_id", "average_score", "subjects_passed", "subjects_failed")
+        }
 
-    student_rows = []
+    rankings = {
+        student_id: (position_in_class_arm, position_in_class_year)
+        for student_id, position_in_class_arm, position_in_class_year in StudentRanking.objects.filter(
+            class_year_id=class_year.pk if class_year else class_arm.classes.class_year_id, term=term
+        ).values_list("student_class__student_id", "position_in_class_arm", "position_in_class_year")
+    }
+
+    scores_by_student = {student_id: {} for student_id in student_ids}
+    for student_id, subject, score, grade in scored[["student_id", "subject", "score", "grade"]].itertuples(index=False):
+        scores_by_student[student_id][subject] = {score_key: float(score), "grade": grade}
 
-    for student in students:
+    student_rows = []
+    for i, student in enumerate(students.itertuples(index=False)):
         row = {
             "student_id": str(student.student_id),
             "name": f"{student.first_name} {student.last_name}",
-            "scores": {},
-            "passed_subjects": 0,
-            "failed_subjects": 0
+            "scores": scores_by_student[student.student_id],
         }
-        subject_scores = []
-
-        for subject in subjects:
-            if term:
-                result = Result.objects.filter(
-                    registration__student_class__student=student,
-                    registration__term=term,
-                    registration__subject_class__subject__name=subject
-                ).first()
-                if result:
-                    score = result.total_score
-                    grade = result.grade or calculate_grade(score, school)
-                    row["scores"][subject] = {"score": score, "grade": grade}
-                    subject_scores.append(score)
-                    if score >= pass_mark:
-                        row["passed_subjects"] += 1
-                    else:
-                        row["failed_subjects"] += 1
-            else:
-                annual_result = AnnualResult.objects.filter(
-                    registration__student_class__student=student,
-                    registration__term__year=year,
-                    registration__subject_class__subject__name=subject
-                ).first()
-                if annual_result:
-                    avg = annual_result.annual_average
-                    grade = annual_result.grade or calculate_grade(avg, school)
-                    row["scores"][subject] = {"annual_average": avg, "grade": grade}
-                    subject_scores.append(avg)
-                    if avg >= pass_mark:
-                        row["passed_subjects"] += 1
-                    else:
-                        row["failed_subjects"] += 1
-
-        if is_primary_or_junior and subject_scores:
-            row["average_score"] = round(sum(subject_scores) / len(subject_scores), 2)
-
+        if student.student_id in summaries:
+            average_score, row["passed_subjects"], row["failed_subjects"] = summaries[student.student_id]
+            row["average_score"] = float(average_score)
+        else:
+            row["passed_subjects"] = int(passed[i])
+            row["failed_subjects"] = int(counts[i] - passed[i])
+            if counts[i]:
+                row["average_score"] = round(float(averages[i]), 2)
+        position_in_class_arm, position_in_class_year = rankings.get(student.student_id, (None, None))
+        row["position_in_class_year"] = format_position(position_in_class_year)
+        row["position_in_class_arm"] = format_position(position_in_class_arm)
         student_rows.append(row)
 
-    if is_primary_or_junior:
-        avg_positions = calculate_position(student_rows, "average_score")
-        for row in student_rows:
-            row["position_in_class_year"] = avg_positions.get(row["student_id"])
-            row["position_in_class_arm"] = avg_positions.get(row["student_id"])
-
     broadsheet["students"] = student_rows
     return broadsheet
 ####################################################################
 
-def export_broadsheet_to_excel(broadsheet_data):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Broadsheet"
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+INVALID_SHEET_TITLE_CHARS = re.compile(r'[\\/*?:\[\]]')
+
 
-    # Title
+def _broadsheet_title(broadsheet_data):
     title = f"{broadsheet_data['class_year']} {broadsheet_data['class_arm']} Broadsheet - {broadsheet_data['year']}"
     if broadsheet_data["broadsheet_type"] == "term":
         title += f" ({broadsheet_data['term']})"
-    ws.merge_cells('A1:H1')
-    ws["A1"] = title
-    ws["A1"].font = Font(size=14, bold=True)
-    ws["A1"].alignment = Alignment(horizontal="center")
+    return title
+
+
+def _unique_sheet_title(name, used):
+    """Excel sheet titles are at most 31 characters, unique and free of []:*?/\\."""
+    base = INVALID_SHEET_TITLE_CHARS.sub("-", name or "Sheet")[:31]
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+def write_broadsheet_sheet(wb, broadsheet_data, sheet_title="Broadsheet"):
+    """
+    Append one broadsheet as a sheet of a write-only workbook. Rows go straight
+    to the workbook's temporary file, so memory does not grow with the sheet count.
+    """
+    ws = wb.create_sheet(title=sheet_title)
+    show_average = any("average_score" in student for student in broadsheet_data["students"])
 
     headers = ["Student Name"] + broadsheet_data["subjects"]
-    if "average_score" in broadsheet_data["students"][0]:
+    if show_average:
         headers += ["Average", "Class Pos", "Arm Pos"]
     headers += ["Passed", "Failed"]
 
+    # Column widths must be set before the first row is written
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 16
+
+    title = WriteOnlyCell(ws, value=_broadsheet_title(broadsheet_data))
+    title.font = Font(size=14, bold=True)
+    title.alignment = Alignment(horizontal="center")
+    ws.append([title])
+    ws.merged_cells.add('A1:H1')
     ws.append(headers)
 
     for student in broadsheet_data["students"]:
@@ -500,7 +903,7 @@ def export_broadsheet_to_excel(broadsheet_data):
             grade = subj_data.get("grade")
             row.append(f"{score} ({grade})" if score is not None else "-")
 
-        if "average_score" in student:
+        if show_average:
             row.append(student.get("average_score", "-"))
             row.append(student.get("position_in_class_year", "-"))
             row.append(student.get("position_in_class_arm", "-"))
@@ -510,22 +913,61 @@ def export_broadsheet_to_excel(broadsheet_data):
 
         ws.append(row)
 
-    # Adjust column widths
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col)].width = 16
+    # Finish the sheet now instead of at save time, so each sheet's writer state is released
+    ws.close()
+    return ws
 
-    output = BytesIO()
+
+def _stream_workbook(wb, filename):
+    """Save a write-only workbook to a temporary file and stream it back."""
+    output = tempfile.TemporaryFile()
     wb.save(output)
     output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def export_broadsheet_to_excel(broadsheet_data):
+    wb = openpyxl.Workbook(write_only=True)
+    write_broadsheet_sheet(wb, broadsheet_data)
 
     filename = f"broadsheet_{broadsheet_data['class_year']}_{broadsheet_data['class_arm']}_{broadsheet_data['year']}"
     if broadsheet_data['broadsheet_type'] == "term":
         filename += f"_{broadsheet_data['term'].replace(' ', '_')}"
     filename += ".xlsx"
 
-    response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return _stream_workbook(wb, filename)
+
+
+def export_school_broadsheets_to_excel(school, year, term=None):
+    """
+    Whole-school workbook: one broadsheet sheet per class arm (ClassDepartment)
+    for the term, or the annual broadsheet when no term is given. Each arm's
+    payload goes through the broadsheet cache and is dropped once written.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    class_arms = ClassDepartment.objects.filter(
+        school=school, classes__class_year__year=year
+    ).select_related('school', 'department', 'classes__class_year').order_by(
+        'classes__class_year__class_name', 'classes__arm_name'
+    )
+
+    used_titles = set()
+    for class_arm in class_arms:
+        broadsheet_data = get_or_build(
+            'broadsheet', school, (None, class_arm.pk, year.pk, term.pk if term else None),
+            lambda: get_broadsheet_data(class_arm=class_arm, year=year, term=term),
+        )
+        sheet_title = _unique_sheet_title(f"{class_arm.classes.class_year.class_name} {class_arm.classes.arm_name}", used_titles)
+        write_broadsheet_sheet(wb, broadsheet_data, sheet_title)
+
+    if not used_titles:
+        wb.create_sheet(title="Broadsheet")
+
+    filename = f"broadsheets_{school.short_name}_{year.name}"
+    if term:
+        filename += f"_{term.name}"
+    filename = f"{filename.replace(' ', '_')}.xlsx"
+    return _stream_workbook(wb, filename)
 
 
 
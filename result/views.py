@@ -9,21 +9,33 @@ from user_registration.models import (Student,ResultVisibilityControl,Assessment
                                       ScoreObtainedPerAssessment, StudentSubjectRegistration,Term, Year,
                                       ExamScore,ContinuousAssessment,Result,
                                       AnnualResult,ClassTeacher, ResultVisibilityControl, Term, Year,
-                                      ClassYear, ClassDepartment,ClassTeacherComment
+                                      ClassYear, ClassDepartment,ClassTeacherComment, ResultJob
                                       )
 from .serializers import (ResultVisibilityControlSerializer,AssessmentCategorySerializer, ResultConfigurationSerializer,
                            AnnualResultWeightConfigSerializer,GradingSystemSerializer,ScorePerAssessmentInstanceSerializer,
                            ScoreObtainedPerAssessmentSerializer,ExamScoreSerializer,ContinuousAssessmentSerializer,
                            ResultSerializer, AnnualResultSerializer,FullAnnualResultSerializer, FullTermResultSerializer,
-                           BroadsheetSerializer,ClassTeacherCommentSerializer)
+                           BroadsheetSerializer,ClassTeacherCommentSerializer, ResultJobSerializer)
 from rest_framework.permissions import IsAuthenticated
 from user_registration.permissions import (IsSuperAdmin,IsschoolAdmin,ISteacher,
                           ISstudent,IsSuperAdminOrSchoolAdmin,IsClassTeacher,
                           HasValidPinAndSchoolId,IsStudentReadOnly,
                           IsTeacherReadOnly,IsSchoolAdminReadOnly,SchoolAdminOrIsClassTeacherOrISstudent)
-from .utils import (update_score_obtained_per_assessment,compute_continuous_assessment,
-                    compute_result_for_registration,compute_annual_result, get_full_term_result_data, 
-                    get_full_annual_result_data,get_broadsheet_data,export_broadsheet_to_excel)
+from .utils import (get_full_term_result_data, get_full_annual_result_data,
+                    get_broadsheet_data,export_broadsheet_to_excel,export_school_broadsheets_to_excel)
+from .cache import get_or_build, result_cache_stats
+from .report_cards import REPORT_CARD_FORMATS, class_students, build_class_report_data, build_report_card_zip
+from .analytics import subject_performance
+from .score_entry import ScoreEntryError, bulk_record_assessment_scores, read_score_rows
+from .exam_import import ExamImportError, import_exam_scores, read_exam_rows
+from .snapshots import unpublish_results, published_report, published_broadsheet
+from .jobs import enqueue_result_job
+from user_registration.pagination import KeysetPagination
+from user_registration.auth_context import get_auth_context
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from django.http import FileResponse
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from .ai_comment_generator import generate_teacher_comment
 
@@ -217,14 +229,15 @@ class ScorePerAssessmentListCreateView(generics.ListCreateAPIView):
         if not active_year or not active_term:
             return ScorePerAssessmentInstance.objects.none()
 
+        scores = ScorePerAssessmentInstance.objects.select_related('category', 'registration__student_class__student')
         if hasattr(user, 'student'):
             registrations = StudentSubjectRegistration.objects.filter(
                 student_class__student=user.student,
                 term=active_term
             )
-            return ScorePerAssessmentInstance.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
-        return ScorePerAssessmentInstance.objects.filter(registration__term=active_term)
+        return scores.filter(registration__term=active_term)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -255,9 +268,49 @@ class ScorePerAssessmentListCreateView(generics.ListCreateAPIView):
         if not is_assigned:
             raise PermissionDenied("You are not assigned to this subject and class.")
 
-        # Save and update total
-        instance = serializer.save()
-        update_score_obtained_per_assessment(instance.registration, instance.category)
+        # Category and CA totals are adjusted by the ScorePerAssessmentInstance signals
+        with transaction.atomic():
+            serializer.save()
+
+
+class BulkScorePerAssessmentView(APIView):
+    """
+    Record many instance scores of one assessment category at once.
+    JSON: {"category": id, "scores": [{"registration": id, "instance_number": 1, "score": 8}, ...]}
+    or multipart with `category` and a CSV/xlsx `file` holding the same columns.
+    Any invalid row rejects the batch; errors are reported per row.
+    """
+    permission_classes = [IsAuthenticated, ISteacher]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        teacher = getattr(request.user, 'teacher', None)
+        if not teacher:
+            raise PermissionDenied("Only teachers can create assessment scores.")
+
+        category_id = request.data.get("category")
+        if not category_id:
+            return Response({"detail": "category is required"}, status=status.HTTP_400_BAD_REQUEST)
+        category = get_object_or_404(AssessmentCategory, assessment_category_id=category_id, school=teacher.school)
+
+        file_obj = request.FILES.get("file")
+        if file_obj:
+            try:
+                rows = read_score_rows(file_obj)
+            except ScoreEntryError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get("scores")
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return Response({"detail": "scores must be a list of objects or a file must be uploaded"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        if not rows:
+            return Response({"detail": "No scores to record."}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary, errors = bulk_record_assessment_scores(teacher, category, rows)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_201_CREATED)
 
 
 class ScorePerAssessmentDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -286,24 +339,23 @@ class ScorePerAssessmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         if not active_year or not active_term:
             return ScorePerAssessmentInstance.objects.none()
 
+        scores = ScorePerAssessmentInstance.objects.select_related('category', 'registration__student_class__student')
         if hasattr(user, 'student'):
             registrations = StudentSubjectRegistration.objects.filter(
                 student_class__student=user.student,
                 term=active_term
             )
-            return ScorePerAssessmentInstance.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
-        return ScorePerAssessmentInstance.objects.filter(registration__term=active_term)
+        return scores.filter(registration__term=active_term)
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        update_score_obtained_per_assessment(instance.registration, instance.category)
+        with transaction.atomic():
+            serializer.save()
 
     def perform_destroy(self, instance):
-        registration = instance.registration
-        category = instance.category
-        instance.delete()
-        update_score_obtained_per_assessment(registration, category)
+        with transaction.atomic():
+            instance.delete()
 
 #=========================================================================================
 
@@ -329,31 +381,32 @@ class ScoreObtainedPerAssessmentListView(generics.ListAPIView):
 
         if not active_term or not active_year:
             return ScoreObtainedPerAssessment.objects.none()
+        scores = ScoreObtainedPerAssessment.objects.select_related('category', 'registration__student_class__student')
 
         if hasattr(user, 'student'):
             registrations = StudentSubjectRegistration.objects.filter(
                 student_class__student=user.student,
                 term=active_term
             )
-            return ScoreObtainedPerAssessment.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
         elif hasattr(user, 'teacher'):
             teacher = user.teacher
             # Get all TeacherAssignments
             assignments = TeacherAssignment.objects.filter(teacher=teacher)
 
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
             registrations = StudentSubjectRegistration.objects.filter(
                 subject_class__in=subject_classes,
                 student_class__class_arm__in=class_arms,
                 term=active_term
             )
-            return ScoreObtainedPerAssessment.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
         # SchoolAdmin
-        return ScoreObtainedPerAssessment.objects.filter(registration__term=active_term)
+        return scores.filter(registration__term=active_term)
 
 #=========================================================================================
 
@@ -376,28 +429,31 @@ class ExamScoreListCreateView(generics.ListCreateAPIView):
         active_term = Term.objects.filter(school=school, status=True).first()
         if not active_term:
             return ExamScore.objects.none()
+        scores = ExamScore.objects.select_related(
+            'registration__student_class__student', 'registration__subject_class__subject'
+        )
 
         if hasattr(user, 'student'):
             registrations = StudentSubjectRegistration.objects.filter(
                 student_class__student=user.student,
                 term=active_term
             )
-            return ExamScore.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
         if hasattr(user, 'teacher'):
             teacher = user.teacher
             assignments = TeacherAssignment.objects.filter(teacher=teacher)
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
             registrations = StudentSubjectRegistration.objects.filter(
                 subject_class__in=subject_classes,
                 student_class__class_arm__in=class_arms,
                 term=active_term
             )
-            return ExamScore.objects.filter(registration__in=registrations)
+            return scores.filter(registration__in=registrations)
 
-        return ExamScore.objects.filter(registration__term=active_term)
+        return scores.filter(registration__term=active_term)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -425,6 +481,36 @@ class ExamScoreListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 
+class ExamScoreImportView(APIView):
+    """
+    Import the active term's exam scores from an uploaded xlsx or CSV `file`
+    with admission_number, subject and score columns. Teachers can only
+    import their assigned subjects and class arms. Any invalid row rejects
+    the import; errors are reported per row (spreadsheet line number).
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin | ISteacher]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        file_obj = request.FILES.get("file")
+        if not file_obj:
+            return Response({"error": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if hasattr(request.user, 'school_admin'):
+            school, teacher = request.user.school_admin.school, None
+        else:
+            teacher = request.user.teacher
+            school = teacher.school
+
+        try:
+            summary, errors = import_exam_scores(school, read_exam_rows(file_obj), teacher=teacher)
+        except ExamImportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+
 class ExamScoreDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExamScoreSerializer
     lookup_field = 'examscore_id'
@@ -469,6 +555,7 @@ class ContinuousAssessmentListView(generics.ListAPIView):
     permission_classes = [ISteacher or ISstudent or IsschoolAdmin]
 
     def get_queryset(self):
+        # CA totals are maintained on score writes, so this is a plain read.
         user = self.request.user
         school = (
             getattr(user, 'school_admin', None) or
@@ -480,38 +567,30 @@ class ContinuousAssessmentListView(generics.ListAPIView):
         if not active_term:
             return ContinuousAssessment.objects.none()
 
+        queryset = ContinuousAssessment.objects.select_related(
+            'registration__subject_class__subject', 'registration__student_class__student'
+        )
+
         if hasattr(user, 'student'):
-            registrations = StudentSubjectRegistration.objects.filter(
-                student_class__student=user.student,
-                term=active_term
+            return queryset.filter(
+                registration__student_class__student=user.student,
+                registration__term=active_term
             )
-            self._generate_missing_cas(registrations)
-            return ContinuousAssessment.objects.filter(registration__in=registrations)
 
         elif hasattr(user, 'teacher'):
             teacher = user.teacher
             assignments = TeacherAssignment.objects.filter(teacher=teacher)
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
-            registrations = StudentSubjectRegistration.objects.filter(
-                subject_class__in=subject_classes,
-                student_class__class_arm__in=class_arms,
-                term=active_term
+            return queryset.filter(
+                registration__subject_class__in=subject_classes,
+                registration__student_class__class_arm__in=class_arms,
+                registration__term=active_term
             )
-            self._generate_missing_cas(registrations)
-            return ContinuousAssessment.objects.filter(registration__in=registrations)
 
         # SchoolAdmin
-        registrations = StudentSubjectRegistration.objects.filter(term=active_term)
-        self._generate_missing_cas(registrations)
-        return ContinuousAssessment.objects.filter(registration__in=registrations)
-
-    def _generate_missing_cas(self, registrations):
-        for reg in registrations:
-            obj, _ = ContinuousAssessment.objects.get_or_create(registration=reg)
-            obj.ca_total = compute_continuous_assessment(reg)
-            obj.save()
+        return queryset.filter(registration__term=active_term)
 
 
 class ContinuousAssessmentDetailView(generics.RetrieveAPIView):
@@ -541,8 +620,8 @@ class ContinuousAssessmentDetailView(generics.RetrieveAPIView):
         elif hasattr(user, 'teacher'):
             teacher = user.teacher
             assignments = TeacherAssignment.objects.filter(teacher=teacher)
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
             registrations = StudentSubjectRegistration.objects.filter(
                 subject_class__in=subject_classes,
@@ -555,9 +634,19 @@ class ContinuousAssessmentDetailView(generics.RetrieveAPIView):
 
 #=================================================================================
 
+# Cursor pages of results run by student, then subject, like a broadsheet
+RESULT_KEY_FIELDS = {
+    'student_last_name': F('registration__student_class__student__last_name'),
+    'student_key': F('registration__student_class__student_id'),
+    'subject_name': F('registration__subject_class__subject__name'),
+}
+
+
 class ResultListView(generics.ListAPIView):
     serializer_class = ResultSerializer
     permission_classes = [ISteacher or ISstudent or IsschoolAdmin or IsClassTeacher]
+    pagination_class = KeysetPagination
+    keyset_ordering = (*RESULT_KEY_FIELDS, 'result_id')
 
     def get_queryset(self):
         user = self.request.user
@@ -589,8 +678,7 @@ class ResultListView(generics.ListAPIView):
                 student_class__student=user.student,
                 term=term
             )
-            self._generate_results(registrations)
-            return Result.objects.filter(registration__in=registrations)
+            return self._results(registrations)
 
         # 2️⃣ CLASS TEACHER — all students in assigned class arms
         if hasattr(user, 'teacher') and IsClassTeacher().has_permission(self.request, self):
@@ -600,32 +688,31 @@ class ResultListView(generics.ListAPIView):
                 student_class__class_arm__in=class_arms,
                 term=term
             )
-            self._generate_results(registrations)
-            return Result.objects.filter(registration__in=registrations)
+            return self._results(registrations)
 
         # 3️⃣ SUBJECT TEACHER — students in assigned subjects and classes
         if hasattr(user, 'teacher'):
             teacher = user.teacher
             assignments = TeacherAssignment.objects.filter(teacher=teacher)
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
             registrations = StudentSubjectRegistration.objects.filter(
                 subject_class__in=subject_classes,
                 student_class__class_arm__in=class_arms,
                 term=term
             )
-            self._generate_results(registrations)
-            return Result.objects.filter(registration__in=registrations)
+            return self._results(registrations)
 
         # 4️⃣ SCHOOL ADMIN — all results in active term
         registrations = StudentSubjectRegistration.objects.filter(term=term)
-        self._generate_results(registrations)
-        return Result.objects.filter(registration__in=registrations)
+        return self._results(registrations)
 
-    def _generate_results(self, registrations):
-        for reg in registrations:
-            compute_result_for_registration(reg)
+    def _results(self, registrations):
+        # Rows are materialised on write (result.materialize); GETs only read.
+        return Result.objects.filter(registration__in=registrations).select_related(
+            'registration__term', 'registration__subject_class__subject', 'registration__student_class__student'
+        ).annotate(**RESULT_KEY_FIELDS)
 
 
 class ResultDetailView(generics.RetrieveAPIView):
@@ -640,6 +727,8 @@ class ResultDetailView(generics.RetrieveAPIView):
 class AnnualResultListView(generics.ListAPIView):
     serializer_class = AnnualResultSerializer
     permission_classes = [ISstudent or ISteacher or IsschoolAdmin or IsClassTeacher]
+    pagination_class = KeysetPagination
+    keyset_ordering = (*RESULT_KEY_FIELDS, 'annual_result_id')
 
     def get_queryset(self):
         user = self.request.user
@@ -659,8 +748,7 @@ class AnnualResultListView(generics.ListAPIView):
                 student_class__student=user.student,
                 student_class__class_year__year=active_year
             )
-            self._generate_annual_results(registrations)
-            return AnnualResult.objects.filter(registration__in=registrations)
+            return self._annual_results(registrations)
 
         # Class Teacher View
         if hasattr(user, 'teacher') and IsClassTeacher().has_permission(self.request, self):
@@ -669,34 +757,43 @@ class AnnualResultListView(generics.ListAPIView):
                 student_class__class_arm__in=class_arms,
                 student_class__class_year__year=active_year
             )
-            self._generate_annual_results(registrations)
-            return AnnualResult.objects.filter(registration__in=registrations)
+            return self._annual_results(registrations)
 
         # Subject Teacher View
         if hasattr(user, 'teacher'):
             assignments = TeacherAssignment.objects.filter(teacher=user.teacher)
-            subject_classes = [a.subject_class for a in assignments]
-            class_arms = [a.class_department_assigned for a in assignments]
+            subject_classes = assignments.values('subject_class')
+            class_arms = assignments.values('class_department_assigned__classes')
 
             registrations = StudentSubjectRegistration.objects.filter(
                 subject_class__in=subject_classes,
                 student_class__class_arm__in=class_arms,
                 student_class__class_year__year=active_year
             )
-            self._generate_annual_results(registrations)
-            return AnnualResult.objects.filter(registration__in=registrations)
+            return self._annual_results(registrations)
 
         # SchoolAdmin View
         registrations = StudentSubjectRegistration.objects.filter(
             school=school,
             student_class__class_year__year=active_year
         )
-        self._generate_annual_results(registrations)
-        return AnnualResult.objects.filter(registration__in=registrations)
+        return self._annual_results(registrations)
 
-    def _generate_annual_results(self, registrations):
-        for reg in registrations:
-            compute_annual_result(reg)
+    def _annual_results(self, registrations):
+        # Rows are materialised on write (result.materialize); GETs only read.
+        return annual_results_for_display(
+            AnnualResult.objects.filter(registration__in=registrations)
+        ).annotate(**RESULT_KEY_FIELDS)
+
+
+def annual_results_for_display(queryset):
+    """Load everything AnnualResultSerializer reads, third-term detail included."""
+    return queryset.select_related(
+        'registration__subject_class__subject', 'registration__student_class__student', 'registration__term'
+    ).prefetch_related(
+        'registration__continuous_assessments', 'registration__exam_scores',
+        'registration__total_assessment_scores__category',
+    )
 
 
 class AnnualResultDetailView(generics.RetrieveAPIView):
@@ -705,7 +802,7 @@ class AnnualResultDetailView(generics.RetrieveAPIView):
     permission_classes = [ISstudent or ISteacher or IsschoolAdmin or IsClassTeacher]
 
     def get_queryset(self):
-        return AnnualResult.objects.all()
+        return annual_results_for_display(AnnualResult.objects.all())
 
 #=================================================================================
 class ClassTeacherCommentListCreateView(generics.ListCreateAPIView):
@@ -755,6 +852,109 @@ class ClassTeacherCommentDetailView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
         return ClassTeacherComment.objects.filter(classteacher=user.classteacher, term__is_active=True)
 
+class MaterializeResultsView(APIView):
+    """
+    Queues a flush_dirty job that recomputes the school's dirty
+    Result/AnnualResult rows; poll the returned job at result/jobs/<job_id>/.
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin]
+
+    def post(self, request):
+        school = request.user.school_admin.school
+        # A running flush may already have read the rows dirtied since it started
+        job, _ = enqueue_result_job(school, 'flush_dirty', user=request.user, reuse_running=False)
+        return Response(ResultJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class PublishResultsView(APIView):
+    """
+    POST queues a publish job that freezes the school's term (term_id) or
+    annual results of a year into snapshots served by the report and
+    broadsheet endpoints, then opens the matching result visibility; poll
+    the returned job at result/jobs/<job_id>/. Re-posting after corrections
+    rebuilds only the class years that changed (full=true rebuilds
+    everything). DELETE drops the snapshots so results are computed live again.
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin]
+
+    def _period(self, request):
+        school = request.user.school_admin.school
+        year_id = request.data.get("year_id") or request.query_params.get("year_id")
+        term_id = request.data.get("term_id") or request.query_params.get("term_id")
+        if not year_id:
+            return school, None, None
+        year = get_object_or_404(Year, year_id=year_id, school=school)
+        term = get_object_or_404(Term, term_id=term_id, year=year) if term_id else None
+        return school, year, term
+
+    def post(self, request):
+        school, year, term = self._period(request)
+        if year is None:
+            return Response({"detail": "year_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        full = str(request.data.get("full", "")).lower() in ("1", "true", "yes")
+
+        job, _ = enqueue_result_job(school, 'publish', year=year, term=term,
+                                    options={'full': True} if full else None, user=request.user)
+        return Response(ResultJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def delete(self, request):
+        school, year, term = self._period(request)
+        if year is None:
+            return Response({"detail": "year_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"deleted": unpublish_results(school, year, term)}, status=status.HTTP_200_OK)
+
+
+class ResultJobListCreateView(generics.ListCreateAPIView):
+    """
+    Queue a heavy result job (recompute_term with term, recompute_annual or
+    rebuild_rankings or publish with year, flush_dirty) for the run_result_worker
+    command, and list the school's jobs. Posting a job that is already queued or running
+    returns the existing one.
+    """
+    serializer_class = ResultJobSerializer
+    permission_classes = [IsAuthenticated, IsschoolAdmin]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False) or not getattr(self, 'request', None) or not getattr(self.request, 'user', None) or not getattr(self.request.user, 'is_authenticated', False) or not hasattr(self.request.user, 'school_admin'):
+            return ResultJob.objects.none()
+        jobs = ResultJob.objects.filter(school=self.request.user.school_admin.school)
+        job_status = self.request.query_params.get("status")
+        if job_status:
+            jobs = jobs.filter(status=job_status)
+        return jobs
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = enqueue_result_job(
+            request.user.school_admin.school, user=request.user, **serializer.validated_data
+        )
+        return Response(
+            self.get_serializer(job).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class ResultJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ResultJobSerializer
+    permission_classes = [IsAuthenticated, IsschoolAdmin]
+    lookup_field = 'job_id'
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False) or not getattr(self, 'request', None) or not getattr(self.request, 'user', None) or not getattr(self.request.user, 'is_authenticated', False) or not hasattr(self.request.user, 'school_admin'):
+            return ResultJob.objects.none()
+        return ResultJob.objects.filter(school=self.request.user.school_admin.school)
+
+
+class ResultCacheStatsView(APIView):
+    """
+    Hit/miss counters of the broadsheet and report card cache, counted by
+    the worker process that serves the request.
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin]
+
+    def get(self, request):
+        return Response(result_cache_stats(), status=status.HTTP_200_OK)
+
 #============================FULL RESULTS=========================================
 
 
@@ -775,13 +975,71 @@ class FullStudentResultView(APIView):
         if not term_id and not visibility.annual_result_open:
             return Response({"detail": "Annual results are not visible yet."}, status=status.HTTP_403_FORBIDDEN)
 
-        if term_id:
-            term = get_object_or_404(Term, term_id=term_id)
-            result_data = get_full_term_result_data(student, year_id, term)
-            return Response(FullTermResultSerializer(result_data).data)
+        term = get_object_or_404(Term, term_id=term_id) if term_id else None
+        published = published_report(student, year_id, term)
+        if published is not None:
+            return Response(published)
+
+        if term:
+            payload = get_or_build(
+                'term_report', school, (student.student_id, year_id, term.term_id),
+                lambda: dict(FullTermResultSerializer(get_full_term_result_data(student, year_id, term)).data),
+            )
         else:
-            result_data = get_full_annual_result_data(student, year_id)
-            return Response(FullAnnualResultSerializer(result_data).data)
+            payload = get_or_build(
+                'annual_report', school, (student.student_id, year_id),
+                lambda: dict(FullAnnualResultSerializer(get_full_annual_result_data(student, year_id)).data),
+            )
+        return Response(payload)
+
+
+def require_assigned_class_arm(context, class_arm):
+    """Class teachers (anyone but a school admin) may only use the class arms they are assigned to."""
+    if context.has_role('School Admin'):
+        return
+    if class_arm is None or not ClassTeacher.objects.filter(
+        teacher=context.teacher, class_assigned_id=class_arm.classes_id
+    ).exists():
+        raise PermissionDenied("You can only access the class you are assigned to.")
+
+
+class ClassReportCardsView(APIView):
+    """
+    Report cards for every student of a class arm (class_arm_id) or class year
+    (class_year_id), rendered as xlsx or HTML files and downloaded as one ZIP.
+    Everything is looked up within the user's school; class teachers can only
+    download the arms they are assigned to.
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin | IsClassTeacher]
+
+    def get(self, request):
+        year_id = request.query_params.get("year_id")
+        term_id = request.query_params.get("term_id")
+        class_year_id = request.query_params.get("class_year_id")
+        class_arm_id = request.query_params.get("class_arm_id")
+        fmt = request.query_params.get("file_format", "xlsx")
+
+        if not year_id:
+            return Response({"detail": "year_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (class_year_id or class_arm_id):
+            return Response({"detail": "class_year_id or class_arm_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if fmt not in REPORT_CARD_FORMATS:
+            return Response({"detail": f"file_format must be one of {', '.join(REPORT_CARD_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        context = get_auth_context(request)
+        school = context.school
+        year = get_object_or_404(Year, year_id=year_id, school=school)
+        term = get_object_or_404(Term, term_id=term_id, year=year) if term_id else None
+        class_arm = (get_object_or_404(ClassDepartment, subject_class_id=class_arm_id, school=school)
+                     if class_arm_id else None)
+        class_year = get_object_or_404(ClassYear, class_year_id=class_year_id, school=school) if not class_arm else None
+        require_assigned_class_arm(context, class_arm)
+
+        payloads = build_class_report_data(class_students(class_arm, class_year), year, term)
+        archive = build_report_card_zip(payloads, fmt)
+        filename = f"report_cards_{year.name}_{term.name if term else 'annual'}.zip".replace(" ", "_")
+        return FileResponse(archive, as_attachment=True, filename=filename, content_type="application/zip")
 
 #=================================================================================
 #================================BROADSHEET=======================================
@@ -795,20 +1053,38 @@ class BroadsheetView(APIView):
         class_year_id = request.query_params.get("class_year_id")
         class_arm_id = request.query_params.get("class_arm_id")
         download = request.query_params.get("download")
+        whole_school = request.query_params.get("scope") == "school"
 
         if not year_id:
             return Response({"detail": "year_id is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         year = get_object_or_404(Year, year_id=year_id)
         term = get_object_or_404(Term, term_id=term_id) if term_id else None
+
+        if whole_school:
+            # One sheet per class arm, streamed as an Excel download (school admins only)
+            if not hasattr(request.user, 'school_admin'):
+                raise PermissionDenied("Only school admins can export the whole-school broadsheet.")
+            school = request.user.school_admin.school
+            if year.school_id != school.id:
+                return Response({"detail": "Year does not belong to your school."}, status=status.HTTP_404_NOT_FOUND)
+            return export_school_broadsheets_to_excel(school, year, term)
+
         class_year = get_object_or_404(ClassYear, class_year_id=class_year_id) if class_year_id else None
         class_arm = get_object_or_404(ClassDepartment, subject_class_id=class_arm_id) if class_arm_id else None
 
-        data = get_broadsheet_data(
-            class_year=class_year,
-            class_arm=class_arm,
-            year=year,
-            term=term
+        school = class_year.school if class_year else class_arm.school if class_arm else None
+        if school is None:
+            return Response({"detail": "class_year_id or class_arm_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = published_broadsheet(year, term, class_year=class_year, class_arm=class_arm) or get_or_build(
+            'broadsheet', school, (class_year_id, class_arm_id, year.year_id, term.term_id if term else None),
+            lambda: get_broadsheet_data(
+                class_year=class_year,
+                class_arm=class_arm,
+                year=year,
+                term=term
+            ),
         )
 
         if download == "excel":
@@ -816,5 +1092,37 @@ class BroadsheetView(APIView):
 
         return Response(data)
 
+
+class SubjectAnalyticsView(APIView):
+    """
+    Mean, median, standard deviation, pass rate and grade distribution of
+    each subject for a term, in a class arm (class_arm_id), a class year
+    (class_year_id) or, for school admins, the whole school. Everything is
+    looked up within the user's school; class teachers only see their arms.
+    """
+    permission_classes = [IsAuthenticated, IsschoolAdmin | IsClassTeacher]
+
+    def get(self, request):
+        term_id = request.query_params.get("term_id")
+        class_year_id = request.query_params.get("class_year_id")
+        class_arm_id = request.query_params.get("class_arm_id")
+
+        if not term_id:
+            return Response({"detail": "term_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = get_auth_context(request)
+        school = context.school
+        term = get_object_or_404(Term.objects.select_related("year"), term_id=term_id, school=school)
+        class_year = get_object_or_404(ClassYear, class_year_id=class_year_id, school=school) if class_year_id else None
+        class_arm = (get_object_or_404(ClassDepartment, subject_class_id=class_arm_id, school=school)
+                     if class_arm_id else None)
+        require_assigned_class_arm(context, class_arm)
+
+        data = get_or_build(
+            'subject_analytics', school, (class_year_id, class_arm_id, term.term_id),
+            lambda: subject_performance(school, term, class_year=class_year, class_arm=class_arm),
+        )
+        return Response(data)
+
 #=================================================================================
 #=================================================================================
@@ -0,0 +1,106 @@
+"""
+Per-school annual weight resolver.
+
+AnnualResultWeightConfig rows are loaded once per school into a dict keyed
+by (class_year_id, department_id), the first row by pk winning as the old
+per-row .first() lookups did. Resolvers are kept like the grade index, by
+a SchoolTableCache whose version token the config save/delete signals in
+result/signals.py rotate.
+
+annual_averages applies the weights, or the fallback rules where a row has
+none, to whole arrays of term scores.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from result.cache import SchoolTableCache
+from user_registration.models import AnnualResultWeightConfig
+
+WEIGHT_RESOLVER_CACHE_PREFIX = 'result:annual-weights'
+WEIGHT_RESOLVER_LRU_SIZE = 256
+
+TermWeights = namedtuple('TermWeights', ['first', 'second', 'third'])
+
+
+class WeightResolver:
+    """Annual term weights of one school by (class_year_id, department_id)."""
+
+    def __init__(self, configs):
+        self.weights = {}
+        for class_year_id, department_id, *weights in configs:
+            self.weights.setdefault((class_year_id, department_id), TermWeights(*weights))
+
+    def __len__(self):
+        return len(self.weights)
+
+    def get(self, class_year_id, department_id):
+        """TermWeights for the class year and department, or None."""
+        return self.weights.get((class_year_id, department_id))
+
+    def weight_matrix(self, class_year_ids, department_ids):
+        """(n, 3) array of weights aligned with the ids; NaN rows have no config."""
+        matrix = np.full((len(class_year_ids), 3), np.nan)
+        for i, key in enumerate(zip(class_year_ids, department_ids)):
+            weights = self.weights.get(key)
+            if weights is not None:
+                matrix[i] = weights
+        return matrix
+
+
+def annual_averages(first, second, third, weights):
+    """
+    Annual averages of aligned arrays of term scores (NaN = no result) and an
+    (n, 3) weight matrix (NaN rows = no config). Configured rows are the
+    weighted sum with missing terms as 0; the others fall back to the mean
+    of three terms, the mean of two, or the third term alone. NaN where no
+    rule applies. Operation order matches the old scalar code, so floats
+    are identical.
+    """
+    first, second, third = (np.asarray(scores, dtype=float) for scores in (first, second, third))
+    weights = np.asarray(weights, dtype=float).reshape(-1, 3)
+    has_weights = ~np.isnan(weights[:, 0])
+    w1, w2, w3 = np.nan_to_num(weights).T
+    present = ~np.isnan(np.stack([first, second, third]))
+    count = present.sum(axis=0)
+    f0, s0, t0 = np.nan_to_num(first), np.nan_to_num(second), np.nan_to_num(third)
+
+    weighted = f0 * w1 + s0 * w2 + t0 * w3
+    fallback = np.select(
+        [count == 3, count == 2, (count == 1) & present[2]],
+        [(first + second + third) / 3, (f0 + s0 + t0) / 2, third],
+        default=np.nan,
+    )
+    return np.where(has_weights, weighted, fallback)
+
+
+def annual_average(first, second, third, weights=None):
+    """annual_averages for one row of scores (None = no result); None when no rule applies."""
+    average = annual_averages(
+        [np.nan if first is None else first],
+        [np.nan if second is None else second],
+        [np.nan if third is None else third],
+        [weights if weights is not None else (np.nan,) * 3],
+    )[0]
+    return None if np.isnan(average) else float(average)
+
+
+def _load_configs(school_id):
+    return list(
+        AnnualResultWeightConfig.objects.filter(school_id=school_id).order_by('pk').values_list(
+            'class_year_id', 'department_id', 'first_term_weight', 'second_term_weight', 'third_term_weight',
+        )
+    )
+
+
+_resolvers = SchoolTableCache(WEIGHT_RESOLVER_CACHE_PREFIX, _load_configs, WeightResolver, WEIGHT_RESOLVER_LRU_SIZE)
+
+
+def get_weight_resolver(school):
+    """Return the cached WeightResolver for a school (instance or id)."""
+    return _resolvers.get(school)
+
+
+def invalidate_weight_resolver(school):
+    """Drop a school's resolver here and, once the transaction commits, everywhere else."""
+    _resolvers.invalidate(school)
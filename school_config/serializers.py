@@ -35,9 +35,20 @@ class TermSerializer(serializers.ModelSerializer):
     school_name = serializers.CharField(source="school.school_name", read_only=True)  # Fetch school name
     class Meta:
         model = Term
-        fields = ['term_id', 'name', 'start_date', 'end_date', 'year', 'school','school_name', 'status']
+        fields = ['term_id', 'name', 'ordinal', 'start_date', 'end_date', 'year', 'school','school_name', 'status']
         read_only_fields = ['term_id', 'school','school_name','created_at']
 
+    def validate(self, attrs):
+        """A term without an ordinal would be left out of annual results."""
+        term = self.instance or Term()
+        name = attrs.get('name', term.name)
+        ordinal = attrs['ordinal'] if 'ordinal' in attrs else term.ordinal
+        if term.ordinal_for(name, ordinal) is None:
+            raise serializers.ValidationError({
+                'ordinal': "Set the term's position in the year (1-3); it cannot be read from the name."
+            })
+        return attrs
+
 class ClassYearSerializer(serializers.ModelSerializer):
     """
     Serializer for Class Year including School Name and Year Name.
@@ -1 +1,50 @@
-from django.test import TestCase
\ No newline at end of file
+from datetime import date
+
+from django.test import TestCase
+from model_bakery import baker
+
+from school_config.serializers import TermSerializer
+from tests.fixtures import make_year
+from tests.query_budget import EndpointQueryBudgetMixin
+from user_registration.models import School
+
+
+class TermSerializerTest(TestCase):
+    """Terms are only saved when their position in the year is known."""
+
+    def test_name_without_an_ordinal_is_rejected(self):
+        school = baker.make(School)
+        year, (term,) = make_year(school, "First Term")
+        data = {"start_date": date.today(), "end_date": date.today(), "year": year.pk}
+
+        serializer = TermSerializer(data={**data, "name": "Summer"})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("ordinal", serializer.errors)
+        serializer = TermSerializer(data={**data, "name": "Summer", "ordinal": 3})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save(school=school).ordinal, 3)
+
+        self.assertFalse(TermSerializer(term, data={"name": "Harmattan"}, partial=True).is_valid())
+        serializer = TermSerializer(term, data={"name": "Second Term"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().ordinal, 2)
+
+
+class SchoolConfigEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """School setup list endpoints run no queries per row."""
+
+    ENDPOINTS = [
+        ("year-list-create", None, "admin"),
+        ("term-list-create", None, "admin"),
+        ("class-year-list-create", None, "admin"),
+        ("class-list-create", None, "admin"),
+        ("classroom-list-create", None, "admin"),
+        ("department-list-create", None, "admin"),
+        ("subject-list-create", None, "admin"),
+        ("class-teacher-list", None, "admin"),
+        ("class_department_list_create", None, "admin"),
+        ("subject-class-list-create", None, "admin"),
+        ("teacher-assignment-list-create", None, "admin"),
+        ("student-class-list", None, "admin"),
+        ("student-subject-registration-list-create", None, "admin"),
+    ]
@@ -40,6 +40,7 @@ from io import StringIO
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser
+from user_registration.auth_context import get_auth_context, load_auth_context
 from user_registration.utils import generate_temp_token, validate_temp_token
 from django.utils.crypto import get_random_string
 from rest_framework.exceptions import ValidationError
@@ -209,7 +210,7 @@ class ClassroomListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False) or not getattr(self.request, 'user', None) or not getattr(self.request.user, 'is_authenticated', False) or not hasattr(self.request.user, 'school_admin'):
             return Classroom.objects.none()
-        return Classroom.objects.filter(school=self.request.user.school_admin.school)
+        return Classroom.objects.filter(school=self.request.user.school_admin.school).select_related('school')
 
     def perform_create(self, serializer):
         serializer.save(school=self.request.user.school_admin.school)
@@ -282,7 +283,7 @@ class SubjectListCreateView(generics.ListCreateAPIView):
         elif hasattr(self.request.user, 'student'):
             school = self.request.user.student.school
 
-        queryset = Subject.objects.filter(school=school)
+        queryset = Subject.objects.filter(school=school).select_related('school')
 
         # Filter by department if department_id is provided in the query params
         department_id = self.request.query_params.get("department_id")
@@ -566,7 +567,8 @@ class SubjectClassListCreateView(generics.ListCreateAPIView):
         """
         if getattr(self, 'swagger_fake_view', False) or not getattr(self.request, 'user', None) or not getattr(self.request.user, 'is_authenticated', False) or not hasattr(self.request.user, 'school_admin'):
             return SubjectClass.objects.none()
-        return SubjectClass.objects.filter(school=self.request.user.school_admin.school)
+        return SubjectClass.objects.filter(school=self.request.user.school_admin.school).select_related(
+            'subject', 'school', 'department')
 
     def perform_create(self, serializer):
         """
@@ -855,11 +857,8 @@ class StudentClassListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, SchoolAdminOrIsClassTeacherOrISstudent]
 
     def _current_school(self, user):
-        for rel in ("school_admin", "teacher", "student"):
-            obj = getattr(user, rel, None)
-            if obj:
-                return getattr(obj, "school", None)
-        return None
+        context = get_auth_context(self.request) if user == self.request.user else load_auth_context(user)
+        return context.school
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
@@ -960,18 +959,23 @@ class StudentSubjectRegistrationListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
+        # Everything the serializer reads per row.
+        registrations = StudentSubjectRegistration.objects.select_related(
+            'student_class__student', 'student_class__class_year', 'student_class__class_arm',
+            'subject_class__subject', 'subject_class__department', 'term', 'school',
+        )
 
         if hasattr(user, 'school_admin'):
-            return StudentSubjectRegistration.objects.filter(school=user.school_admin.school)
+            return registrations.filter(school=user.school_admin.school)
 
         elif hasattr(user, 'teacher'):
             teacher = user.teacher
             student_classes = teacher.assigned_classes.values_list('class_assigned__class_id', flat=True)
-            return StudentSubjectRegistration.objects.filter(student_class__class_arm__classes__in=student_classes)
+            return registrations.filter(student_class__class_arm__classes__in=student_classes)
 
         elif hasattr(user, 'student'):
             student = user.student
-            return StudentSubjectRegistration.objects.filter(student_class__student=student)
+            return registrations.filter(student_class__student=student)
 
         return StudentSubjectRegistration.objects.none()
 
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 import os
 
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'user_registration.auth_context.AuthContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add this middleware
@@ -102,6 +104,31 @@ DATABASES = {
 }
 
 
+# Cache
+# Result payloads, grade bands, CA denominators, annual weights and token
+# versions are read on every request and invalidated through the cache, so
+# it must be shared by every worker process and cost no database queries.
+# REDIS_URL is required outside DEBUG. Without it, DEBUG runs on a
+# process-local cache: fine for runserver alone, but run_result_worker's
+# invalidations will not reach it (check result.W001 says so).
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    raise ImproperlyConfigured("Set REDIS_URL: the result and token caches must be shared by every process.")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -161,7 +188,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
     
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'user_registration.tokens.ClaimsJWTAuthentication',
             'rest_framework.authentication.SessionAuthentication',
      ],
     # 'DEFAULT_PERMISSION_CLASSES': [
@@ -175,6 +202,7 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),     # Optional: Set refresh token expiry
     'ROTATE_REFRESH_TOKENS': False,                 # Optional: Keep refresh token reuse disabled
     'BLACKLIST_AFTER_ROTATION': False,              # Optional: Do not blacklist old refresh tokens
+    'TOKEN_REFRESH_SERIALIZER': 'user_registration.tokens.ClaimsTokenRefreshSerializer',  # Re-stamps stale role claims
 }
 
 # settings.py
@@ -0,0 +1,5 @@
+"""
+Helpers shared by the test suites of every app: fixture builders and a
+seeded school (tests.fixtures), and the endpoint query budgets
+(tests.query_budget). Nothing here is imported by application code.
+"""
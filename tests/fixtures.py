@@ -0,0 +1,141 @@
+"""
+Fixture builders shared by the test suites of every app.
+
+Most result, ranking and endpoint tests need the same skeleton: a school
+year with its terms, a class year with arms, subject classes and students
+registered into them. The helpers here build it with model_bakery so a
+test only spells out the rows it is about. SeededSchool goes further and
+populates one school with a row of every kind the endpoints serve;
+tests.query_budget measures those endpoints against it.
+"""
+from datetime import date
+
+from model_bakery import baker
+
+from user_registration.models import (School, Year, Term, ClassYear, Class, Department, Subject, SubjectClass, Student,
+                                      StudentClass, StudentSubjectRegistration, AssessmentCategory, GradingSystem,
+                                      ExamScore, Result, AnnualResult, Teacher, TeacherAssignment, ClassDepartment,
+                                      ContinuousAssessment, Role, UserRole, ClassTeacher, SchoolAdmin, SuperAdmin,
+                                      Notification, Message, AttendanceSession, AttendanceRecord, Classroom,
+                                      ClassTeacherComment, StudentRegistrationPin, ComplianceVerification,
+                                      ResultConfiguration, ResultVisibilityControl, ScorePerAssessmentInstance)
+
+# Query budgets run against the configured cache. This one is for tests of
+# what happens when the cache is local to each process.
+MEMORY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_year(school, *term_names, **fields):
+    """A year of `school` with one term per name; returns (year, terms). `fields` apply to both."""
+    today = date.today()
+    year = baker.make(Year, school=school, start_date=today, end_date=today, **fields)
+    terms = [baker.make(Term, name=name, year=year, school=school, start_date=today, end_date=today, **fields)
+             for name in term_names]
+    return year, terms
+
+
+def make_class_year(school, year, arms=1, **fields):
+    """A class year of `year` with `arms` class arms; returns (class_year, arms)."""
+    class_year = baker.make(ClassYear, school=school, year=year, **fields)
+    return class_year, baker.make(Class, school=school, class_year=class_year, _quantity=arms)
+
+
+def make_subject_class(school, name=None, **fields):
+    """A subject class of a new subject, named `name` if given."""
+    subject = baker.make(Subject, school=school, **({'name': name} if name else {}))
+    return baker.make(SubjectClass, school=school, subject=subject, **fields)
+
+
+def enrol(school, class_arm=None, student=None, **fields):
+    """Place `student` (a new one of `school` when None) in `class_arm` (any arm when None)."""
+    student = student or baker.make(Student, school=school)
+    if class_arm is None:
+        return baker.make(StudentClass, student=student, **fields)
+    return baker.make(StudentClass, student=student, class_arm=class_arm, class_year_id=class_arm.class_year_id,
+                      **fields)
+
+
+def register(student_class, subject_class, term):
+    """Register a student class for a subject class in `term`."""
+    return StudentSubjectRegistration.objects.create(
+        student_class=student_class, subject_class=subject_class, term=term, school_id=term.school_id,
+    )
+
+
+class SeededSchool:
+    """
+    A school with one of each role, open term and annual results, and
+    `students` students registered for `subjects` subjects; grow() adds more.
+    """
+
+    def __init__(self, students=2, subjects=2):
+        self.roles = {name: Role.objects.get_or_create(name=name)[0]
+                      for name in ("Super Admin", "School Admin", "Teacher", "Student")}
+        school = self.school = baker.make(School)
+        self.super_admin = self.with_role(baker.make(SuperAdmin), "Super Admin")
+        self.admin = self.with_role(baker.make(SchoolAdmin, school=school), "School Admin")
+        self.teacher = self.with_role(baker.make(Teacher, school=school), "Teacher")
+        _, (self.term,) = make_year(school, "Third Term", status=True)
+        self.class_year, (self.class_arm,) = make_class_year(school, self.term.year)
+        self.department = baker.make(Department, school=school)
+        self.class_department = baker.make(ClassDepartment, school=school, classes=self.class_arm,
+                                           department=self.department)
+        self.class_teacher = baker.make(ClassTeacher, teacher=self.teacher, class_assigned=self.class_arm,
+                                        school=school)
+        self.category = baker.make(AssessmentCategory, school=school, number_of_times=2, max_score_per_one=10)
+        baker.make(GradingSystem, school=school, min_score=0, max_score=100, grade="A")
+        baker.make(ResultConfiguration, school=school)
+        baker.make(ResultVisibilityControl, school=school, term_result_open=True, annual_result_open=True)
+        self.session = baker.make(AttendanceSession, class_obj=self.class_arm, taken_by=self.teacher.user,
+                                  taken_by_role="teacher", date=self.term.start_date)
+        self.subject_classes, self.student_classes, self.students = [], [], []
+        self.grow(students, subjects)
+        self.student = self.students[0]
+
+    def with_role(self, profile, role):
+        baker.make(UserRole, user=profile.user, role=self.roles[role])
+        return profile
+
+    def register(self, student_class, subject_class):
+        registration = register(student_class, subject_class, self.term)
+        ScorePerAssessmentInstance.objects.create(registration=registration, category=self.category,
+                                                  instance_number=1, score=15)
+        baker.make(ExamScore, registration=registration, score=50)
+        ContinuousAssessment.objects.update_or_create(registration=registration, defaults={"ca_total": 15})
+        Result.objects.update_or_create(registration=registration, defaults={
+            "ca_total": 15, "exam_score": 50, "total_score": 65, "grade": "A"})
+        AnnualResult.objects.update_or_create(registration=registration, defaults={
+            "third_term_score": 65, "annual_average": 65})
+
+    def grow(self, students=0, subjects=0):
+        """More subjects (registered by every student) and students (in every subject)."""
+        school = self.school
+        for _ in range(subjects):
+            subject_class = make_subject_class(school, department=self.department)
+            baker.make(TeacherAssignment, teacher=self.teacher, subject_class=subject_class,
+                       class_department_assigned=self.class_department, school=school)
+            for student_class in self.student_classes:
+                self.register(student_class, subject_class)
+            self.subject_classes.append(subject_class)
+        for _ in range(students):
+            student = self.with_role(baker.make(Student, school=school), "Student")
+            student_class = enrol(school, self.class_arm, student, is_active=True)
+            for subject_class in self.subject_classes:
+                self.register(student_class, subject_class)
+            self.student_classes.append(student_class)
+            baker.make(AttendanceRecord, session=self.session, student=student, status="present")
+            baker.make(ClassTeacherComment, school=school, classteacher=self.class_teacher, term=self.term,
+                       student=student)
+            baker.make(Message, sender=student.user, recipient=self.admin.user)
+            baker.make(StudentRegistrationPin, school=school)
+            baker.make(Classroom, school=school)
+            self.with_role(baker.make(Teacher, school=school), "Teacher")
+            self.with_role(baker.make(SchoolAdmin, school=school), "School Admin")
+            for group in ("Teacher", "Student", "Everyone"):
+                baker.make(Notification, school=school, recipient_group=group)
+            self.students.append(student)
+
+            other = baker.make(School)
+            baker.make(ComplianceVerification, school=other)
+            self.with_role(baker.make(SuperAdmin), "Super Admin")
+
@@ -0,0 +1,78 @@
+"""
+Endpoint query budgets.
+
+EndpointQueryBudgetMixin calls each endpoint of an app against a small and
+a much larger SeededSchool, with the shared cache empty (cold) and again
+with it filled (warm). An endpoint that runs more queries for the larger
+school issues queries per row. The report is printed on every run so
+budgets can be compared across changes.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .fixtures import SeededSchool
+
+
+def _consume(response):
+    """Read a streamed response so the queries that produce it are counted."""
+    if getattr(response, 'streaming', False):
+        b''.join(response.streaming_content)
+    return response
+
+
+class EndpointQueryBudgetMixin:
+    """
+    For a TestCase listing its app's ENDPOINTS as (url name, kwargs from the
+    seeded school, user) or (url name, kwargs, user, query parameters from
+    the seeded school): each runs the same number of queries, cold and warm,
+    for a school of LARGE as for one of SMALL (students, subjects).
+    """
+
+    ENDPOINTS = []
+    SMALL = (5, 3)
+    LARGE = (30, 10)
+
+    def request(self, seeded, endpoint):
+        """(status, queries, milliseconds) of one call to an endpoint."""
+        name, kwargs, role, *query = endpoint
+        user = getattr(seeded, role).user
+        client = APIClient()
+        # A fresh instance, as each real request loads: no relations cached by earlier calls
+        client.force_authenticate(type(user).objects.get(pk=user.pk))
+        url = reverse(name, kwargs=kwargs(seeded) if kwargs else None)
+        params = query[0](seeded) if query else None
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = _consume(client.get(url, params))
+        return response.status_code, len(queries), (time.perf_counter() - started) * 1000
+
+    def measure(self, seeded):
+        """(cold call, warm call) per endpoint, the cold one made with the shared cache emptied."""
+        measured = []
+        for endpoint in self.ENDPOINTS:
+            cache.clear()
+            measured.append((self.request(seeded, endpoint), self.request(seeded, endpoint)))
+        return measured
+
+    def test_query_counts_do_not_grow_with_data(self):
+        seeded = SeededSchool(*self.SMALL)
+        small = self.measure(seeded)
+        seeded.grow(self.LARGE[0] - self.SMALL[0], self.LARGE[1] - self.SMALL[1])
+        large = self.measure(seeded)
+
+        lines = [f"{type(self).__name__}: status, queries and ms for {self.SMALL} -> {self.LARGE} (students, subjects)"]
+        failing = []
+        for (name, *_), small_calls, large_calls in zip(self.ENDPOINTS, small, large):
+            for path, small_call, large_call in zip(("cold", "warm"), small_calls, large_calls):
+                lines.append(f"  {name:40} {path} {small_call[0]:>4} {small_call[1]:>4}q {small_call[2]:7.1f}ms"
+                             f" -> {large_call[0]:>4} {large_call[1]:>4}q {large_call[2]:7.1f}ms")
+                if small_call[0] != 200 or large_call[0] != 200 or small_call[1] != large_call[1]:
+                    failing.append(f"{name} ({path})")
+        report = "\n".join(lines)
+        print(f"\n{report}")
+        self.assertEqual(failing, [], report)
@@ -10,7 +10,8 @@ from .models import (Role, UserRole, SuperAdmin, School,Subscription,
                      StudentRegistrationPin,Timetable,ClassTimetable,
                      TeacherTimetable,SubjectClass,ClassDepartment,StudentClass,
                     StudentSubjectRegistration,ResultConfiguration, AnnualResultWeightConfig,
-                    GradingSystem,Day,Period,SubjectPeriodLimit,Constraint
+                    GradingSystem,Day,Period,SubjectPeriodLimit,Constraint,
+                    DirtyResultRegistration, StudentRanking, StudentTermSummary, ResultSnapshot, ResultJob
                      )
 # (AssessmentCategory,ResultConfiguration, AnnualResultWeightConfig,
 # GradingSystem,ScorePerAssessmentInstance,ScoreObtainedPerAssessment,
@@ -78,5 +79,10 @@ admin.site.register(ClassDepartment)
 admin.site.register(ResultConfiguration)
 admin.site.register(AnnualResultWeightConfig)
 admin.site.register(GradingSystem)
+admin.site.register(DirtyResultRegistration)
+admin.site.register(StudentRanking)
+admin.site.register(StudentTermSummary)
+admin.site.register(ResultSnapshot)
+admin.site.register(ResultJob)
 
  
@@ -0,0 +1,129 @@
+"""
+Request-scoped role and school resolver.
+
+The permission classes and views used to query UserRole (and then each
+role) on every check, so composed permissions such as
+IsschoolAdmin | ISstudent | IsClassTeacher repeated the work per class.
+get_auth_context loads the user's roles, school admin / teacher / student
+profiles with their school and class-teacher status in one query and keeps
+the result on the request, so a request costs at most one auth query
+however many permissions it combines. The loaded profiles are also cached
+on request.user, so request.user.school_admin.school and friends cost
+nothing afterwards.
+
+JWT users are authenticated by DRF at view dispatch, after the Django
+middleware chain, so AuthContextMiddleware only attaches a lazy
+request.auth_context; it is resolved on first use against the user DRF
+set on the request.
+"""
+from django.db.models import Exists, OuterRef
+from django.utils.functional import SimpleLazyObject
+
+from .models import ClassTeacher, UserRole
+
+PROFILE_RELATIONS = ('school_admin', 'teacher', 'student')
+
+
+class AuthContext:
+    """The roles, profiles and school of one user."""
+
+    def __init__(self, user_id=None, roles=(), school_admin=None, teacher=None, student=None,
+                 is_class_teacher=False):
+        self.user_id = user_id
+        self.roles = frozenset(roles)
+        self.school_admin = school_admin
+        self.teacher = teacher
+        self.student = student
+        self.is_class_teacher = is_class_teacher
+
+    def has_role(self, *names):
+        return not self.roles.isdisjoint(names)
+
+    # Profile checks, independent of roles: the read-only permissions have
+    # always granted access on the profile alone (hasattr(user, 'student')).
+    @property
+    def has_school_admin_profile(self):
+        return self.school_admin is not None
+
+    @property
+    def has_teacher_profile(self):
+        return self.teacher is not None
+
+    @property
+    def has_student_profile(self):
+        return self.student is not None
+
+    @property
+    def school(self):
+        """The school of the first profile the user has (school admin, teacher, then student)."""
+        for profile in (self.school_admin, self.teacher, self.student):
+            if profile is not None:
+                return profile.school
+        return None
+
+
+def load_auth_context(user):
+    """Build the AuthContext of any user with one query (none for anonymous users)."""
+    if user is None or not user.is_authenticated:
+        return AuthContext()
+
+    user_roles = list(
+        UserRole.objects.filter(user_id=user.pk).select_related(
+            'role', 'user__school_admin__school', 'user__teacher__school', 'user__student__school',
+        ).annotate(
+            is_class_teacher=Exists(ClassTeacher.objects.filter(teacher__user_id=OuterRef('user_id')))
+        )
+    )
+    if user_roles:
+        loaded, is_class_teacher = user_roles[0].user, user_roles[0].is_class_teacher
+    else:
+        # No roles, but a profile alone still counts for the read-only permissions.
+        loaded = type(user).objects.select_related(
+            'school_admin__school', 'teacher__school', 'student__school',
+        ).annotate(
+            is_class_teacher=Exists(ClassTeacher.objects.filter(teacher__user_id=OuterRef('pk')))
+        ).filter(pk=user.pk).first()
+        if loaded is None:
+            return AuthContext(user_id=user.pk)
+        is_class_teacher = loaded.is_class_teacher
+
+    profiles = {}
+    for relation in PROFILE_RELATIONS:
+        descriptor = getattr(type(user), relation)
+        profiles[relation] = descriptor.related.get_cached_value(loaded, None)
+        if user is not loaded:
+            descriptor.related.set_cached_value(user, profiles[relation])
+    return AuthContext(
+        user_id=user.pk,
+        roles=[user_role.role.name for user_role in user_roles],
+        is_class_teacher=is_class_teacher,
+        **profiles,
+    )
+
+
+def get_auth_context(request):
+    """
+    The AuthContext of request.user, loaded once per request. Works with DRF
+    and plain Django requests; a change of request.user (DRF authentication,
+    force_authenticate) loads the new user's context.
+    """
+    http_request = getattr(request, '_request', request)
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    context = getattr(http_request, '_auth_context', None)
+    if context is None or context.user_id != user_id:
+        context = load_auth_context(user)
+        http_request._auth_context = context
+    return context
+
+
+class AuthContextMiddleware:
+    """Attach a lazy request.auth_context, resolved on first use."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._auth_context = None
+        request.auth_context = SimpleLazyObject(lambda: get_auth_context(request))
+        return self.get_response(request)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user_registration.revocation import PRUNE_BATCH_SIZE, prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWT rows in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE,
+                            help="Outstanding tokens deleted per transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        def progress(counts):
+            self.stdout.write(f"  {counts['outstanding']} outstanding, {counts['blacklisted']} blacklisted")
+
+        totals = prune_expired_tokens(options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {totals['outstanding']} expired outstanding tokens "
+            f"and {totals['blacklisted']} blacklisted tokens."
+        ))
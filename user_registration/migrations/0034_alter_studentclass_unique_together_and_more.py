@@ -13,7 +13,7 @@ class Migration(migrations.Migration):
     operations = [
         migrations.AlterUniqueTogether(
             name="studentclass",
-            unique_together={("student", "klass")},
+            unique_together=set(),
         ),
         migrations.AddField(
             model_name="studentclass",
@@ -42,4 +42,8 @@ class Migration(migrations.Migration):
             model_name="studentclass",
             name="class_year",
         ),
+        migrations.AlterUniqueTogether(
+            name="studentclass",
+            unique_together={("student", "klass")},
+        ),
     ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+def drop_duplicate_results(apps, schema_editor):
+    """Keep only the most recently updated Result per registration."""
+    Result = apps.get_model('user_registration', 'Result')
+    seen = set()
+    duplicates = []
+    for result_id, registration_id in (
+        Result.objects.exclude(registration__isnull=True)
+        .order_by('registration_id', '-updated_at')
+        .values_list('result_id', 'registration_id')
+    ):
+        if registration_id in seen:
+            duplicates.append(result_id)
+        else:
+            seen.add(registration_id)
+    Result.objects.filter(result_id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0035_alter_studentclass_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='result',
+            constraint=models.UniqueConstraint(fields=('registration',), name='uniq_result_registration'),
+        ),
+    ]
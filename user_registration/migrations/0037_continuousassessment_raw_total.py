@@ -0,0 +1,90 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:46
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def _drop_duplicates(model, pk_name, key_fields):
+    seen = set()
+    duplicates = []
+    for row in model.objects.order_by(*key_fields, '-updated_at').values_list(pk_name, *key_fields):
+        if row[1:] in seen:
+            duplicates.append(row[0])
+        else:
+            seen.add(row[1:])
+    model.objects.filter(pk__in=duplicates).delete()
+
+
+def backfill_ca_totals(apps, schema_editor):
+    """
+    Rebuild category totals from instance scores and store the raw CA sum on
+    every registration so later score writes only have to apply deltas.
+    """
+    ScorePerAssessmentInstance = apps.get_model('user_registration', 'ScorePerAssessmentInstance')
+    ScoreObtainedPerAssessment = apps.get_model('user_registration', 'ScoreObtainedPerAssessment')
+    ContinuousAssessment = apps.get_model('user_registration', 'ContinuousAssessment')
+    StudentSubjectRegistration = apps.get_model('user_registration', 'StudentSubjectRegistration')
+    AssessmentCategory = apps.get_model('user_registration', 'AssessmentCategory')
+    ResultConfiguration = apps.get_model('user_registration', 'ResultConfiguration')
+
+    _drop_duplicates(ScoreObtainedPerAssessment, 'scoreperassessment_id', ['registration_id', 'category_id'])
+    _drop_duplicates(ContinuousAssessment, 'continuous_assessment_id', ['registration_id'])
+
+    for row in (
+        ScorePerAssessmentInstance.objects.exclude(registration__isnull=True)
+        .values('registration_id', 'category_id').annotate(total=Sum('score'))
+    ):
+        ScoreObtainedPerAssessment.objects.update_or_create(
+            registration_id=row['registration_id'], category_id=row['category_id'],
+            defaults={'total_score': row['total']},
+        )
+
+    max_possible = {}
+    for school_id, times, per_one in AssessmentCategory.objects.values_list(
+        'school_id', 'number_of_times', 'max_score_per_one'
+    ):
+        max_possible[school_id] = max_possible.get(school_id, 0) + times * per_one
+    ca_max = dict(ResultConfiguration.objects.values_list('school_id', 'total_ca_score'))
+
+    raw_totals = dict(
+        ScoreObtainedPerAssessment.objects.exclude(registration__isnull=True)
+        .values('registration_id').annotate(total=Sum('total_score')).values_list('registration_id', 'total')
+    )
+    existing = set(ContinuousAssessment.objects.values_list('registration_id', flat=True))
+    for registration_id, school_id in StudentSubjectRegistration.objects.values_list('registration_id', 'school_id'):
+        raw = raw_totals.get(registration_id, 0.0)
+        denominator = max_possible.get(school_id, 0)
+        ca_total = round((raw / denominator) * ca_max[school_id], 2) if denominator and school_id in ca_max else 0.0
+        if registration_id in existing:
+            ContinuousAssessment.objects.filter(registration_id=registration_id).update(raw_total=raw, ca_total=ca_total)
+        else:
+            ContinuousAssessment.objects.create(registration_id=registration_id, raw_total=raw, ca_total=ca_total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0036_result_unique_registration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='continuousassessment',
+            name='raw_total',
+            field=models.FloatField(default=0, help_text='Unscaled sum of all assessment category totals.'),
+        ),
+        migrations.AlterField(
+            model_name='continuousassessment',
+            name='ca_total',
+            field=models.FloatField(default=0, help_text='Total score from all continuous assessments.'),
+        ),
+        migrations.RunPython(backfill_ca_totals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='continuousassessment',
+            constraint=models.UniqueConstraint(fields=('registration',), name='uniq_ca_registration'),
+        ),
+        migrations.AddConstraint(
+            model_name='scoreobtainedperassessment',
+            constraint=models.UniqueConstraint(fields=('registration', 'category'), name='uniq_score_obtained_registration_category'),
+        ),
+    ]
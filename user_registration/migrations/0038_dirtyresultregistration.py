@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_registrations_dirty(apps, schema_editor):
+    """
+    Result lists no longer compute on read, so queue every scored registration
+    for the first flush.
+    """
+    StudentSubjectRegistration = apps.get_model('user_registration', 'StudentSubjectRegistration')
+    DirtyResultRegistration = apps.get_model('user_registration', 'DirtyResultRegistration')
+    DirtyResultRegistration.objects.bulk_create(
+        [
+            DirtyResultRegistration(registration_id=registration_id, school_id=school_id, term_dirty=True)
+            for registration_id, school_id in StudentSubjectRegistration.objects.filter(
+                exam_scores__isnull=False, school__isnull=False
+            ).values_list('registration_id', 'school_id').distinct()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0037_continuousassessment_raw_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyResultRegistration',
+            fields=[
+                ('registration', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dirty_result', serialize=False, to='user_registration.studentsubjectregistration')),
+                ('term_dirty', models.BooleanField(default=True)),
+                ('marked_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dirty_results', to='user_registration.school')),
+            ],
+        ),
+        migrations.RunPython(mark_existing_registrations_dirty, migrations.RunPython.noop),
+    ]
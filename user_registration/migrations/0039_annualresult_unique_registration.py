@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+def drop_duplicate_annual_results(apps, schema_editor):
+    """Keep only the most recently updated AnnualResult per registration."""
+    AnnualResult = apps.get_model('user_registration', 'AnnualResult')
+    seen = set()
+    duplicates = []
+    for annual_result_id, registration_id in (
+        AnnualResult.objects.exclude(registration__isnull=True)
+        .order_by('registration_id', '-updated_at')
+        .values_list('annual_result_id', 'registration_id')
+    ):
+        if registration_id in seen:
+            duplicates.append(annual_result_id)
+        else:
+            seen.add(registration_id)
+    AnnualResult.objects.filter(annual_result_id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0038_dirtyresultregistration'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_annual_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='annualresult',
+            constraint=models.UniqueConstraint(fields=('registration',), name='uniq_annual_result_registration'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:19
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def queue_registrations_for_ranking(apps, schema_editor):
+    """Positions are written by the dirty-result flush, so queue every scored registration once."""
+    StudentSubjectRegistration = apps.get_model('user_registration', 'StudentSubjectRegistration')
+    DirtyResultRegistration = apps.get_model('user_registration', 'DirtyResultRegistration')
+    DirtyResultRegistration.objects.bulk_create(
+        [
+            DirtyResultRegistration(registration_id=registration_id, school_id=school_id, term_dirty=True)
+            for registration_id, school_id in StudentSubjectRegistration.objects.filter(
+                results__isnull=False, school__isnull=False
+            ).values_list('registration_id', 'school_id').distinct()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0039_annualresult_unique_registration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annualresult',
+            name='subject_position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='subject_position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StudentRanking',
+            fields=[
+                ('ranking_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subjects_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('average_score', models.FloatField(default=0)),
+                ('position_in_class_arm', models.PositiveIntegerField(blank=True, null=True)),
+                ('position_in_class_year', models.PositiveIntegerField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('class_arm', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_rankings', to='user_registration.class')),
+                ('class_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_rankings', to='user_registration.classyear')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_rankings', to='user_registration.school')),
+                ('student_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='user_registration.studentclass')),
+                ('term', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_rankings', to='user_registration.term')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['class_year', 'term'], name='student_ranking_scope_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student_class', 'term'), name='uniq_student_ranking_term'), models.UniqueConstraint(condition=models.Q(('term__isnull', True)), fields=('student_class',), name='uniq_student_ranking_annual')],
+            },
+        ),
+        migrations.RunPython(queue_registrations_for_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:23
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0040_student_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentTermSummary',
+            fields=[
+                ('summary_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subjects_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('average_score', models.FloatField(default=0)),
+                ('subjects_passed', models.PositiveIntegerField(default=0)),
+                ('subjects_failed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_term_summaries', to='user_registration.school')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_summaries', to='user_registration.student')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_summaries', to='user_registration.term')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'term'], name='student_summary_term_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'term'), name='uniq_student_term_summary')],
+            },
+        ),
+    ]
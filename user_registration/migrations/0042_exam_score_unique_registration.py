@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+def drop_duplicate_exam_scores(apps, schema_editor):
+    """Keep only the most recently updated ExamScore per registration."""
+    ExamScore = apps.get_model('user_registration', 'ExamScore')
+    seen = set()
+    duplicates = []
+    for examscore_id, registration_id in (
+        ExamScore.objects.exclude(registration__isnull=True)
+        .order_by('registration_id', '-updated_at')
+        .values_list('examscore_id', 'registration_id')
+    ):
+        if registration_id in seen:
+            duplicates.append(examscore_id)
+        else:
+            seen.add(registration_id)
+    ExamScore.objects.filter(examscore_id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0041_student_term_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_exam_scores, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='examscore',
+            constraint=models.UniqueConstraint(fields=('registration',), name='uniq_exam_score_registration'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:35
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0042_exam_score_unique_registration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSnapshot',
+            fields=[
+                ('snapshot_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('term_report', 'Term report'), ('annual_report', 'Annual report'), ('broadsheet', 'Broadsheet')], max_length=20)),
+                ('payload', models.BinaryField()),
+                ('checksum', models.CharField(max_length=40)),
+                ('source_version', models.CharField(blank=True, help_text="Change marker of the class year's results when published.", max_length=100)),
+                ('published_at', models.DateTimeField(auto_now=True)),
+                ('class_arm', models.ForeignKey(blank=True, help_text='Set on class arm broadsheets.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.classdepartment')),
+                ('class_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.classyear')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.school')),
+                ('student', models.ForeignKey(blank=True, help_text='Set on report snapshots.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.student')),
+                ('term', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.term')),
+                ('year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_snapshots', to='user_registration.year')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'year', 'term', 'student'], name='result_snapshot_student_idx'), models.Index(fields=['kind', 'year', 'term', 'class_year'], name='result_snapshot_class_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:55
+
+import re
+
+from django.db import migrations, models
+
+TERM_ORDINAL_WORDS = {
+    'first': 1, '1st': 1, 'one': 1, '1': 1,
+    'second': 2, '2nd': 2, 'two': 2, '2': 2,
+    'third': 3, '3rd': 3, 'three': 3, '3': 3,
+}
+
+
+def backfill_term_ordinals(apps, schema_editor):
+    """Derive every term's ordinal from its name ('First Term', '2nd term', 'Term 3', ...)."""
+    Term = apps.get_model('user_registration', 'Term')
+    terms = []
+    for term in Term.objects.filter(ordinal__isnull=True).only('term_id', 'name'):
+        for word in re.findall(r'[a-z0-9]+', (term.name or '').lower()):
+            if word in TERM_ORDINAL_WORDS:
+                term.ordinal = TERM_ORDINAL_WORDS[word]
+                terms.append(term)
+                break
+    Term.objects.bulk_update(terms, ['ordinal'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0044_result_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='term',
+            name='ordinal',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(1, 'First Term'), (2, 'Second Term'), (3, 'Third Term')], null=True),
+        ),
+        migrations.RunPython(backfill_term_ordinals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['year', 'ordinal'], name='term_year_ordinal_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0046_user_token_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['session', 'student_name', 'id'], name='attendance_record_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', '-sent_at', 'message_id'], name='message_recipient_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['school', '-created_at', 'notification_id'], name='notification_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'last_name', 'student_id'], name='student_school_keyset_idx'),
+        ),
+    ]
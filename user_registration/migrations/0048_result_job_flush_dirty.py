@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0047_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultjob',
+            name='class_year',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='result_jobs', to='user_registration.classyear'),
+        ),
+        migrations.AlterField(
+            model_name='resultjob',
+            name='kind',
+            field=models.CharField(choices=[('recompute_term', 'Recompute term results'), ('recompute_annual', 'Recompute annual results'), ('rebuild_rankings', 'Rebuild rankings'), ('flush_dirty', 'Flush dirty results')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:42
+
+from django.db import migrations, models
+
+
+def fill_snapshot_keys(apps, schema_editor):
+    """Key existing snapshots as result.snapshots.snapshot_key does, keeping the latest of any duplicates."""
+    ResultSnapshot = apps.get_model('user_registration', 'ResultSnapshot')
+    seen = set()
+    for snapshot in ResultSnapshot.objects.defer('payload').order_by('-published_at').iterator():
+        key = ':'.join('-' if part is None else str(part) for part in (
+            snapshot.kind, snapshot.year_id, snapshot.term_id, snapshot.class_year_id,
+            snapshot.class_arm_id, snapshot.student_id,
+        ))
+        if key in seen:
+            snapshot.delete()
+            continue
+        seen.add(key)
+        ResultSnapshot.objects.filter(pk=snapshot.pk).update(snapshot_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_registration', '0048_result_job_flush_dirty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultjob',
+            name='options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='resultsnapshot',
+            name='snapshot_key',
+            field=models.CharField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_snapshot_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='resultjob',
+            name='kind',
+            field=models.CharField(choices=[('recompute_term', 'Recompute term results'), ('recompute_annual', 'Recompute annual results'), ('rebuild_rankings', 'Rebuild rankings'), ('flush_dirty', 'Flush dirty results'), ('publish', 'Publish results')], max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='resultsnapshot',
+            constraint=models.UniqueConstraint(fields=('snapshot_key',), name='uniq_result_snapshot_key'),
+        ),
+    ]
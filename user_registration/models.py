@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
+import re
 import uuid
 # from django.db.models.signals import post_save
 # from django.dispatch import receiver
@@ -34,6 +35,21 @@ class UserRole(models.Model):
         return f"{self.user.username} - {self.role.name}"
 
 
+class UserTokenVersion(models.Model):
+    """
+    Version of the role and school claims in a user's JWTs. Bumped whenever
+    the user's roles or profiles change; tokens stamped with an older
+    version are authenticated against the database instead of their claims.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="token_version")
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - v{self.version}"
+
+
 class SuperAdmin(models.Model):
     """
     Represents super admins.
@@ -114,7 +130,11 @@ class Subscription(models.Model):
 
     @property
     def live_number_students(self):
-        return self.school.school_students.count() if self.school else 0
+        if not self.school:
+            return 0
+        # List views annotate the school with its count.
+        count = getattr(self.school, 'student_count', None)
+        return count if count is not None else self.school.school_students.count()
 
     @property
     def live_expected_fee(self):
@@ -159,6 +179,12 @@ class Message(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of MessageListView (user_registration.pagination).
+            models.Index(fields=['recipient', '-sent_at', 'message_id'], name='message_recipient_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username}"
 
@@ -214,12 +240,38 @@ class Year(models.Model):
 
     
 
+TERM_ORDINAL_WORDS = {
+    'first': 1, '1st': 1, 'one': 1, '1': 1,
+    'second': 2, '2nd': 2, 'two': 2, '2': 2,
+    'third': 3, '3rd': 3, 'three': 3, '3': 3,
+}
+
+
+def term_ordinal_from_name(name):
+    """1, 2 or 3 for names like 'First Term', '2nd term' or 'Term 3'; None otherwise."""
+    for word in re.findall(r'[a-z0-9]+', (name or '').lower()):
+        if word in TERM_ORDINAL_WORDS:
+            return TERM_ORDINAL_WORDS[word]
+    return None
+
+
 class Term(models.Model):
     """
     Represents terms within an academic year.
-    """
+    ordinal (1-3) is the term's position in the year; result code matches
+    terms on (year, ordinal) instead of their names. It is derived from the
+    name when not given, and re-derived when the term is renamed unless it
+    was set explicitly. A term without one is left out of annual results.
+    """
+    ORDINAL_CHOICES = [
+        (1, 'First Term'),
+        (2, 'Second Term'),
+        (3, 'Third Term'),
+    ]
+
     term_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
+    ordinal = models.PositiveSmallIntegerField(choices=ORDINAL_CHOICES, null=True, blank=True)
     start_date = models.DateField()
     end_date = models.DateField()
     year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name="terms")
@@ -227,12 +279,39 @@ class Term(models.Model):
     status = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['year', 'ordinal'], name='term_year_ordinal_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        term = super().from_db(db, field_names, values)
+        term._saved_name_ordinal = (term.__dict__.get('name'), term.__dict__.get('ordinal'))
+        return term
+
+    def ordinal_for(self, name, ordinal):
+        """
+        The ordinal saving this term as `name` with `ordinal` stores: `ordinal`,
+        else the one `name` gives. An ordinal derived from the saved name
+        follows a rename; one set explicitly is kept.
+        """
+        if ordinal is None:
+            return term_ordinal_from_name(name)
+        saved_name, saved_ordinal = getattr(self, '_saved_name_ordinal', (None, None))
+        derived = saved_ordinal is not None and saved_ordinal == term_ordinal_from_name(saved_name)
+        if derived and ordinal == saved_ordinal and name != saved_name:
+            return term_ordinal_from_name(name)
+        return ordinal
+
     def save(self, *args, **kwargs):
+        self.ordinal = self.ordinal_for(self.name, self.ordinal)
         # If this year is being set to active
         if self.status:
             # Deactivate other years for the same school
             Term.objects.filter(school=self.school, status=True).exclude(pk=self.pk).update(status=False)
         super().save(*args, **kwargs)
+        self._saved_name_ordinal = (self.name, self.ordinal)
 
     def __str__(self):
         return f"{self.name} - {self.year.name} ({self.school.school_name})"
@@ -310,6 +389,12 @@ class Student(models.Model):
     parent_emergency_contact = models.CharField(max_length=100, default='Unknown')
     parent_relationship = models.CharField(max_length=50, default='Unknown')
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of StudentListView (user_registration.pagination).
+            models.Index(fields=['school', 'last_name', 'student_id'], name='student_school_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.school.school_name})"
 
@@ -687,6 +772,11 @@ class ScoreObtainedPerAssessment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['registration', 'category'], name='uniq_score_obtained_registration_category'),
+        ]
+
     def __str__(self):
         return f"{self.registration.student_class.student.last_name} - {self.category.assessment_name}"
 
@@ -698,6 +788,11 @@ class ExamScore(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['registration'], name='uniq_exam_score_registration'),
+        ]
+
     def __str__(self):
         return f"{self.registration.student_class.student.last_name} ({self.registration.subject_class.subject.name}) - {self.score}"
 
@@ -705,10 +800,16 @@ class ExamScore(models.Model):
 class ContinuousAssessment(models.Model):
     continuous_assessment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     registration = models.ForeignKey('StudentSubjectRegistration', on_delete=models.CASCADE, related_name="continuous_assessments",null=True)
-    ca_total = models.FloatField(help_text="Total score from all continuous assessments.")
+    ca_total = models.FloatField(default=0, help_text="Total score from all continuous assessments.")
+    raw_total = models.FloatField(default=0, help_text="Unscaled sum of all assessment category totals.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['registration'], name='uniq_ca_registration'),
+        ]
+
     def __str__(self):
         return f"{self.registration.student_class.student.last_name} ({self.registration.subject_class.subject.name}) - {self.ca_total}"
 
@@ -722,9 +823,16 @@ class Result(models.Model):
     total_score = models.FloatField()
     grade = models.CharField(max_length=5)
     remarks = models.TextField(null=True, blank=True)
+    subject_position = models.PositiveIntegerField(null=True, blank=True)  # within the class arm, set by result.rankings
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One term result per registration (lets the result engine bulk upsert)
+            models.UniqueConstraint(fields=['registration'], name='uniq_result_registration'),
+        ]
+
     def __str__(self):
         return f"{self.registration.student_class.student.last_name} - {self.total_score} ({self.registration.subject_class.subject.name})"
 
@@ -738,9 +846,15 @@ class AnnualResult(models.Model):
     annual_average = models.FloatField(null=True, blank=True)
     grade = models.CharField(max_length=10, null=True, blank=True)
     remarks = models.TextField(null=True, blank=True)
+    subject_position = models.PositiveIntegerField(null=True, blank=True)  # within the class arm, set by result.rankings
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['registration'], name='uniq_annual_result_registration'),
+        ]
+
     def calculate_annual_average(self):
         config = AnnualResultWeightConfig.objects.filter(
             school=self.registration.school,
@@ -766,6 +880,184 @@ class AnnualResult(models.Model):
         return f"{self.registration.student_class.student.last_name} ({self.registration.subject_class.subject.name}) - {self.annual_average}"
 
 
+class DirtyResultRegistration(models.Model):
+    """
+    Registrations whose stored Result/AnnualResult rows are out of date.
+    A row always means the annual result needs recomputing; term_dirty adds
+    the term Result. Rows are cleared by result.materialize.flush_dirty_results.
+    """
+    registration = models.OneToOneField('StudentSubjectRegistration', on_delete=models.CASCADE, primary_key=True, related_name="dirty_result")
+    school = models.ForeignKey('School', on_delete=models.CASCADE, related_name="dirty_results")
+    term_dirty = models.BooleanField(default=True)
+    marked_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dirty result {self.registration_id} (term: {self.term_dirty})"
+
+
+class StudentTermSummary(models.Model):
+    """
+    A student's aggregate over their term Results: total, average and how
+    many subjects they passed or failed against the school's pass mark.
+    Refreshed by result.summaries whenever the student's Results change.
+    """
+    summary_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey('School', on_delete=models.CASCADE, related_name="student_term_summaries")
+    student = models.ForeignKey('Student', on_delete=models.CASCADE, related_name="term_summaries")
+    term = models.ForeignKey('Term', on_delete=models.CASCADE, related_name="student_summaries")
+    subjects_count = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    average_score = models.FloatField(default=0)
+    subjects_passed = models.PositiveIntegerField(default=0)
+    subjects_failed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'term'], name='uniq_student_term_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['school', 'term'], name='student_summary_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.term.name}: {self.average_score}"
+
+
+class StudentRanking(models.Model):
+    """
+    A student's overall average and class positions for a term, or for the
+    whole year when term is null. Maintained by result.rankings.
+    """
+    ranking_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey('School', on_delete=models.CASCADE, related_name="student_rankings")
+    student_class = models.ForeignKey('StudentClass', on_delete=models.CASCADE, related_name="rankings")
+    class_year = models.ForeignKey('ClassYear', on_delete=models.CASCADE, related_name="student_rankings")
+    class_arm = models.ForeignKey('Class', on_delete=models.CASCADE, related_name="student_rankings", null=True)
+    term = models.ForeignKey('Term', on_delete=models.CASCADE, related_name="student_rankings", null=True, blank=True)
+    subjects_count = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    average_score = models.FloatField(default=0)
+    position_in_class_arm = models.PositiveIntegerField(null=True, blank=True)
+    position_in_class_year = models.PositiveIntegerField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student_class', 'term'], name='uniq_student_ranking_term'),
+            models.UniqueConstraint(
+                fields=['student_class'],
+                condition=Q(term__isnull=True),
+                name='uniq_student_ranking_annual',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['class_year', 'term'], name='student_ranking_scope_idx'),
+        ]
+
+    def __str__(self):
+        period = self.term.name if self.term_id else "Annual"
+        return f"{self.student_class} - {period}: {self.position_in_class_arm}"
+
+
+class ResultSnapshot(models.Model):
+    """
+    A published report card or broadsheet payload, frozen as zlib-compressed
+    compact JSON. Term snapshots have a term; annual ones do not. Written by
+    result.snapshots.publish_results and served while it exists.
+    snapshot_key joins kind, year, term, class year, class arm and student
+    (blank parts included), so each snapshot exists once and publishing
+    upserts on it.
+    """
+    KIND_CHOICES = [
+        ('term_report', 'Term report'),
+        ('annual_report', 'Annual report'),
+        ('broadsheet', 'Broadsheet'),
+    ]
+
+    snapshot_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey('School', on_delete=models.CASCADE, related_name="result_snapshots")
+    year = models.ForeignKey('Year', on_delete=models.CASCADE, related_name="result_snapshots")
+    term = models.ForeignKey('Term', on_delete=models.CASCADE, related_name="result_snapshots", null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    class_year = models.ForeignKey('ClassYear', on_delete=models.CASCADE, related_name="result_snapshots")
+    class_arm = models.ForeignKey('ClassDepartment', on_delete=models.CASCADE, related_name="result_snapshots",
+                                  null=True, blank=True, help_text="Set on class arm broadsheets.")
+    student = models.ForeignKey('Student', on_delete=models.CASCADE, related_name="result_snapshots",
+                                null=True, blank=True, help_text="Set on report snapshots.")
+    snapshot_key = models.CharField(max_length=255)
+    payload = models.BinaryField()
+    checksum = models.CharField(max_length=40)
+    source_version = models.CharField(max_length=100, blank=True,
+                                      help_text="Change marker of the class year's results when published.")
+    published_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot_key'], name='uniq_result_snapshot_key'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'year', 'term', 'student'], name='result_snapshot_student_idx'),
+            models.Index(fields=['kind', 'year', 'term', 'class_year'], name='result_snapshot_class_idx'),
+        ]
+
+    def __str__(self):
+        period = self.term.name if self.term_id else "Annual"
+        return f"{self.get_kind_display()} - {self.year.name} {period}"
+
+
+class ResultJob(models.Model):
+    """
+    A queued heavy result operation (recompute, re-rank) for a school, run by
+    the run_result_worker command (see result.jobs) instead of a request.
+    class_year narrows a ranking rebuild to one class year; options holds
+    kind-specific flags such as a full publish.
+    """
+    KIND_CHOICES = [
+        ('recompute_term', 'Recompute term results'),
+        ('recompute_annual', 'Recompute annual results'),
+        ('rebuild_rankings', 'Rebuild rankings'),
+        ('flush_dirty', 'Flush dirty results'),
+        ('publish', 'Publish results'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey('School', on_delete=models.CASCADE, related_name="result_jobs")
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    year = models.ForeignKey('Year', on_delete=models.CASCADE, related_name="result_jobs", null=True, blank=True)
+    term = models.ForeignKey('Term', on_delete=models.CASCADE, related_name="result_jobs", null=True, blank=True)
+    class_year = models.ForeignKey('ClassYear', on_delete=models.CASCADE, related_name="result_jobs",
+                                   null=True, blank=True)
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="result_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='result_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.status}) - {self.school.school_name}"
+
+
 # models.py
 
 class ClassTeacherComment(models.Model):
@@ -854,6 +1146,12 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of NotificationListCreateView (user_registration.pagination).
+            models.Index(fields=['school', '-created_at', 'notification_id'], name='notification_keyset_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -980,6 +1278,10 @@ class AttendanceRecord(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["session", "student"], name="uniq_attendance_session_student")
         ]
+        indexes = [
+            # Keyset pagination of AttendanceRecordViewSet, which is scoped to one session.
+            models.Index(fields=["session", "student_name", "id"], name="attendance_record_keyset_idx"),
+        ]
         ordering = ["student_name"]
 
     def __str__(self):
@@ -0,0 +1,165 @@
+"""
+Keyset (cursor) pagination for large list endpoints.
+
+Page-number pagination runs a COUNT(*) and an OFFSET scan on every page,
+so deep pages of a big school cost more than the first. In keyset mode
+the page is the next page_size rows after the last row seen, found with a
+range filter on the view's keyset_ordering, a composite key ending in the
+primary key such as ('last_name', 'student_id') or ('-created_at',
+'notification_id'). With an index on the same columns every page costs
+the same and no count is run.
+
+KeysetPaginationMixin adds the mode to a pagination class; it is chosen
+with ?pagination=cursor (or by passing a cursor) and otherwise the class
+paginates as before. KeysetPagination is the mixin for views that were
+not paginated: without the query parameter they still return a plain
+list. Keyset responses have the shape of DRF's CursorPagination:
+{"next": url, "previous": url, "results": [...]}.
+"""
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+PAGINATION_MODE_PARAM = 'pagination'
+CURSOR_MODE = 'cursor'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeping microseconds, which keys must not lose."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _key_fields(ordering):
+    """[(field name, descending)] of an ordering such as ('-created_at', 'notification_id')."""
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def keyset_filter(ordering, position):
+    """Q for the rows after `position` (the key values of a row) in `ordering`."""
+    condition = Q()
+    equal = Q()
+    for (field, descending), value in zip(_key_fields(ordering), position):
+        lookup = 'lt' if descending else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class KeysetPaginationMixin:
+    """Adds a keyset mode, selected per request, to a pagination class."""
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def cursor_requested(self, request):
+        return (request.query_params.get(PAGINATION_MODE_PARAM) == CURSOR_MODE
+                or self.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        self.keyset = bool(ordering) and self.cursor_requested(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = tuple(ordering)
+        limit = self.get_keyset_page_size(request)
+        position, backwards = self.decode_cursor(request)
+
+        ordering = reverse_ordering(self.ordering) if backwards else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position))
+        try:
+            rows = list(queryset[:limit + 1])
+        except (DjangoValidationError, ValueError):  # key values that do not fit the fields
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        # Going forwards there is a previous page unless this is the first;
+        # going backwards there is a next page (the one the cursor came from).
+        has_next = has_more if not backwards else position is not None
+        has_previous = has_more if backwards else position is not None
+        self.next_position = self.row_position(rows[-1]) if rows and has_next else None
+        self.previous_position = self.row_position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.encode_cursor(self.next_position, backwards=False)),
+            ('previous', self.encode_cursor(self.previous_position, backwards=True)),
+            ('results', data),
+        ]))
+
+    def get_keyset_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        max_page_size = getattr(self, 'max_page_size', None)
+        return min(page_size, max_page_size) if max_page_size else page_size
+
+    def row_position(self, row):
+        return [getattr(row, field) for field, _ in _key_fields(self.ordering)]
+
+    def decode_cursor(self, request):
+        """(position, backwards) of the request's cursor; (None, False) for the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, backwards = cursor['p'], bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, backwards
+
+    def encode_cursor(self, position, backwards):
+        if position is None:
+            return None
+        cursor = {'p': position, 'r': 1} if backwards else {'p': position}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, cls=CursorEncoder).encode()).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, getattr(self, 'page_query_param', 'page'))
+        url = replace_query_param(url, PAGINATION_MODE_PARAM, CURSOR_MODE)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+
+class KeysetPagination(KeysetPaginationMixin, BasePagination):
+    """Keyset pages on request (?pagination=cursor); a plain, unpaginated list otherwise."""
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not (getattr(view, 'keyset_ordering', None) and self.cursor_requested(request)):
+            self.keyset = False
+            return None
+        return super().paginate_queryset(queryset, request, view)
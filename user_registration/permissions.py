@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission,SAFE_METHODS
-from .models import UserRole,StudentRegistrationPin,ClassTeacher
+from .models import StudentRegistrationPin
+from .auth_context import get_auth_context
 
 
 class IsStudentReadOnly(BasePermission):
@@ -11,7 +12,7 @@ class IsStudentReadOnly(BasePermission):
     def has_permission(self, request, view):
         # Allow GET requests for authenticated students only
         if request.method in SAFE_METHODS:
-            return request.user.is_authenticated and hasattr(request.user, 'student')
+            return request.user.is_authenticated and get_auth_context(request).has_student_profile
 
         # Restrict all other methods (POST, PUT, DELETE) for students
         return False
@@ -25,7 +26,7 @@ class IsTeacherReadOnly(BasePermission):
     def has_permission(self, request, view):
         # Allow GET requests for authenticated students only
         if request.method in SAFE_METHODS:
-            return request.user.is_authenticated and hasattr(request.user, 'teacher')
+            return request.user.is_authenticated and get_auth_context(request).has_teacher_profile
 
         # Restrict all other methods (POST, PUT, DELETE) for students
         return False
@@ -40,7 +41,7 @@ class IsSchoolAdminReadOnly(BasePermission):
     def has_permission(self, request, view):
         # Allow GET requests for authenticated School Admins only
         if request.method in SAFE_METHODS:
-            return request.user.is_authenticated and hasattr(request.user, 'school_admin')
+            return request.user.is_authenticated and get_auth_context(request).has_school_admin_profile
 
         # Restrict all other methods (POST, PUT, DELETE) for School Admins
         return False
@@ -56,12 +57,7 @@ class IsSuperAdmin(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        # Check if the user has the SuperAdmin role
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            return any(role.role.name == 'Super Admin' for role in user_roles)
-        except UserRole.DoesNotExist:
-            return False
+        return get_auth_context(request).has_role('Super Admin')
 
 class IsschoolAdmin(BasePermission):
     """
@@ -73,12 +69,7 @@ class IsschoolAdmin(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        # Check if the user has the SuperAdmin role
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            return any(role.role.name == 'School Admin' for role in user_roles)
-        except UserRole.DoesNotExist:
-            return False
+        return get_auth_context(request).has_role('School Admin')
 
 class ISteacher(BasePermission):
     """
@@ -90,12 +81,7 @@ class ISteacher(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        # Check if the user has the SuperAdmin role
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            return any(role.role.name == 'Teacher' for role in user_roles)
-        except UserRole.DoesNotExist:
-            return False
+        return get_auth_context(request).has_role('Teacher')
 
 class ISstudent(BasePermission):
     """
@@ -107,12 +93,7 @@ class ISstudent(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        # Check if the user has the SuperAdmin role
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            return any(role.role.name == 'Student' for role in user_roles)
-        except UserRole.DoesNotExist:
-            return False
+        return get_auth_context(request).has_role('Student')
 
 
 class IsSuperAdminOrSchoolAdmin(BasePermission):
@@ -124,14 +105,7 @@ class IsSuperAdminOrSchoolAdmin(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            # Check if any of the user's roles are either Super Admin or School Admin
-            is_super_admin = any(role.role.name == 'Super Admin' for role in user_roles)
-            is_school_admin = any(role.role.name == 'School Admin' for role in user_roles)
-            return is_super_admin or is_school_admin
-        except UserRole.DoesNotExist:
-            return False
+        return get_auth_context(request).has_role('Super Admin', 'School Admin')
         
 class HasValidPinAndSchoolId(BasePermission):
     def has_permission(self, request, view):
@@ -156,22 +130,9 @@ class IsClassTeacher(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        # Check if the user has the 'Teacher' role
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            is_teacher = any(role.role.name == 'Teacher' for role in user_roles)
-            if not is_teacher:
-                return False
-        except UserRole.DoesNotExist:
-            return False
-
-        # Check if the teacher is assigned as a class teacher
-        try:
-            teacher = request.user.teacher  # Assuming the `Teacher` model has a OneToOne relation with the `User` model
-            is_class_teacher = ClassTeacher.objects.filter(teacher=teacher).exists()
-            return is_class_teacher
-        except Exception:
-            return False
+        # A teacher assigned as a class teacher
+        context = get_auth_context(request)
+        return context.has_role('Teacher') and context.is_class_teacher
 
 
 # from rest_framework.permissions import BasePermission
@@ -186,23 +147,9 @@ class SchoolAdminOrIsClassTeacherOrISstudent(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            role_names = [role.role.name for role in user_roles]
-
-            is_school_admin = 'School Admin' in role_names
-            is_student = 'Student' in role_names
-            is_teacher = 'Teacher' in role_names
-
-            is_class_teacher = False
-            if is_teacher:
-                teacher = getattr(request.user, 'teacher', None)
-                is_class_teacher = ClassTeacher.objects.filter(teacher=teacher).exists() if teacher else False
-
-            return is_school_admin or is_class_teacher or is_student
-
-        except Exception:
-            return False
+        context = get_auth_context(request)
+        is_class_teacher = context.has_role('Teacher') and context.is_class_teacher
+        return context.has_role('School Admin', 'Student') or is_class_teacher
 
 
 
@@ -215,18 +162,7 @@ class IsSchoolAdminOrIsTeacherOrIsStudent(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            role_names = [role.role.name for role in user_roles]
-
-            is_school_admin = 'School Admin' in role_names
-            is_student = 'Student' in role_names
-            is_teacher = 'Teacher' in role_names
-
-            return is_school_admin or is_teacher or is_student
-
-        except Exception:
-            return False
+        return get_auth_context(request).has_role('School Admin', 'Teacher', 'Student')
         
 
 
@@ -239,14 +175,4 @@ class IsSchoolAdminOrIsTeacher(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        try:
-            user_roles = UserRole.objects.filter(user=request.user)
-            role_names = [role.role.name for role in user_roles]
-
-            is_school_admin = 'School Admin' in role_names
-            is_teacher = 'Teacher' in role_names
-
-            return is_school_admin or is_teacher
-
-        except Exception:
-            return False
\ No newline at end of file
+        return get_auth_context(request).has_role('School Admin', 'Teacher')
\ No newline at end of file
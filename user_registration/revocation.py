@@ -0,0 +1,139 @@
+"""
+Revoked JWT lookups without the database.
+
+simplejwt checks a refresh token against BlacklistedToken with a query per
+check, and access tokens are never checked at all. revoked_tokens keeps the
+JTIs of every blacklisted, unexpired token in a process-local dict
+(JTI -> expiry) so is_revoked is a set lookup. It is warmed from the
+database on first use and topped up with the rows past the highest
+BlacklistedToken id it has seen: at once when revoke_token rotates the
+version token in the Django cache, and otherwise every
+REVOCATION_POLL_SECONDS for processes that do not share the cache. A full
+reload every REVOCATION_RELOAD_SECONDS drops expired JTIs and picks up any
+row committed out of id order.
+
+The tables themselves are kept small by the prune_tokens command.
+"""
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+REVOCATION_VERSION_KEY = 'auth:revoked-tokens:version'
+REVOCATION_POLL_SECONDS = 5
+REVOCATION_RELOAD_SECONDS = 600
+PRUNE_BATCH_SIZE = 1000
+
+
+class RevokedTokens:
+    """Unexpired revoked JTIs of this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.expires = {}
+        self.last_id = 0
+        self.version = None
+        self.polled_at = self.loaded_at = float('-inf')
+
+    def __len__(self):
+        return len(self.expires)
+
+    def add(self, jti, expires_at):
+        self.expires[jti] = expires_at
+
+    def _load(self, full):
+        rows = BlacklistedToken.objects.filter(
+            pk__gt=0 if full else self.last_id, token__expires_at__gt=timezone.now()
+        ).order_by('pk').values_list('pk', 'token__jti', 'token__expires_at')
+        expires = {} if full else self.expires
+        last_id = 0 if full else self.last_id
+        for pk, jti, expires_at in rows:
+            expires[jti] = expires_at
+            last_id = pk
+        self.expires, self.last_id = expires, last_id
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        version = cache.get(REVOCATION_VERSION_KEY)
+        if version != self.version or now - self.polled_at >= REVOCATION_POLL_SECONDS:
+            with self.lock:
+                full = now - self.loaded_at >= REVOCATION_RELOAD_SECONDS
+                self._load(full)
+                self.version, self.polled_at = version, now
+                if full:
+                    self.loaded_at = now
+        return jti in self.expires
+
+
+revoked_tokens = RevokedTokens()
+
+
+def is_revoked(jti):
+    """Whether a token with this JTI has been revoked."""
+    return revoked_tokens.is_revoked(jti)
+
+
+def revoke_token(token):
+    """
+    Blacklist a refresh or access token, here and (through the cache version
+    token) in every other process. Returns False if it already was.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime_from_epoch(token['exp'])
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=jti,
+        defaults={
+            'user_id': token.get(api_settings.USER_ID_CLAIM),
+            'token': str(token),
+            'created_at': token.current_time,
+            'expires_at': expires_at,
+        },
+    )
+    _, created = BlacklistedToken.objects.get_or_create(token=outstanding)
+    revoked_tokens.add(jti, expires_at)
+    transaction.on_commit(lambda: cache.set(REVOCATION_VERSION_KEY, uuid.uuid4().hex, None))
+    return created
+
+
+class RevocableRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check reads revoked_tokens instead of the database."""
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+def prune_expired_tokens(batch_size=PRUNE_BATCH_SIZE, progress=None):
+    """
+    Delete expired OutstandingToken rows and their BlacklistedToken rows,
+    batch_size at a time, each batch in its own transaction. `progress` is
+    called with each batch's counts. Returns the totals.
+    """
+    cutoff = timezone.now()
+    totals = {'outstanding': 0, 'blacklisted': 0}
+    while True:
+        with transaction.atomic():
+            ids = list(OutstandingToken.objects.filter(expires_at__lte=cutoff).order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return totals
+            counts = {
+                'blacklisted': BlacklistedToken.objects.filter(token_id__in=ids).delete()[0],
+                'outstanding': OutstandingToken.objects.filter(pk__in=ids).delete()[0],
+            }
+        for key, count in counts.items():
+            totals[key] += count
+        if progress:
+            progress(counts)
@@ -11,6 +11,7 @@ from .models import (
 
 from django.db import transaction
 from rest_framework.exceptions import ValidationError
+from .tokens import add_auth_claims
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -48,6 +49,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Role and school claims let ClaimsJWTAuthentication skip the database.
+        return add_auth_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
 
@@ -291,10 +297,12 @@ class SchoolListSerializer(serializers.ModelSerializer):
 
     def get_status(self, obj):
         try:
-            subscription = obj.school_subscriptions.latest('active_date')
-            return subscription.live_is_active
-        except Subscription.DoesNotExist:
+            # Newest first (Meta.ordering), prefetched by the list view.
+            subscription = obj.school_subscriptions.all()[0]
+        except IndexError:
             return None
+        subscription.school = obj  # keeps an annotated student_count
+        return subscription.live_is_active
 # # =================================================================================================
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -314,7 +322,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         read_only_fields = ['school', 'school_name', 'live_number_students', 'live_expected_fee', 'live_is_active']
 
     def get_live_number_students(self, obj):
-        return obj.school.school_students.count()
+        return obj.live_number_students
 
     def get_live_expected_fee(self, obj):
         return self.get_live_number_students(obj) * obj.amount_per_student
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import School, Subscription
+from .models import School, Subscription, UserRole, SchoolAdmin, Teacher, Student, ClassTeacher
+from .tokens import bump_token_version
 from datetime import date, timedelta
 
 @receiver(post_save, sender=School)
@@ -18,3 +21,39 @@ def create_subscription_for_new_school(sender, instance, created, **kwargs):
             active_date=today,
             expired_date=today + timedelta(days=365),  # Default 1-year subscription
         )
+
+
+#==================== JWT claims ====================
+
+def _deleted_with(kwargs, *models):
+    """True when a post_delete comes from deleting an instance of one of `models`."""
+    origin = kwargs.get('origin')
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model in models
+
+
+@receiver(post_save, sender=User)
+def retire_claims_of_changed_user(sender, instance, created, update_fields=None, **kwargs):
+    """Deactivation or a password change must not be hidden behind old claims."""
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    bump_token_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+@receiver([post_save, post_delete], sender=SchoolAdmin)
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=Student)
+def retire_claims_of_profile(sender, instance, **kwargs):
+    """Role or profile changes retire the role and school claims of the user's tokens."""
+    if not _deleted_with(kwargs, User):
+        bump_token_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=ClassTeacher)
+def retire_class_teacher_claims(sender, instance, **kwargs):
+    if _deleted_with(kwargs, Teacher, User):
+        return
+    user_id = Teacher.objects.filter(pk=instance.teacher_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        bump_token_version(user_id)
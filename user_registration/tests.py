@@ -1,3 +1,271 @@
-from django.test import TestCase
+import uuid
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from attendance.views import AttendanceRecordViewSet
+from tests.fixtures import MEMORY_CACHE
+from tests.query_budget import EndpointQueryBudgetMixin
+from .auth_context import get_auth_context
+from .models import (School, SchoolAdmin, Teacher, Student, Class, Role, UserRole, ClassTeacher, AttendanceSession,
+                     AttendanceRecord)
+from .permissions import IsClassTeacher, IsschoolAdmin, ISstudent, IsStudentReadOnly, IsTeacherReadOnly
+from .revocation import RevocableRefreshToken, is_revoked, prune_expired_tokens, revoke_token, revoked_tokens
+from .serializers import CustomTokenObtainPairSerializer
+from .tokens import ClaimsJWTAuthentication, ClaimsTokenRefreshSerializer, claims_current, context_from_claims
+from .views import MessageCreateView, StudentListView
+
+
+class AuthContextTest(TestCase):
+    """Roles, profiles and the school of request.user are resolved once per request."""
+
+    def test_composed_permissions_cost_one_query(self):
+        school = baker.make(School)
+        teacher = baker.make(Teacher, school=school)
+        baker.make(UserRole, user=teacher.user, role=baker.make(Role, name="Teacher"))
+        baker.make(ClassTeacher, teacher=teacher, class_assigned=baker.make(Class, school=school), school=school)
+
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=teacher.user)
+        request = APIView().initialize_request(request)
+        permission = (IsschoolAdmin | ISstudent | IsClassTeacher)()
+        with self.assertNumQueries(1):
+            self.assertTrue(permission.has_permission(request, None))
+            context = get_auth_context(request)
+            self.assertEqual(context.school, school)
+            self.assertEqual(request.user.teacher.school, school)
+        self.assertTrue(context.is_class_teacher)
+        self.assertFalse(context.has_role("School Admin", "Student"))
+
+    def test_profile_without_role_passes_read_only_permission(self):
+        student = baker.make(Student, school=baker.make(School))
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=student.user)
+        request = APIView().initialize_request(request)
+        with self.assertNumQueries(2):
+            self.assertTrue(IsStudentReadOnly().has_permission(request, None))
+            self.assertFalse(IsTeacherReadOnly().has_permission(request, None))
+        self.assertEqual(get_auth_context(request).school, student.school)
+
+    def test_message_sender_school_follows_the_role(self):
+        teacher = baker.make(Teacher, school=baker.make(School))
+        baker.make(UserRole, user=teacher.user, role=baker.make(Role, name="Teacher"))
+        # A school admin profile without the School Admin role does not decide the school
+        baker.make(SchoolAdmin, user=teacher.user, school=baker.make(School))
+        student = baker.make(Student, school=teacher.school)
+        baker.make(UserRole, user=student.user, role=Role.objects.get_or_create(name="Student")[0])
+        admin_without_profile = baker.make(Teacher, school=teacher.school).user
+        baker.make(UserRole, user=admin_without_profile, role=baker.make(Role, name="School Admin"))
+
+        request = APIRequestFactory().get("/")
+        request.user = teacher.user
+        view = MessageCreateView(request=request)
+        self.assertEqual([view.get_user_school(user) for user in (teacher.user, student.user, admin_without_profile)],
+                         [teacher.school, teacher.school, None])
+        self.assertIsNone(view.get_user_school(baker.make(Student).user))
+
+
+# One test process: the configured cache is as shared as Redis would be.
+@override_settings(TOKEN_CLAIMS_TRUSTED=True)
+class ClaimsAuthenticationTest(TestCase):
+    """Current role claims authorize without the database; stale ones fall back to it."""
+
+    def authorize(self, token):
+        request = APIView().initialize_request(
+            APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}"),
+        )
+        request.authenticators = [ClaimsJWTAuthentication()]
+        allowed = (IsschoolAdmin | IsClassTeacher)().has_permission(request, None)
+        return allowed, get_auth_context(request).school
+
+    def test_claims_and_token_version(self):
+        school = baker.make(School)
+        teacher = baker.make(Teacher, school=school)
+        baker.make(UserRole, user=teacher.user, role=baker.make(Role, name="Teacher"))
+        class_teacher = baker.make(ClassTeacher, teacher=teacher, class_assigned=baker.make(Class, school=school))
+        refresh = CustomTokenObtainPairSerializer.get_token(teacher.user)
+        is_revoked(refresh["jti"])  # warm the revoked-token set
+
+        with self.assertNumQueries(0):
+            allowed, token_school = self.authorize(refresh.access_token)
+            self.assertTrue(allowed)
+            self.assertEqual(token_school.pk, school.pk)
+
+        class_teacher.delete()
+        self.assertEqual(self.authorize(refresh.access_token), (False, school))
+        access = ClaimsTokenRefreshSerializer().validate({"refresh": str(refresh)})["access"]
+        with self.assertNumQueries(0):
+            self.assertFalse(self.authorize(access)[0])
+
+    def test_deactivated_user_is_rejected(self):
+        school = baker.make(School)
+        teacher = baker.make(Teacher, school=school)
+        access = CustomTokenObtainPairSerializer.get_token(teacher.user).access_token
+        self.assertEqual(self.authorize(access)[1].pk, school.pk)
+
+        teacher.user.is_active = False
+        teacher.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authorize(access)
+
+    @override_settings(CACHES=MEMORY_CACHE, TOKEN_CLAIMS_TRUSTED=None)
+    def test_claims_are_not_trusted_with_a_process_local_cache(self):
+        teacher = baker.make(Teacher, school=baker.make(School))
+        baker.make(UserRole, user=teacher.user, role=baker.make(Role, name="Teacher"))
+        refresh = CustomTokenObtainPairSerializer.get_token(teacher.user)
+        is_revoked(refresh["jti"])
+        with self.assertNumQueries(2):  # the user, then its auth context
+            self.authorize(refresh.access_token)
+
+    def test_each_profile_keeps_its_own_school(self):
+        teacher = baker.make(Teacher, school=baker.make(School))
+        admin = baker.make(SchoolAdmin, user=teacher.user, school=baker.make(School))
+        for role in ("Teacher", "School Admin"):
+            baker.make(UserRole, user=teacher.user, role=Role.objects.get_or_create(name=role)[0])
+        access = CustomTokenObtainPairSerializer.get_token(teacher.user).access_token
+
+        user, context = context_from_claims(access)
+        self.assertEqual((user.teacher.school.pk, user.school_admin.school.pk), (teacher.school_id, admin.school_id))
+        self.assertEqual(context.school.pk, admin.school_id)
+
+        # A profile without its school is not trusted; the user is loaded instead
+        access["school_id"] = access["teacher_school_id"] = None
+        self.assertFalse(claims_current(access))
+        self.assertEqual(self.authorize(access), (True, admin.school))
+
+    def test_token_without_profile_school_claims_is_refreshed(self):
+        teacher = baker.make(Teacher, school=baker.make(School))
+        baker.make(UserRole, user=teacher.user, role=baker.make(Role, name="Teacher"))
+        refresh = CustomTokenObtainPairSerializer.get_token(teacher.user)
+        access = refresh.access_token
+        del access["teacher_school_id"]
+        self.assertFalse(claims_current(access))
+
+        access = AccessToken(ClaimsTokenRefreshSerializer().validate({"refresh": str(refresh)})["access"])
+        self.assertTrue(claims_current(access))
+        self.assertEqual(access["teacher_school_id"], str(teacher.school_id))
+
+
+class TokenRevocationTest(TestCase):
+    """Revoked JTIs are checked in memory; expired token rows are pruned in batches."""
+
+    def setUp(self):
+        revoked_tokens.clear()
+
+    def test_revoked_tokens_rejected_without_queries(self):
+        refresh = RevocableRefreshToken.for_user(baker.make(Teacher).user)
+        access = refresh.access_token
+        self.assertFalse(is_revoked(access["jti"]))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_revoked(access["jti"]))
+
+        self.assertTrue(revoke_token(access))
+        revoke_token(refresh)
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+        with self.assertNumQueries(0):
+            with self.assertRaises(AuthenticationFailed):
+                ClaimsJWTAuthentication().authenticate(request)
+            with self.assertRaises(TokenError):
+                RevocableRefreshToken(str(refresh))
+
+        revoked_tokens.clear()
+        self.assertTrue(is_revoked(refresh["jti"]))  # warmed from the database
+
+    def test_prune_expired_tokens(self):
+        past = timezone.now() - timezone.timedelta(days=1)
+        for jti in ("a", "b", "c"):
+            token = OutstandingToken.objects.create(jti=jti, token=jti, expires_at=past)
+            BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(jti="live", token="live", expires_at=timezone.now() + timezone.timedelta(days=1))
+
+        batches = []
+        self.assertEqual(prune_expired_tokens(batch_size=2, progress=batches.append),
+                         {"outstanding": 3, "blacklisted": 3})
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), ["live"])
+
+
+class KeysetPaginationTest(TestCase):
+    """?pagination=cursor walks a list on its composite key with constant-cost pages."""
+
+    def test_student_list_cursor_pages(self):
+        school = baker.make(School)
+        admin = baker.make(SchoolAdmin, school=school)
+        baker.make(UserRole, user=admin.user, role=baker.make(Role, name="School Admin"))
+        for last_name in ("Bello", "Adeyemi", "Bello", "Okafor", "Adeyemi", "Eze", "Bello"):
+            baker.make(Student, school=school, last_name=last_name)
+        expected = list(Student.objects.filter(school=school).order_by("last_name", "student_id")
+                        .values_list("student_id", flat=True))
+        view = StudentListView.as_view()
+
+        def get(url):
+            request = APIRequestFactory().get(url)
+            force_authenticate(request, user=admin.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request)
+            self.assertEqual(response.status_code, 200)
+            return response.data, len(queries)
+
+        pages, query_counts = [], []
+        url = "/?pagination=cursor&page_size=3"
+        while url:
+            data, count = get(url)
+            pages.append([row["student_id"] for row in data["results"]])
+            query_counts.append(count)
+            url = data["next"]
+        self.assertEqual([uuid.UUID(str(pk)) for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(query_counts[1], query_counts[0])  # no COUNT(*), no OFFSET
+
+        previous = get(data["previous"])[0]
+        self.assertEqual([row["student_id"] for row in previous["results"]], pages[1])
+        self.assertIn("count", get("/?page_size=3")[0])  # page numbers stay the default
+
+    def test_attendance_cursor_pages_are_scoped_to_a_session(self):
+        school = baker.make(School)
+        admin = baker.make(SchoolAdmin, school=school)
+        baker.make(UserRole, user=admin.user, role=baker.make(Role, name="School Admin"))
+        session, other = baker.make(AttendanceSession, class_obj__school=school, _quantity=2)
+        for name in ("Eze", "Bello", "Adeyemi"):
+            baker.make(AttendanceRecord, session=session, student_name=name)
+        baker.make(AttendanceRecord, session=other, student_name="Abubakar")
+
+        def get(view, url, **kwargs):
+            request = APIRequestFactory().get(url)
+            force_authenticate(request, user=admin.user)
+            return view(request, **kwargs).data
+
+        records = AttendanceRecordViewSet.as_view({"get": "list"})
+        page = get(records, "/?pagination=cursor&page_size=2", session_pk=session.pk)
+        self.assertEqual([row["student_name"] for row in page["results"]], ["Adeyemi", "Bello"])
+        page = get(records, page["next"], session_pk=session.pk)
+        self.assertEqual([row["student_name"] for row in page["results"]], ["Eze"])
+        # Without a session the index does not apply, so page numbers are used.
+        self.assertIn("count", get(records, "/?pagination=cursor"))
+
+
+class UserRegistrationEndpointQueryBudgetTest(EndpointQueryBudgetMixin, TestCase):
+    """Account, school and profile list endpoints run no queries per row."""
+
+    ENDPOINTS = [
+        ("superadmin-list", None, "super_admin"),
+        ("school-list", None, "super_admin"),
+        ("school-detail", lambda s: {"id": s.school.pk}, "super_admin"),
+        ("subscription-list", None, "super_admin"),
+        ("compliance-verification-list", None, "super_admin"),
+        ("school-admin-list", None, "super_admin"),
+        ("message-list", None, "admin"),
+        ("list-registration-pins", None, "admin"),
+        ("student-list", None, "admin"),
+        ("student-detail", lambda s: {"pk": s.student.pk}, "admin"),
+        ("teacher-list", None, "admin"),
+        ("teacher-detail", lambda s: {"pk": s.teacher.pk}, "admin"),
+    ]
@@ -0,0 +1,192 @@
+"""
+Role and school claims on issued JWTs.
+
+add_auth_claims stamps a token with the user's roles, school, profile ids
+with the school of each profile, class-teacher status and token version,
+read with the one query of load_auth_context. ClaimsJWTAuthentication trusts those claims while the
+version matches the user's current UserTokenVersion: request.user and the
+request's AuthContext are built from the token without touching the
+database (fields the token does not carry load lazily, as with .only()).
+
+The version is kept in the shared default cache, without expiry, and
+bumped by the signals in user_registration/signals.py whenever a role,
+profile or class-teacher assignment changes, or the user is saved (which
+covers deactivation and password changes); the bump writes the committed
+version back to the cache, so every process sees it on its next request.
+A process-local cache cannot carry a bump to other processes, so with one
+claims are not trusted at all (see claims_trusted) and every token takes
+the database path. A token with an older version, or none, is
+authenticated the usual way (the user is loaded and checked for
+is_active) and its context is loaded on first use, so changes take effect
+on the next request without logging anyone out. ClaimsTokenRefreshSerializer
+re-stamps stale claims when the access token is refreshed. Both reject
+revoked tokens through user_registration/revocation.py.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .auth_context import PROFILE_RELATIONS, AuthContext, load_auth_context
+from .models import School, UserTokenVersion
+from .revocation import RevocableRefreshToken, is_revoked
+
+TOKEN_VERSION_CACHE_PREFIX = 'auth:token-version'
+
+TOKEN_VERSION_CLAIM = 'token_version'
+PROFILE_ID_CLAIMS = {relation: f'{relation}_id' for relation in PROFILE_RELATIONS}
+PROFILE_SCHOOL_CLAIMS = {relation: f'{relation}_school_id' for relation in PROFILE_RELATIONS}
+
+
+def _version_key(user_id):
+    return f'{TOKEN_VERSION_CACHE_PREFIX}:{user_id}'
+
+
+def _stored_version(user_id):
+    return UserTokenVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def get_token_version(user_id):
+    """The user's current token version (0 until first bumped)."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _stored_version(user_id)
+        # add, not set: a bump committed since the read above has already written its version.
+        cache.add(_version_key(user_id), version, None)
+    return version
+
+
+def _publish_token_version(user_id):
+    cache.set(_version_key(user_id), _stored_version(user_id), None)
+
+
+def bump_token_version(user_id):
+    """Retire the claims of every token issued to the user so far."""
+    if not UserTokenVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        UserTokenVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+    cache.delete(_version_key(user_id))
+    # Overwrite whatever a read inside the transaction cached from the old row.
+    transaction.on_commit(lambda: _publish_token_version(user_id))
+
+
+def claims_trusted():
+    """
+    Whether token claims may stand in for the database. TOKEN_CLAIMS_TRUSTED
+    decides when set; otherwise only a shared default cache qualifies, as a
+    process-local one never sees bumps made by other processes.
+    """
+    trusted = getattr(settings, 'TOKEN_CLAIMS_TRUSTED', None)
+    if trusted is None:
+        trusted = not isinstance(caches['default'], (LocMemCache, DummyCache))
+    return trusted
+
+
+def add_auth_claims(token, user):
+    """Stamp the user's roles, school and profile ids on a token; returns the token."""
+    context = load_auth_context(user)
+    school = context.school
+    token['roles'] = sorted(context.roles)
+    token['school_id'] = str(school.pk) if school is not None else None
+    for relation, claim in PROFILE_ID_CLAIMS.items():
+        profile = getattr(context, relation)
+        token[claim] = str(profile.pk) if profile is not None else None
+        token[PROFILE_SCHOOL_CLAIMS[relation]] = str(profile.school_id) if profile is not None else None
+    token['is_class_teacher'] = context.is_class_teacher
+    token[TOKEN_VERSION_CLAIM] = get_token_version(user.pk)
+    return token
+
+
+def _deferred_instance(model, **values):
+    """A model instance with only `values` loaded, like a row fetched with .only()."""
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+
+
+def context_from_claims(token):
+    """Build request.user and its AuthContext from a token's claims, without queries."""
+    user_id = token[api_settings.USER_ID_CLAIM]
+    user = _deferred_instance(User, id=user_id, is_active=True)
+    schools = {}
+
+    profiles = {}
+    for relation, claim in PROFILE_ID_CLAIMS.items():
+        descriptor = getattr(User, relation)
+        profile = None
+        if token[claim] is not None:
+            model = descriptor.related.related_model
+            school_id = token[PROFILE_SCHOOL_CLAIMS[relation]]
+            if school_id not in schools:
+                schools[school_id] = _deferred_instance(School, id=uuid.UUID(school_id))
+            profile = _deferred_instance(model, **{model._meta.pk.attname: uuid.UUID(token[claim]),
+                                                   'user_id': user_id, 'school_id': schools[school_id].pk})
+            profile.school = schools[school_id]
+            profile.user = user
+        descriptor.related.set_cached_value(user, profile)
+        profiles[relation] = profile
+
+    context = AuthContext(user_id=user_id, roles=token['roles'], is_class_teacher=token['is_class_teacher'],
+                          **profiles)
+    return user, context
+
+
+def claims_current(token):
+    """
+    Whether the token carries claims of the user's current token version,
+    with the school of every profile it names. Tokens issued before the
+    profile school claims take the database path until refreshed.
+    """
+    version = token.get(TOKEN_VERSION_CLAIM)
+    if version is None or any(token.get(claim) is not None and token.get(PROFILE_SCHOOL_CLAIMS[relation]) is None
+                              for relation, claim in PROFILE_ID_CLAIMS.items()):
+        return False
+    return version == get_token_version(token[api_settings.USER_ID_CLAIM])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that builds the user and AuthContext from current claims."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if is_revoked(validated_token[api_settings.JTI_CLAIM]):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        if not claims_trusted() or not claims_current(validated_token):
+            return self.get_user(validated_token), validated_token
+        user, context = context_from_claims(validated_token)
+        # get_auth_context finds it here instead of querying.
+        getattr(request, '_request', request)._auth_context = context
+        return user, validated_token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that re-stamps the access token when its claims are out of date."""
+
+    token_class = RevocableRefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        if not claims_current(access):
+            user = User.objects.filter(pk=access[api_settings.USER_ID_CLAIM], is_active=True).first()
+            if user is None:
+                raise InvalidToken("No active account found for this token")
+            data['access'] = str(add_auth_claims(access, user))
+        return data
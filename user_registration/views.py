@@ -22,6 +22,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
+from .auth_context import get_auth_context, load_auth_context
+from .pagination import KeysetPagination, KeysetPaginationMixin
+from .revocation import RevocableRefreshToken, revoke_token
 from .permissions import (IsSuperAdmin,IsschoolAdmin,ISteacher,
                           ISstudent,IsSuperAdminOrSchoolAdmin,IsClassTeacher,
                           HasValidPinAndSchoolId,IsStudentReadOnly,IsTeacherReadOnly,IsSchoolAdminReadOnly)
@@ -41,14 +44,14 @@ from rest_framework.parsers import MultiPartParser
 from .utils import generate_temp_token, validate_temp_token
 from django.utils.crypto import get_random_string
 import pandas as pd
-from django.db.models import Prefetch
+from django.db.models import Count, Prefetch
 
 
 
 
 
 #Standard Pagination
-class StandardResultsSetPagination(PageNumberPagination):
+class StandardResultsSetPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -64,7 +67,8 @@ class LogoutView(APIView):
 
     def post(self, request):
         """
-        Logs out the current user by blacklisting the refresh token.
+        Logs out the current user by revoking the refresh token and the
+        access token the request was made with.
         Accepts:
           - JSON body: {"refresh_token": "<token>"}
           - or cookie named "refresh_token"
@@ -81,11 +85,11 @@ class LogoutView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 2) Try to blacklist it
+        # 2) Try to revoke it (and the access token in use)
         try:
-            token = RefreshToken(refresh_token)
-            # If blacklist app is enabled, this works; otherwise it raises
-            token.blacklist()
+            revoke_token(RevocableRefreshToken(refresh_token))
+            if request.auth is not None:
+                revoke_token(request.auth)
         except TokenError:
             # Covers invalid/expired/already blacklisted → treat as already logged out
             return Response(
@@ -139,7 +143,7 @@ class SuperAdminListAPIView(ListAPIView):
     """
     API to list all SuperAdmins.
     """
-    queryset = SuperAdmin.objects.all()
+    queryset = SuperAdmin.objects.select_related('user')
     serializer_class = SuperAdminSerializer
     permission_classes = [IsSuperAdmin]  # Restrict access to SuperAdmins only
     pagination_class = StandardResultsSetPagination
@@ -204,7 +208,10 @@ class SchoolListAPIView(ListAPIView):
     API to list all schools.
     """
     permission_classes = [IsSuperAdmin]  # Optional: Restrict access to authenticated users
-    queryset = School.objects.all().order_by('school_name')
+    # Student counts and subscriptions are read per row by the status field.
+    queryset = School.objects.select_related('registered_by__super_admin').annotate(
+        student_count=Count('school_students')
+    ).prefetch_related('school_subscriptions').order_by('school_name')
     serializer_class = SchoolListSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
@@ -250,7 +257,9 @@ class SchoolDetailAPIView(RetrieveUpdateDestroyAPIView):
         )
 # ========================================================================================================
 class SubscriptionListView(generics.ListAPIView):
-    queryset = Subscription.objects.all()
+    queryset = Subscription.objects.prefetch_related(
+        Prefetch('school', queryset=School.objects.annotate(student_count=Count('school_students')))
+    )
     serializer_class = SubscriptionSerializer
     permission_classes = [IsSuperAdmin]
 
@@ -290,7 +299,7 @@ class ComplianceVerificationListView(ListAPIView):
     API view to list all compliance verification records.
     Supports filtering by school name, compliance status, and approval status.
     """
-    queryset = ComplianceVerification.objects.all()
+    queryset = ComplianceVerification.objects.select_related('school')
     serializer_class = ComplianceVerificationSerializer
     permission_classes = [IsSuperAdminOrSchoolAdmin]  # Ensure only authenticated users can access
 
@@ -400,16 +409,12 @@ class MessageCreateView(generics.CreateAPIView):
         )
 
     def get_user_school(self, user):
-        try:
-            user_role = UserRole.objects.get(user=user)
-            if user_role.role.name == 'School Admin':
-                return SchoolAdmin.objects.get(user=user).school
-            elif user_role.role.name == 'Teacher':
-                return Teacher.objects.get(user=user).school
-            elif user_role.role.name == 'Student':
-                return Student.objects.get(user=user).classroom.school
-        except (UserRole.DoesNotExist, SchoolAdmin.DoesNotExist, Teacher.DoesNotExist, Student.DoesNotExist):
-            pass
+        """The school of the profile that goes with the user's role (School Admin, Teacher, then Student)."""
+        context = get_auth_context(self.request) if user == self.request.user else load_auth_context(user)
+        for role, profile in (('School Admin', context.school_admin), ('Teacher', context.teacher),
+                              ('Student', context.student)):
+            if context.has_role(role):
+                return profile.school if profile is not None else None
         return None
     
 class MessageListView(generics.ListAPIView):
@@ -418,6 +423,8 @@ class MessageListView(generics.ListAPIView):
     """
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-sent_at', 'message_id')
 
     def get_queryset(self):
         user = self.request.user
@@ -437,7 +444,7 @@ class SchoolAdminListView(ListAPIView):
     """
     List all SchoolAdmins.
     """
-    queryset = SchoolAdmin.objects.all()
+    queryset = SchoolAdmin.objects.select_related('school')
     serializer_class = SchoolAdminListSerializer
     permission_classes = [IsSuperAdmin]
 
@@ -793,7 +800,7 @@ class ListRegistrationPinsView(generics.ListAPIView):
     permission_classes = [IsschoolAdmin]
 
     def get_queryset(self):
-        return StudentRegistrationPin.objects.filter(school=self.request.user.school_admin.school)
+        return StudentRegistrationPin.objects.filter(school=self.request.user.school_admin.school).select_related('school')
 
     @swagger_auto_schema(
         responses={
@@ -913,6 +920,7 @@ class StudentListView(generics.ListAPIView):
     serializer_class = StudentListSerializer
     permission_classes = [IsschoolAdmin]
     pagination_class = StandardResultsSetPagination
+    keyset_ordering = ('last_name', 'student_id')
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['first_name', 'middle_name', 'last_name', 'gender']
     search_fields = ['city', 'region', 'country']
@@ -1136,7 +1144,7 @@ class TeacherListView(generics.ListAPIView):
     search_fields = ['city', 'region','country']
 
     def get_queryset(self):
-        return Teacher.objects.filter(school=self.request.user.school_admin.school)
+        return Teacher.objects.filter(school=self.request.user.school_admin.school).select_related('school')
 
 
 class DeleteMultipleTeachersView(APIView):